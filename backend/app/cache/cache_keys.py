@@ -19,12 +19,32 @@ def generic_cache_key(prefix: str, **params) -> str:
     return f"{prefix}:{json_str}"
 
 
+# 🔗 Coalescence des requêtes identiques (single-flight)
+def _canonical_list(values: list) -> list:
+    """Liste triée sans doublon : [2, 1, 2] et [1, 2] désignent le même calcul."""
+    return sorted(set(values), key=lambda v: (str(type(v)), v)) if all(
+        isinstance(v, (int, float, str)) for v in values
+    ) else values
+
+
+def single_flight_key(prefix: str, payload: dict) -> str:
+    canonical = {k: _canonical_list(v) if isinstance(v, list) else v for k, v in payload.items()}
+    serialized = json.dumps(canonical, sort_keys=True, default=str)
+    digest = hashlib.md5(serialized.encode("utf-8")).hexdigest()
+    return f"{prefix}:{digest}"
+
+
 # 🧠 Résolution produits
 def resolve_codpro_key(payload: dict) -> str:
     return _hash_if_needed(payload, "resolve_codpro")
 
 
 # 📊 Dashboard
+def dashboard_fiche_key(payload: ProductIdentifierRequest, period: str) -> str:
+    base = payload.model_dump(exclude_none=True)
+    base["period"] = period
+    return _hash_if_needed(base, "dashboard:fiche")
+
 def dashboard_products_key(payload: ProductIdentifierRequest) -> str:
     return _hash_if_needed(payload.model_dump(exclude_none=True), "dashboard:products")
 
@@ -62,12 +82,14 @@ def purchase_price_key(payload: ProductIdentifierRequest) -> str:
 
 
 # 📊 Ventes
-def sales_agg_key(payload: ProductIdentifierRequest) -> str:
-    return _hash_if_needed(payload.model_dump(exclude_none=True), "sales:agg")
+def sales_agg_key(payload: ProductIdentifierRequest, period: str) -> str:
+    base = payload.model_dump(exclude_none=True)
+    base["period"] = period
+    return _hash_if_needed(base, "sales:agg")
 
-def sales_history_key(payload: ProductIdentifierRequest, min_period: str) -> str:
+def sales_history_key(payload: ProductIdentifierRequest, period: str) -> str:
     base = payload.model_dump(exclude_none=True)
-    base["min_period"] = min_period
+    base["period"] = period
     return _hash_if_needed(base, "sales:history")
 
 
@@ -92,11 +114,18 @@ def optimisation_key(payload: ProductIdentifierRequest) -> str:
 
 
 # Groupes et matrices paginées
-def groups_key(payload: dict, page: int, limit: int):
+def groups_key(payload: dict, page: int, limit: int, cursor: str | None = None):
     base = json.dumps(payload, sort_keys=True)
     h = hashlib.md5(base.encode()).hexdigest()
+    if cursor:
+        return f"groups:{h}:cursor{hashlib.md5(cursor.encode()).hexdigest()}:limit{limit}"
     return f"groups:{h}:page{page}:limit{limit}"
 
+def groups_count_key(payload: dict):
+    base = json.dumps(payload, sort_keys=True)
+    h = hashlib.md5(base.encode()).hexdigest()
+    return f"groups:count:{h}"
+
 def matrice_key(payload: dict, page: int, limit: int):
     base = json.dumps(payload, sort_keys=True)
     h = hashlib.md5(base.encode()).hexdigest()
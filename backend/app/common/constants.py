@@ -13,6 +13,8 @@ MIN_PAGE_SIZE = 1         # Taille minimum autorisée
 # === Limites de performance ===
 MAX_CODPRO_LIST_SIZE = 1000  # Maximum de cod_pro dans une requête
 MAX_QUERY_TIMEOUT = 30       # Timeout max pour les requêtes SQL (secondes)
+SLOW_QUERY_THRESHOLD_MS = 1000  # Au-delà, une requête du registre est journalisée comme lente
+STREAM_PARTITION_SIZE = 5000   # Lignes lues par paquet sur un curseur serveur (stream_query)
 
 # === Qualités produits ===
 VALID_QUALITES = {'OEM', 'PMQ', 'PMV', 'OE'}  # Qualités autorisées
@@ -21,4 +21,98 @@ def get_last_n_months(n: int):
         months.append(f"{current_year}-{current_month:02d}")
     
     # Retourner dans l'ordre chronologique (plus ancien en premier)
-    return list(reversed(months))
\ No newline at end of file
+    return list(reversed(months))
+
+# =====================================================
+# 🗓️ Fenêtres mensuelles [start, end)
+# =====================================================
+
+def month_key(d: date) -> int:
+    """date(2024, 3, 15) → 202403"""
+    return d.year * 100 + d.month
+
+
+def month_key_from_label(label: str) -> int:
+    """'2024-03' ou '2024-03-01' → 202403"""
+    year, month = label.split("-")[:2]
+    return int(year) * 100 + int(month)
+
+
+def month_label(key: int) -> str:
+    """202403 → '2024-03'"""
+    return f"{key // 100}-{key % 100:02d}"
+
+
+def first_of_month(d: date) -> date:
+    return d.replace(day=1)
+
+
+def add_months(d: date, n: int) -> date:
+    """Décale un 1er du mois de n mois (n peut être négatif)."""
+    total = d.year * 12 + (d.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+class PeriodWindow:
+    """
+    Fenêtre de mois entiers [start, end) : start et end sont des 1ers du mois.
+
+    Les bornes sont calculées côté Python et passées en paramètres SQL
+    (filtres indexables, plans stables) ; les clés entières YYYYMM servent au
+    regroupement et aux clés de cache, valables tout le mois.
+    """
+
+    def __init__(self, start: date, end: date):
+        self.start = first_of_month(start)
+        self.end = first_of_month(end)
+
+    @classmethod
+    def last_n_months(cls, n: int, include_current: bool = True, today: date = None) -> "PeriodWindow":
+        """
+        Les n derniers mois ; include_current=False s'arrête au mois précédent (mois complets).
+        """
+        current = first_of_month(today or date.today())
+        end = add_months(current, 1) if include_current else current
+        return cls(add_months(end, -n), end)
+
+    @classmethod
+    def since(cls, start: date, include_current: bool = False, today: date = None) -> "PeriodWindow":
+        current = first_of_month(today or date.today())
+        end = add_months(current, 1) if include_current else current
+        return cls(start, end)
+
+    @property
+    def start_key(self) -> int:
+        return month_key(self.start)
+
+    @property
+    def end_key(self) -> int:
+        """Clé du mois exclu (borne haute)."""
+        return month_key(self.end)
+
+    @property
+    def cache_token(self) -> str:
+        return f"{self.start_key}-{self.end_key}"
+
+    def keys(self) -> list:
+        keys = []
+        d = self.start
+        while d < self.end:
+            keys.append(month_key(d))
+            d = add_months(d, 1)
+        return keys
+
+    def labels(self) -> list:
+        return [month_label(k) for k in self.keys()]
+
+    def sql_params(self, prefix: str = "window") -> dict:
+        """Bornes date et clés pour les requêtes : {prefix}_start/_end et {prefix}_start_key/_end_key."""
+        return {
+            f"{prefix}_start": self.start,
+            f"{prefix}_end": self.end,
+            f"{prefix}_start_key": self.start_key,
+            f"{prefix}_end_key": self.end_key,
+        }
+
+    def __repr__(self):
+        return f"PeriodWindow({self.start.isoformat()} → {self.end.isoformat()})"
@@ -0,0 +1,38 @@
+# ============================================
+# 📁 backend/app/common/disconnect.py
+# ============================================
+
+from fastapi import Request, Response
+from typing import Awaitable
+from app.common.logger import logger
+import asyncio
+
+
+# Code non standard (nginx) : le client a fermé la connexion avant la réponse
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable, poll_interval: float = 0.5):
+    """
+    Exécute awaitable en surveillant la connexion du client : s'il se déconnecte,
+    la tâche est annulée (les requêtes SQL en cours sont abandonnées et leurs
+    connexions invalidées, cf. db.queries.run_query) au lieu d'occuper le pool
+    jusqu'au bout pour une réponse que personne ne lira.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"🔌 Client déconnecté, annulation de {request.url.path}")
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
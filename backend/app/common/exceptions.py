@@ -17,6 +17,20 @@ class DatabaseError(CBMBaseException):
     pass
 
 
+class QueryTimeoutError(DatabaseError):
+    """Requête SQL interrompue après dépassement du timeout"""
+    def __init__(self, query_name: str, timeout: float):
+        message = f"Requête {query_name} interrompue après {timeout}s"
+        super().__init__(message, {"query": query_name, "timeout": timeout})
+
+
+class JobAlreadyRunningError(CBMBaseException):
+    """Job de rafraîchissement déjà en cours (verrou détenu par un autre appelant)"""
+    def __init__(self, job_name: str):
+        message = f"Job {job_name} déjà en cours"
+        super().__init__(message, {"job": job_name})
+
+
 class CacheError(CBMBaseException):
     """Erreur liée au cache Redis"""
     pass
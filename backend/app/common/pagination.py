@@ -1,2 +1,29 @@
+import base64
+import json
+from typing import Iterable
+
+
 def calculate_offset(page: int, limit: int) -> int:
     return max((page - 1), 0) * limit
+
+
+def encode_cursor(values: dict) -> str:
+    """
+    Encode la position keyset (valeurs de la dernière ligne servie) en jeton opaque.
+    """
+    raw = json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, keys: Iterable[str] = ()) -> dict:
+    """
+    Décode un jeton produit par encode_cursor. Lève ValueError si le jeton est invalide
+    ou s'il ne contient pas toutes les clés attendues (keys).
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except Exception as e:
+        raise ValueError(f"Curseur invalide: {cursor}") from e
+    if not isinstance(values, dict) or any(values.get(key) is None for key in keys):
+        raise ValueError(f"Curseur invalide: {cursor}")
+    return values
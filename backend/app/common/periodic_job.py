@@ -0,0 +1,84 @@
+# ============================================
+# 📁 backend/app/common/periodic_job.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+from app.common.exceptions import CacheError, JobAlreadyRunningError
+from app.common.logger import logger
+from app.common.redis_client import redis_client
+from app.db.session import async_write_session
+import asyncio
+import uuid
+
+
+# Durée max du verrou d'exécution d'un job (libéré à la fin du job, cette borne
+# ne sert que si le worker meurt en cours de route)
+JOB_LOCK_TTL = 6 * 3600
+
+# Suppression du verrou uniquement par son détenteur
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def _acquire_lease(key: str, ttl: int) -> bool:
+    """
+    Bail Redis d'une période : un seul worker exécute le job. Sans Redis le job est
+    sauté (plusieurs rafraîchissements concurrents des mêmes tables se bloqueraient).
+    """
+    try:
+        return bool(await redis_client.set(key, "1", nx=True, ex=ttl))
+    except Exception:
+        logger.exception(f"[Redis] bail {key}")
+        return False
+
+
+@asynccontextmanager
+async def job_lock(name: str, ttl: int = JOB_LOCK_TTL):
+    """
+    Verrou d'exécution d'un job, partagé par tous ses appelants (tâche périodique,
+    batch, endpoint) et tous les workers : deux rafraîchissements des mêmes tables ne
+    tournent jamais en même temps. Lève JobAlreadyRunningError si le verrou est pris,
+    CacheError si Redis est indisponible (l'exclusivité ne peut pas être garantie).
+    """
+    key = f"job:{name}:running"
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis_client.set(key, token, nx=True, ex=ttl)
+    except Exception as e:
+        logger.exception(f"[Redis] verrou {key}")
+        raise CacheError(f"Verrou du job {name} indisponible") from e
+    if not acquired:
+        raise JobAlreadyRunningError(name)
+    try:
+        yield
+    finally:
+        try:
+            await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+        except Exception:
+            logger.exception(f"[Redis] libération verrou {key}")
+
+
+async def periodic_job_loop(name: str, interval: int, job: Callable[[AsyncSession], Awaitable[Any]]):
+    """
+    Tâche de fond (lifespan) : job(session d'écriture) toutes les interval secondes,
+    exécuté par le premier worker qui obtient le bail de la période.
+    """
+    lease_key = f"periodic:{name}:lease"
+    while True:
+        try:
+            if await _acquire_lease(lease_key, interval):
+                async with async_write_session() as db:
+                    await job(db)
+        except asyncio.CancelledError:
+            raise
+        except JobAlreadyRunningError:
+            logger.info(f"⏭️ Tâche périodique {name}: déjà en cours ailleurs, période sautée")
+        except Exception as e:
+            logger.error(f"❌ Tâche périodique {name}: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,130 @@
+# ============================================
+# 📁 backend/app/common/single_flight.py
+# ============================================
+
+from pydantic import BaseModel
+from typing import Awaitable, Callable, Dict, Type, TypeVar
+from app.common.logger import logger
+from app.common.redis_client import redis_client
+from app.settings import get_settings
+import asyncio
+import time
+import uuid
+
+
+T = TypeVar("T", bound=BaseModel)
+
+# Calculs en cours dans ce worker : clé → future partagée par les requêtes identiques
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Suppression du bail uniquement par son détenteur (évite de libérer le bail d'un autre worker)
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _LeaderAborted(Exception):
+    """Le calcul partagé a été annulé (client déconnecté) : chaque requête en attente reprend la main."""
+
+
+def _lease_key(key: str) -> str:
+    return f"singleflight:lease:{key}"
+
+
+def _result_key(key: str) -> str:
+    return f"singleflight:result:{key}"
+
+
+async def single_flight(key: str, compute: Callable[[], Awaitable[T]], model: Type[T]) -> T:
+    """
+    Coalesce les appels concurrents identiques (même clé) en un seul calcul.
+
+    - Dans un worker : la première requête calcule, les suivantes attendent sa future.
+    - Entre workers : le calcul est protégé par un bail Redis (SET NX) ; les autres
+      workers attendent le résultat publié sous singleflight:result:<key>, et
+      calculent eux-mêmes si le bail disparaît sans résultat ou si Redis est indisponible.
+
+    Les erreurs du calcul sont propagées à toutes les requêtes en attente ; seule
+    l'annulation du leader (déconnexion client) relance un calcul pour les suivantes.
+    """
+    fut = _inflight.get(key)
+    if fut is not None:
+        logger.debug(f"🔗 Single-flight: attente du calcul en cours pour {key}")
+        try:
+            return await asyncio.shield(fut)
+        except _LeaderAborted:
+            return await single_flight(key, compute, model)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        result = await _compute_with_lease(key, compute, model)
+    except asyncio.CancelledError:
+        fut.set_exception(_LeaderAborted())
+        fut.exception()  # marque l'exception comme lue si personne n'attendait
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        fut.exception()
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _compute_with_lease(key: str, compute: Callable[[], Awaitable[T]], model: Type[T]) -> T:
+    """Calcul protégé par le bail Redis inter-workers (repli sur un calcul local si Redis est KO)."""
+    settings = get_settings()
+    token = uuid.uuid4().hex
+
+    try:
+        acquired = await redis_client.set(_lease_key(key), token, nx=True, ex=settings.SINGLE_FLIGHT_LEASE_TTL)
+    except Exception:
+        logger.exception("[Redis] fallback single-flight lease")
+        return await compute()
+
+    if not acquired:
+        result = await _wait_for_remote_result(key, model, settings.SINGLE_FLIGHT_LEASE_TTL)
+        if result is not None:
+            return result
+        return await compute()
+
+    try:
+        result = await compute()
+        try:
+            await redis_client.set(_result_key(key), result.model_dump_json(), ex=settings.SINGLE_FLIGHT_RESULT_TTL)
+        except Exception:
+            logger.exception("[Redis] set single-flight result")
+        return result
+    finally:
+        try:
+            await redis_client.eval(_RELEASE_LEASE_SCRIPT, 1, _lease_key(key), token)
+        except Exception:
+            logger.exception("[Redis] release single-flight lease")
+
+
+async def _wait_for_remote_result(key: str, model: Type[T], timeout: float, poll_interval: float = 0.1):
+    """
+    Attend le résultat publié par le worker détenteur du bail.
+    Retourne None si le bail est libéré sans résultat (erreur côté leader) ou expire.
+    """
+    logger.debug(f"🔗 Single-flight: calcul en cours sur un autre worker pour {key}")
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            cached = await redis_client.get(_result_key(key))
+            if cached:
+                return model.model_validate_json(cached)
+            if not await redis_client.exists(_lease_key(key)):
+                # Le résultat a pu être publié juste avant la libération du bail
+                cached = await redis_client.get(_result_key(key))
+                return model.model_validate_json(cached) if cached else None
+            await asyncio.sleep(poll_interval)
+    except Exception:
+        logger.exception("[Redis] fallback single-flight wait")
+    return None
@@ -12,3 +12,15 @@ TARIFS_COLUMNS = {
 CATALOGUE_COLUMNS = {
     "cod_pro", "qualite", "px_refv_eur", "px_net_eur"
 }
+
+# Tri de la liste d'optimisation : nom exposé par l'API -> colonne de Optimisation_Monitoring
+OPTIMISATION_COLUMNS = {
+    "gain_total_achat_18m": "gain_total_achat_18m",
+    "gain_total_pmp_18m": "gain_total_pmp_18m",
+    "gain_manque_achat_12m": "gain_manque_achat_12m",
+    "gain_potentiel_achat_6m": "gain_potentiel_achat_6m",
+    "amelioration_pct": "amelioration_pct",
+    "refs_total": "nb_refs",
+    "ca_12m": "ca_12m",
+    "grouping_crn": "grouping_crn",
+}
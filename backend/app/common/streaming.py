@@ -0,0 +1,38 @@
+# 📄 backend/app/common/streaming.py
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, AsyncIterator
+from app.common.logger import logger
+import json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _encode_record(record: Any) -> bytes:
+    if isinstance(record, BaseModel):
+        return record.model_dump_json().encode("utf-8") + b"\n"
+    return json.dumps(record, default=str).encode("utf-8") + b"\n"
+
+
+async def ndjson_lines(records: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    """
+    Sérialise un flux d'enregistrements (modèles Pydantic ou dicts) en NDJSON, une ligne par enregistrement.
+    Une erreur en cours de flux ne peut plus changer le statut HTTP : elle est loggée
+    et signalée par une dernière ligne {"error": ...}.
+    """
+    count = 0
+    try:
+        async for record in records:
+            count += 1
+            yield _encode_record(record)
+    except Exception as e:
+        logger.error(f"💥 Erreur pendant le streaming NDJSON après {count} lignes: {e}")
+        yield _encode_record({"error": str(e)})
+
+
+def ndjson_response(records: AsyncIterator[Any]) -> StreamingResponse:
+    """
+    Réponse HTTP chunkée au format NDJSON (application/x-ndjson).
+    """
+    return StreamingResponse(ndjson_lines(records), media_type=NDJSON_MEDIA_TYPE)
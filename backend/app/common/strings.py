@@ -1,4 +1,7 @@
 import re
+from typing import Optional
+
+
 def normalize_str(value: str) -> str:
     return value.strip().lower()
 
@@ -17,3 +20,12 @@ def normalize_ref_ext(ref_ext: str) -> str:
     # Supprime tout ce qui n'est pas lettre ou chiffre
     ref = re.sub(r"[^A-Za-z0-9]", "", ref_ext)
     return ref.upper()
+
+
+def sql_key(value: Optional[str]) -> str:
+    """
+    Clé de comparaison alignée sur la collation SQL Server des référentiels
+    (insensible à la casse, espaces de fin ignorés) : deux valeurs égales pour
+    SQL Server ont la même clé.
+    """
+    return (value or "").upper().rstrip(" ")
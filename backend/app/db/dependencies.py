@@ -1,9 +1,15 @@
 #backend/app/db/dependencies.py
 
-from app.db.session import get_session  # OK : vient de database.py
+from app.db.session import get_session, get_write_session  # OK : vient de database.py
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Pour compatibilité éventuelle avec routers qui utilisent get_db
 async def get_db() -> AsyncSession:
     async for session in get_session():
         yield session
+
+
+# Batchs et rafraîchissements : pool d'écriture séparé
+async def get_write_db() -> AsyncSession:
+    async for session in get_write_session():
+        yield session
@@ -1,12 +1,15 @@
 #backend/app/db/engine.py
 
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlalchemy.engine import URL
-from sqlalchemy.exc import OperationalError
-from sqlalchemy import text  # Manquait ici
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import text, event  # Manquait ici
+from time import perf_counter
 from app.settings import get_settings
+from app.common.constants import MAX_QUERY_TIMEOUT
 from app.common.logger import logger  # 💥 Corrige l'erreur d'import
+import asyncio
 
 
 settings = get_settings()
@@ -20,24 +23,143 @@ DATABASE_PARAMS = {
     "TrustServerCertificate": "yes"
 }
 
-connection_string = ";".join([f"{k}={v}" for k, v in DATABASE_PARAMS.items()])
-async_url = URL.create("mssql+aioodbc", query={"odbc_connect": connection_string})
 
-engine = create_async_engine(
-    async_url,
-    echo=False,
-    future=True,
-    pool_size=50,
-    max_overflow=5,
-    pool_timeout=5,
-    pool_pre_ping=True
-)
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool qui mesure l'attente à la prise de connexion (checkout) et les timeouts
+    d'épuisement, exposés par get_pool_metrics().
+    """
 
-async def test_db_connection():
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = {"checkouts": 0, "timeouts": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats["timeouts"] += 1
+            logger.warning(f"⛔ Pool épuisé ({self.checkedout()} connexions en cours)")
+            raise
+        finally:
+            waited = (perf_counter() - start) * 1000
+            self.wait_stats["checkouts"] += 1
+            self.wait_stats["total_wait_ms"] += waited
+            self.wait_stats["max_wait_ms"] = max(self.wait_stats["max_wait_ms"], waited)
+
+
+def create_engine_from_settings(read_only: bool) -> AsyncEngine:
+    """
+    Construit un engine à partir de Settings.
+
+    - lecture : READ UNCOMMITTED posé à la prise de connexion, ApplicationIntent=ReadOnly
+      (route vers un secondaire lisible si le serveur en propose un), pool principal
+    - écriture (batchs) : READ COMMITTED, pool dédié et plus petit pour ne pas
+      concurrencer les requêtes API
+
+    Pas de pre-ping (un aller-retour à chaque checkout) : les connexions sont
+    recyclées après DATABASE_POOL_RECYCLE et un contrôle périodique purge le pool
+    en cas de perte du serveur (cf. pool_health_monitor).
+    """
+    params = dict(DATABASE_PARAMS)
+    if read_only:
+        params["ApplicationIntent"] = "ReadOnly"
+    connection_string = ";".join([f"{k}={v}" for k, v in params.items()])
+    url = URL.create("mssql+aioodbc", query={"odbc_connect": connection_string})
+
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=MeteredQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE if read_only else settings.DATABASE_WRITE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW if read_only else settings.DATABASE_WRITE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=False,
+        isolation_level="READ UNCOMMITTED" if read_only else "READ COMMITTED",
+    )
+
+
+# Engine des requêtes API (analytique, lecture seule)
+read_engine = create_engine_from_settings(read_only=True)
+# Engine des batchs (tables matérialisées, cube, synthèses)
+write_engine = create_engine_from_settings(read_only=False)
+
+# Compatibilité : l'engine par défaut reste celui de lecture
+engine = read_engine
+
+
+def pyodbc_connection(dbapi_connection):
+    """Connexion pyodbc sous l'adaptateur SQLAlchemy et la connexion aioodbc."""
+    driver_connection = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    return getattr(driver_connection, "_conn", driver_connection)
+
+
+def _driver_query_timeout(timeout: int):
+    """
+    Pose le timeout de requête ODBC (SQL_ATTR_QUERY_TIMEOUT) sur chaque nouvelle
+    connexion : à expiration, le driver annule le statement côté serveur et rend
+    la connexion, même si la coroutine appelante a déjà été abandonnée.
+    """
+    def _on_connect(dbapi_connection, connection_record):
+        try:
+            pyodbc_connection(dbapi_connection).timeout = timeout
+        except Exception as e:
+            logger.warning(f"⚠️ Timeout driver non appliqué: {e}")
+    return _on_connect
+
+
+event.listen(read_engine.sync_engine, "connect", _driver_query_timeout(MAX_QUERY_TIMEOUT))
+event.listen(write_engine.sync_engine, "connect", _driver_query_timeout(settings.DATABASE_WRITE_QUERY_TIMEOUT))
+
+
+def get_pool_metrics() -> dict:
+    """
+    Occupation et attente des pools : connexions prises, débordement, attente au checkout.
+    """
+    metrics = {}
+    for name, eng in (("read", read_engine), ("write", write_engine)):
+        pool = eng.sync_engine.pool
+        stats = pool.wait_stats
+        metrics[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": stats["checkouts"],
+            "timeouts": stats["timeouts"],
+            "avg_wait_ms": round(stats["total_wait_ms"] / stats["checkouts"], 2) if stats["checkouts"] else 0.0,
+            "max_wait_ms": round(stats["max_wait_ms"], 2),
+        }
+    return metrics
+
+
+async def test_db_connection(eng: AsyncEngine = None):
     try:
-        async with engine.begin() as conn:
+        async with (eng or engine).begin() as conn:
             await conn.execute(text("SELECT 1"))
         return True
     except OperationalError as e:
         logger.error(f"Database connection failed: {e}")
         return False
+
+
+async def pool_health_monitor():
+    """
+    Contrôle périodique (DATABASE_HEALTHCHECK_INTERVAL) remplaçant le pre-ping :
+    si le serveur ne répond plus, les pools sont vidés pour que les prochaines
+    requêtes ouvrent des connexions neuves au lieu d'hériter de sockets mortes.
+    """
+    while True:
+        await asyncio.sleep(settings.DATABASE_HEALTHCHECK_INTERVAL)
+        try:
+            ok = await test_db_connection(read_engine)
+        except Exception as e:
+            logger.error(f"❌ Contrôle pool DB: {e}")
+            ok = False
+        if not ok:
+            logger.warning("♻️ Connexion DB perdue : purge des pools")
+            await read_engine.dispose()
+            await write_engine.dispose()
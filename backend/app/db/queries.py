@@ -0,0 +1,790 @@
+# ============================================
+# 📁 backend/app/db/queries.py
+# ============================================
+"""
+Registre central des requêtes SQL de lecture.
+
+Chaque requête est un text() compilé une seule fois au chargement du module,
+avec une forme fixe : les listes de cod_pro sont passées en un seul paramètre
+(chaîne "1,2,3" découpée par STRING_SPLIT), le texte SQL ne dépend donc plus
+de la taille de la liste et le plan est réutilisé par SQL Server.
+Exception : les agrégats pilotés par une liste portent OPTION (RECOMPILE)
+(voir _RECOMPILE).
+
+Le niveau d'isolation (READ UNCOMMITTED) est posé par l'engine à la prise de
+connexion : les requêtes ne portent plus de préfixe SET TRANSACTION.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.elements import TextClause
+from time import perf_counter
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+from app.common.constants import SLOW_QUERY_THRESHOLD_MS, MAX_QUERY_TIMEOUT, STREAM_PARTITION_SIZE
+from app.common.exceptions import QueryTimeoutError
+from app.common.logger import logger
+from app.db.engine import pyodbc_connection
+from app.db.watermark import REFRESH_WATERMARK_TABLE
+import asyncio
+import json
+import math
+
+
+class NamedQuery:
+    """Requête nommée : le text() est construit une fois et réutilisé à chaque appel."""
+
+    __slots__ = ("name", "statement")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.statement: TextClause = text(sql)
+
+
+QUERIES: Dict[str, NamedQuery] = {}
+
+# name → {"count", "errors", "timeouts", "total_ms", "max_ms"}
+_QUERY_STATS: Dict[str, dict] = {}
+
+
+def register_query(name: str, sql: str) -> NamedQuery:
+    if name in QUERIES:
+        raise ValueError(f"Requête déjà enregistrée: {name}")
+    query = NamedQuery(name, sql)
+    QUERIES[name] = query
+    return query
+
+
+def codpro_list_param(cod_pro_list: Iterable[int]) -> str:
+    """Sérialise une liste de cod_pro pour le paramètre :cod_pro_list (STRING_SPLIT)."""
+    return ",".join(str(int(cod)) for cod in cod_pro_list)
+
+
+def ref_list_param(refs: Iterable[str]) -> str:
+    """Sérialise une liste de références pour le paramètre :refs (OPENJSON : virgules permises)."""
+    return json.dumps(list(refs))
+
+
+def _record(name: str, elapsed_ms: float, failed: bool, timed_out: bool = False):
+    stats = _QUERY_STATS.setdefault(name, {"count": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+    stats["count"] += 1
+    if timed_out:
+        stats["timeouts"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    if failed:
+        stats["errors"] += 1
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(f"🐢 Requête lente {name}: {elapsed_ms:.0f} ms")
+
+
+async def _discard_connection(db: AsyncSession):
+    """
+    Invalide la connexion d'une requête abandonnée (après _settle : plus aucun appel
+    driver en cours) ; la session repart sur une connexion neuve.
+    """
+    try:
+        connection = await db.connection()
+        await connection.invalidate()
+        await db.rollback()
+    except Exception as e:
+        logger.warning(f"⚠️ Invalidation connexion: {e}")
+
+
+async def _set_driver_timeout(db: AsyncSession, timeout: Optional[float]) -> Optional[Tuple[object, int]]:
+    """
+    Pose le timeout driver (SQL_ATTR_QUERY_TIMEOUT, secondes entières, 0 = illimité)
+    des prochains curseurs de la connexion de la session. pyodbc l'applique à la
+    création du curseur : un statement déjà lancé n'est pas concerné.
+    Retourne (connexion pyodbc, valeur précédente) pour _restore_driver_timeout.
+    """
+    try:
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        odbc = pyodbc_connection(raw.dbapi_connection)
+        previous = odbc.timeout
+        odbc.timeout = 0 if timeout is None else max(1, math.ceil(timeout))
+        return odbc, previous
+    except Exception as e:
+        logger.debug(f"⚠️ Timeout driver non appliqué: {e}")
+        return None
+
+
+def _restore_driver_timeout(saved: Optional[Tuple[object, int]]):
+    if saved is None:
+        return
+    odbc, previous = saved
+    try:
+        odbc.timeout = previous
+    except Exception as e:
+        logger.debug(f"⚠️ Timeout driver non restauré: {e}")
+
+
+def _is_driver_timeout(error: DBAPIError) -> bool:
+    """Statement annulé par le driver à expiration du timeout (SQLSTATE HYT00)."""
+    return "HYT00" in str(error.orig)
+
+
+async def _settle(operation: asyncio.Future):
+    """
+    Attend la fin d'un appel driver dont l'appelant a été annulé (client déconnecté) :
+    aioodbc l'exécute dans un thread qui continue après l'annulation de la coroutine.
+    La connexion n'est invalidée qu'une fois ce thread revenu, au plus tard à
+    l'expiration du timeout driver.
+    """
+    await asyncio.wait({operation})
+    if not operation.cancelled():
+        operation.exception()
+
+
+async def _execute(db: AsyncSession, name: str, statement: TextClause, params: Optional[dict], timeout: Optional[float]):
+    start = perf_counter()
+    failed = False
+    timed_out = False
+    saved = await _set_driver_timeout(db, timeout)
+    operation = asyncio.ensure_future(db.execute(statement, params or {}))
+    try:
+        return await asyncio.shield(operation)
+    except asyncio.CancelledError:
+        failed = True
+        logger.info(f"🚫 Requête {name} annulée")
+        await _settle(operation)
+        await _discard_connection(db)
+        raise
+    except DBAPIError as e:
+        failed = True
+        if not _is_driver_timeout(e):
+            raise
+        timed_out = True
+        logger.warning(f"⏱️ Timeout {name} après {timeout}s")
+        await _discard_connection(db)
+        raise QueryTimeoutError(name, timeout) from e
+    except Exception:
+        failed = True
+        raise
+    finally:
+        _restore_driver_timeout(saved)
+        _record(name, (perf_counter() - start) * 1000, failed, timed_out)
+
+
+async def run_query(
+    db: AsyncSession,
+    query: NamedQuery,
+    params: Optional[dict] = None,
+    timeout: float = MAX_QUERY_TIMEOUT
+):
+    """
+    Exécute une requête du registre, bornée par timeout (secondes), et enregistre
+    son temps d'exécution.
+
+    La borne est le timeout driver du statement : à expiration, le driver l'annule
+    côté serveur et rend la main (QueryTimeoutError). Si l'appelant est annulé
+    (client déconnecté), l'appel driver en cours est attendu avant d'invalider
+    la connexion : elle n'est jamais fermée sous un thread qui l'utilise.
+    """
+    return await _execute(db, query.name, query.statement, params, timeout)
+
+
+async def execute_text(
+    db: AsyncSession,
+    name: str,
+    statement: Union[str, TextClause],
+    params: Optional[dict] = None,
+    timeout: float = MAX_QUERY_TIMEOUT
+):
+    """
+    Comme run_query, pour une requête dont le texte est construit à l'appel
+    (filtres / tri dynamiques) : même borne, mêmes statistiques sous name.
+    """
+    if isinstance(statement, str):
+        statement = text(statement)
+    return await _execute(db, name, statement, params, timeout)
+
+
+async def stream_query(
+    db: AsyncSession,
+    query: NamedQuery,
+    params: Optional[dict] = None,
+    partition_size: int = STREAM_PARTITION_SIZE,
+    timeout: Optional[float] = MAX_QUERY_TIMEOUT
+) -> AsyncIterator[List[tuple]]:
+    """
+    Exécute une requête du registre en curseur serveur (AsyncSession.stream) et produit
+    ses lignes par paquets de partition_size : seul le paquet courant est en mémoire,
+    quelle que soit la taille du résultat.
+
+    timeout (None = sans borne) est le timeout driver du curseur : il borne son ouverture
+    (temps enregistré dans les statistiques) et chaque lecture. Un flux abandonné
+    (client déconnecté) attend la lecture en cours puis invalide la connexion, comme run_query.
+    """
+    start = perf_counter()
+    saved = await _set_driver_timeout(db, timeout)
+    operation = asyncio.ensure_future(db.stream(query.statement, params or {}))
+    try:
+        result = await asyncio.shield(operation)
+    except asyncio.CancelledError:
+        _record(query.name, (perf_counter() - start) * 1000, True)
+        await _settle(operation)
+        _restore_driver_timeout(saved)
+        await _discard_connection(db)
+        raise
+    except DBAPIError as e:
+        timed_out = _is_driver_timeout(e)
+        _record(query.name, (perf_counter() - start) * 1000, True, timed_out)
+        _restore_driver_timeout(saved)
+        if not timed_out:
+            raise
+        logger.warning(f"⏱️ Timeout {query.name} après {timeout}s")
+        await _discard_connection(db)
+        raise QueryTimeoutError(query.name, timeout) from e
+    except Exception:
+        _record(query.name, (perf_counter() - start) * 1000, True)
+        _restore_driver_timeout(saved)
+        raise
+    # Le curseur est créé : le timeout de la connexion peut reprendre sa valeur
+    _restore_driver_timeout(saved)
+    _record(query.name, (perf_counter() - start) * 1000, False)
+
+    rows = 0
+    partitions = result.partitions(partition_size).__aiter__()
+    closed = False
+    try:
+        while True:
+            fetch = asyncio.ensure_future(partitions.__anext__())
+            try:
+                partition = await asyncio.shield(fetch)
+            except StopAsyncIteration:
+                break
+            except asyncio.CancelledError:
+                logger.info(f"🚫 Flux {query.name} annulé après {rows} lignes")
+                await _settle(fetch)
+                await _discard_connection(db)
+                closed = True
+                raise
+            rows += len(partition)
+            yield partition
+    finally:
+        if not closed:
+            try:
+                await result.close()
+            except Exception as e:
+                logger.debug(f"♻️ Fermeture curseur {query.name}: {e}")
+
+
+def get_query_stats() -> Dict[str, dict]:
+    """Statistiques par requête depuis le démarrage du process (moyenne incluse)."""
+    return {
+        name: {
+            **stats,
+            "total_ms": round(stats["total_ms"], 1),
+            "max_ms": round(stats["max_ms"], 1),
+            "avg_ms": round(stats["total_ms"] / stats["count"], 1) if stats["count"] else 0.0,
+        }
+        for name, stats in sorted(_QUERY_STATS.items())
+    }
+
+
+# Sous-requête réutilisable : liste de cod_pro passée en un seul paramètre
+_CODPRO_LIST = "SELECT CAST(value AS INT) FROM STRING_SPLIT(:cod_pro_list, ',')"
+
+# Liste de grouping_crn, même format que :cod_pro_list
+_GROUPING_CRN_LIST = "SELECT CAST(value AS INT) FROM STRING_SPLIT(:grouping_crn_list, ',')"
+
+# Liste de références texte (tableau JSON) : les références peuvent contenir des virgules.
+# OPENJSON renvoie du NVARCHAR : on caste dans le type et la collation des colonnes
+# de référence (VARCHAR), sinon la conversion implicite porte sur la colonne et
+# transforme la recherche par index en scan.
+_REF_LIST = (
+    "SELECT DISTINCT CAST(value AS VARCHAR(200)) COLLATE DATABASE_DEFAULT AS ref "
+    "FROM OPENJSON(:refs)"
+)
+
+# Agrégats pilotés par une liste : STRING_SPLIT / OPENJSON ont une estimation de
+# cardinalité fixe, un plan réutilisé calibré sur 1 produit dégénère sur 5 000.
+# La recompilation (quelques ms) reste négligeable devant ces agrégations.
+_RECOMPILE = "OPTION (RECOMPILE)"
+
+
+# =====================================================
+# 🧠 Résolution des identifiants
+# =====================================================
+
+IDENTIFIER_BY_REF_CRN = register_query("identifier.by_ref_crn", """
+    SELECT DISTINCT cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE ref_crn = :ref_crn
+      AND (:qualite IS NULL OR qualite = :qualite)
+""")
+
+IDENTIFIER_GROUP_BY_REF_CRN = register_query("identifier.group_by_ref_crn", """
+    SELECT DISTINCT t2.cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table AS t1 WITH (NOLOCK)
+    JOIN CBM_DATA.Pricing.Grouping_crn_table AS t2 WITH (NOLOCK)
+      ON t2.grouping_crn = t1.grouping_crn
+    WHERE t1.ref_crn = :ref_crn
+      AND (:qualite IS NULL OR t2.qualite = :qualite)
+""")
+
+IDENTIFIER_CODPRO_BY_REFINT = register_query("identifier.codpro_by_refint", """
+    SELECT TOP 1 cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE refint = :refint
+""")
+
+IDENTIFIER_CODPRO_BY_REF_EXT = register_query("identifier.codpro_by_ref_ext", """
+    SELECT TOP 1 cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE ref_ext = :ref_ext
+""")
+
+IDENTIFIER_GROUP_BY_CODPRO = register_query("identifier.group_by_codpro", """
+    SELECT DISTINCT t2.cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table AS t1 WITH (NOLOCK)
+    JOIN CBM_DATA.Pricing.Grouping_crn_table AS t2 WITH (NOLOCK)
+      ON t2.grouping_crn = t1.grouping_crn
+    WHERE t1.cod_pro = :cod_pro
+      AND (:qualite IS NULL OR t2.qualite = :qualite)
+""")
+
+IDENTIFIER_BY_GROUPING_CRN = register_query("identifier.by_grouping_crn", """
+    SELECT DISTINCT cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE grouping_crn = :grouping_crn
+      AND (:qualite IS NULL OR qualite = :qualite)
+""")
+
+# --- Résolution en masse (identifier_service.resolve_identifiers_bulk) ---
+# La référence renvoyée est celle fournie (r.ref) : correspondance exacte avec l'entrée.
+# MIN(cod_pro) rend déterministe le TOP 1 de la résolution unitaire.
+
+IDENTIFIER_BULK_CODPRO_BY_REFINT = register_query("identifier.bulk_codpro_by_refint", f"""
+    SELECT r.ref, MIN(g.cod_pro)
+    FROM ({_REF_LIST}) AS r
+    JOIN CBM_DATA.Pricing.Grouping_crn_table g WITH (NOLOCK)
+        ON g.refint = r.ref
+    GROUP BY r.ref
+    {_RECOMPILE}
+""")
+
+IDENTIFIER_BULK_CODPRO_BY_REF_EXT = register_query("identifier.bulk_codpro_by_ref_ext", f"""
+    SELECT r.ref, MIN(g.cod_pro)
+    FROM ({_REF_LIST}) AS r
+    JOIN CBM_DATA.Pricing.Grouping_crn_table g WITH (NOLOCK)
+        ON g.ref_ext = r.ref
+    GROUP BY r.ref
+    {_RECOMPILE}
+""")
+
+IDENTIFIER_BULK_BY_REF_CRN = register_query("identifier.bulk_by_ref_crn", f"""
+    SELECT DISTINCT r.ref, g.cod_pro, g.grouping_crn, g.qualite
+    FROM ({_REF_LIST}) AS r
+    JOIN CBM_DATA.Pricing.Grouping_crn_table g WITH (NOLOCK)
+        ON g.ref_crn = r.ref
+""")
+
+IDENTIFIER_BULK_GROUP_BY_CODPRO = register_query("identifier.bulk_group_by_codpro", f"""
+    SELECT DISTINCT cod_pro, grouping_crn
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE cod_pro IN ({_CODPRO_LIST})
+      AND grouping_crn IS NOT NULL
+""")
+
+IDENTIFIER_BULK_GROUP_MEMBERS = register_query("identifier.bulk_group_members", f"""
+    SELECT DISTINCT grouping_crn, cod_pro, qualite
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE grouping_crn IN ({_GROUPING_CRN_LIST})
+""")
+
+# Source complète du snapshot référentiel (ordre des colonnes = reference_snapshot.SNAPSHOT_COLUMNS)
+IDENTIFIER_INDEX_SOURCE = register_query("identifier.index_source", """
+    SELECT
+        g.cod_pro, g.grouping_crn, g.refint, g.ref_ext, g.ref_crn, g.qualite,
+        d.refext AS dim_ref_ext
+    FROM CBM_DATA.Pricing.Grouping_crn_table g WITH (NOLOCK)
+    LEFT JOIN CBM_DATA.dm.Dim_Produit d WITH (NOLOCK)
+        ON g.cod_pro = d.cod_pro
+    WHERE g.cod_pro IS NOT NULL
+""")
+
+
+# =====================================================
+# 📦 Produits
+# =====================================================
+
+PRODUCT_DETAILS = register_query("products.details", f"""
+    SELECT
+        p.cod_pro,
+        p.refint,
+        p.refext AS ref_ext,
+        p.famille,
+        p.s_famille,
+        p.qualite,
+        p.statut,
+        f.cod_fou_principal,
+        fou.nom_fou,
+        p.nom_pro
+    FROM CBM_DATA.dm.Dim_Produit p WITH (NOLOCK)
+    LEFT JOIN (
+        SELECT DISTINCT cod_pro, cod_fou_principal
+        FROM CBM_DATA.dm.Fact_Produit_Depot_Fournisseur WITH (NOLOCK)
+    ) f ON p.cod_pro = f.cod_pro
+    LEFT JOIN (
+        SELECT cod_fou, nom_fou
+        FROM CBM_DATA.dm.Dim_Fournisseur WITH (NOLOCK)
+    ) fou ON f.cod_fou_principal = fou.cod_fou
+    WHERE p.cod_pro IN ({_CODPRO_LIST})
+    ORDER BY p.cod_pro
+""")
+
+PRODUCT_MATCHES = register_query("products.matches", f"""
+    SELECT DISTINCT
+        pdp.cod_pro,
+        pdp.ref_crn,
+        Dim_Produit.refext AS ref_ext
+    FROM [CBM_DATA].[Pricing].[Grouping_crn_table] pdp WITH (NOLOCK)
+    LEFT JOIN CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
+        ON pdp.cod_pro = Dim_Produit.cod_pro
+    WHERE pdp.cod_pro IN ({_CODPRO_LIST})
+""")
+
+PRODUCT_MATRIX = register_query("products.matrix", f"""
+    SELECT DISTINCT
+        pdp.grouping_crn AS groupe_crn,
+        pdp.cod_pro,
+        pdp.ref_crn,
+        Dim_Produit.refext AS ref_ext
+    FROM CBM_DATA.Pricing.Dimensions_Produit pdp WITH (NOLOCK)
+    LEFT JOIN CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
+        ON pdp.cod_pro = Dim_Produit.cod_pro
+    WHERE pdp.cod_pro IN ({_CODPRO_LIST})
+""")
+
+
+# =====================================================
+# 🏭 Stock & achats
+# =====================================================
+
+STOCK_ACTUEL = register_query("stock.actuel", f"""
+    SELECT cod_pro, depot, stock, pmp_eur
+    FROM CBM_DATA.stock.Fact_Stock_Actuel WITH (NOLOCK)
+    INNER JOIN (
+        SELECT [WarehouseNumber]
+        FROM CBM_DATA.import.companyStatus WITH (NOLOCK)
+        WHERE [AnalysisFlag] = 1
+    ) AS cs ON cs.WarehouseNumber = depot
+    WHERE cod_pro IN ({_CODPRO_LIST})
+""")
+
+PURCHASE_PRICES = register_query("purchase.prices", f"""
+    SELECT cod_pro, px_net_eur as px_achat_eur
+    FROM CBM_DATA.Pricing.Px_achat_net WITH (NOLOCK)
+    WHERE cod_pro IN ({_CODPRO_LIST})
+""")
+
+
+# =====================================================
+# 🔎 Suggestions / autocomplétion
+# =====================================================
+
+SUGGEST_REFCRN_BY_CODPRO = register_query("suggest.refcrn_by_codpro", """
+    SELECT DISTINCT ref_crn
+    FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
+    WHERE cod_pro = :cod_pro AND ref_crn IS NOT NULL
+    ORDER BY ref_crn
+""")
+
+SUGGEST_REFINT_OR_CODPRO = register_query("suggest.refint_or_codpro", """
+    SELECT DISTINCT TOP (:fetch) refint, cod_pro
+    FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
+    WHERE refint LIKE :q OR CAST(cod_pro AS VARCHAR) LIKE :q
+    ORDER BY refint
+""")
+
+SUGGEST_REF_CRN = register_query("suggest.ref_crn", """
+    SELECT DISTINCT TOP (:fetch) ref_crn
+    FROM CBM_DATA.Pricing.Bridge_cod_pro_ref_crn WITH (NOLOCK)
+    WHERE ref_crn LIKE :q
+    ORDER BY ref_crn
+""")
+
+SUGGEST_REF_EXT = register_query("suggest.ref_ext", """
+    SELECT DISTINCT TOP (:fetch) refext as ref_ext
+    FROM CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
+    WHERE refext LIKE :q
+    ORDER BY ref_ext
+""")
+
+# Sources des index d'autocomplétion en mémoire (services.suggestion.prefix_index)
+SUGGEST_INDEX_REFINT_CODPRO = register_query("suggest.index_refint_codpro", """
+    SELECT DISTINCT refint, cod_pro
+    FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
+    WHERE cod_pro IS NOT NULL
+""")
+
+SUGGEST_INDEX_REF_CRN = register_query("suggest.index_ref_crn", """
+    SELECT DISTINCT ref_crn
+    FROM CBM_DATA.Pricing.Bridge_cod_pro_ref_crn WITH (NOLOCK)
+    WHERE ref_crn IS NOT NULL
+""")
+
+SUGGEST_INDEX_REF_EXT = register_query("suggest.index_ref_ext", """
+    SELECT DISTINCT refext
+    FROM CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
+    WHERE refext IS NOT NULL
+""")
+
+
+# =====================================================
+# 📈 Ventes (cube mensuel)
+# Bornes [start_key, end_key) toujours passées (cf. sales_cube._read_params).
+# Chaque lecture existe en deux variantes :
+# - cube : mois clos lus dans le cube (periode < :live_key), mois ouvert(s) agrégés
+#   en live depuis les mouvements [live_start, live_end)
+# - _LIVE : toute la fenêtre agrégée depuis les mouvements (cube absent ou jamais rafraîchi)
+# Le cube et son watermark sont lus en READCOMMITTED (pas NOLOCK) : une lecture
+# concurrente d'un rafraîchissement ne voit que l'état validé (cf. refresh_sales_cube).
+# =====================================================
+
+SALES_CUBE_TABLE = "CBM_DATA.cbm_product_explorer.Sales_Monthly"
+
+def _sales_live_source(products: str) -> str:
+    """Ventes (cod_pro, mois) agrégées depuis les mouvements ; products : sous-requête de cod_pro."""
+    return f"""
+    SELECT v.cod_pro, YEAR(v.dat_mvt) * 100 + MONTH(v.dat_mvt) AS periode,
+           SUM(v.qte) AS qte, SUM(v.tot_vte_eur) AS ca,
+           SUM(v.tot_pa_eur) AS total_pa, SUM(v.tot_marge_pa_eur) AS marge_pa,
+           SUM(v.tot_pmp_eur) AS total_pmp, SUM(v.tot_marge_pmp_eur) AS marge_pmp,
+           SUM(v.tot_marge_pr_eur) AS marge_pr
+    FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
+    WHERE v.cod_pro IN ({products})
+      AND v.dat_mvt >= :live_start AND v.dat_mvt < :live_end
+    GROUP BY v.cod_pro, YEAR(v.dat_mvt) * 100 + MONTH(v.dat_mvt)
+"""
+
+
+def _sales_cube_source(products: str) -> str:
+    """Mois clos depuis le cube, mois à partir de :live_start en live (même forme de lignes)."""
+    return f"""
+    SELECT cod_pro, periode, qte, ca, total_pa, marge_pa, total_pmp, marge_pmp, marge_pr
+    FROM {SALES_CUBE_TABLE} WITH (READCOMMITTED)
+    WHERE cod_pro IN ({products})
+      AND periode >= :start_key AND periode < :end_key AND periode < :live_key
+    UNION ALL
+""" + _sales_live_source(products)
+
+
+_SALES_LIVE_SOURCE = _sales_live_source(_CODPRO_LIST)
+_SALES_CUBE_SOURCE = _sales_cube_source(_CODPRO_LIST)
+
+_SALES_MONTHLY_BY_PRODUCT = """
+    SELECT c.cod_pro, d.refint, c.periode,
+           c.qte, c.ca, c.total_pa, c.marge_pa, c.total_pmp, c.marge_pmp, c.marge_pr
+    FROM ({source}) c
+    LEFT JOIN CBM_DATA.dm.Dim_Produit d WITH (NOLOCK) ON d.cod_pro = c.cod_pro
+    ORDER BY c.cod_pro, c.periode
+    {recompile}
+"""
+
+_SALES_TOTALS_BY_PRODUCT = """
+    SELECT c.cod_pro, MAX(d.refint) AS refint,
+           SUM(c.qte) AS qte, SUM(c.ca) AS ca, SUM(c.marge_pr) AS marge_pr
+    FROM ({source}) c
+    LEFT JOIN CBM_DATA.dm.Dim_Produit d WITH (NOLOCK) ON d.cod_pro = c.cod_pro
+    GROUP BY c.cod_pro
+    {recompile}
+"""
+
+_SALES_MONTHLY_BY_GROUP = """
+    SELECT dp.grouping_crn, dp.qualite, c.cod_pro, c.periode,
+           c.qte, c.ca, c.total_pa, c.marge_pa, c.total_pmp, c.marge_pmp,
+           a.px_achat
+    FROM ({source}) c
+    INNER JOIN (
+        SELECT DISTINCT cod_pro, grouping_crn, qualite
+        FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
+    ) dp ON c.cod_pro = dp.cod_pro
+    LEFT JOIN (
+        SELECT cod_pro, MIN(px_net_eur) AS px_achat
+        FROM CBM_DATA.Pricing.Px_achat_net WITH (NOLOCK)
+        GROUP BY cod_pro
+    ) a ON a.cod_pro = c.cod_pro
+    WHERE dp.qualite IN ('OEM','PMQ','PMV')
+    ORDER BY dp.grouping_crn, dp.qualite, c.periode
+    {recompile}
+"""
+
+SALES_MONTHLY_BY_PRODUCT = register_query(
+    "sales.monthly_by_product", _SALES_MONTHLY_BY_PRODUCT.format(source=_SALES_CUBE_SOURCE, recompile=_RECOMPILE))
+SALES_MONTHLY_BY_PRODUCT_LIVE = register_query(
+    "sales.monthly_by_product_live", _SALES_MONTHLY_BY_PRODUCT.format(source=_SALES_LIVE_SOURCE, recompile=_RECOMPILE))
+
+SALES_TOTALS_BY_PRODUCT = register_query(
+    "sales.totals_by_product", _SALES_TOTALS_BY_PRODUCT.format(source=_SALES_CUBE_SOURCE, recompile=_RECOMPILE))
+SALES_TOTALS_BY_PRODUCT_LIVE = register_query(
+    "sales.totals_by_product_live", _SALES_TOTALS_BY_PRODUCT.format(source=_SALES_LIVE_SOURCE, recompile=_RECOMPILE))
+
+SALES_MONTHLY_BY_GROUP = register_query(
+    "sales.monthly_by_group", _SALES_MONTHLY_BY_GROUP.format(source=_SALES_CUBE_SOURCE, recompile=_RECOMPILE))
+SALES_MONTHLY_BY_GROUP_LIVE = register_query(
+    "sales.monthly_by_group_live", _SALES_MONTHLY_BY_GROUP.format(source=_SALES_LIVE_SOURCE, recompile=_RECOMPILE))
+
+# État du cube pour le choix de la variante : (last_mvt, window_start) du watermark,
+# NULL si la table du cube ou des watermarks n'existe pas encore
+SALES_CUBE_STATE = register_query("sales.cube_state", f"""
+    IF OBJECT_ID('{SALES_CUBE_TABLE}', 'U') IS NOT NULL
+       AND OBJECT_ID('{REFRESH_WATERMARK_TABLE}', 'U') IS NOT NULL
+        SELECT MAX(last_mvt), MAX(window_start)
+        FROM {REFRESH_WATERMARK_TABLE} WITH (READCOMMITTED)
+        WHERE job_name = :job_name
+    ELSE
+        SELECT CAST(NULL AS DATETIME2), CAST(NULL AS DATE)
+""")
+
+
+# =====================================================
+# ⚙️ Optimisation
+# =====================================================
+
+OPTIMISATION_GROUP_PRODUCTS = register_query("optimisation.group_products", f"""
+    WITH CodProList AS (
+        SELECT CAST(value AS INT) AS cod_pro FROM STRING_SPLIT(:cod_pro_list, ',')
+    ),
+    Achat AS (
+        SELECT a.cod_pro, MIN(a.px_net_eur) AS px_achat
+        FROM CBM_DATA.Pricing.Px_achat_net a WITH (NOLOCK)
+        JOIN CodProList c ON a.cod_pro = c.cod_pro
+        GROUP BY a.cod_pro
+    )
+    SELECT dp.grouping_crn, dp.qualite, dp.cod_pro, dp.refint,
+           ISNULL(a.px_achat,0) AS px_achat
+    FROM (SELECT DISTINCT cod_pro, refint, grouping_crn, qualite
+          FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)) dp
+    JOIN CodProList c ON dp.cod_pro = c.cod_pro
+    LEFT JOIN Achat a ON dp.cod_pro = a.cod_pro
+    WHERE dp.qualite IN ('OEM','PMQ','PMV')
+    {_RECOMPILE}
+""")
+
+OPTIMISATION_DETAIL_TABLE = "CBM_DATA.cbm_product_explorer.Optimisation_Detail"
+# Totaux par groupe/qualité écrits par le batch
+OPTIMISATION_MONITORING_TABLE = "CBM_DATA.cbm_product_explorer.Optimisation_Monitoring"
+
+# Groupes OEM/PM à matérialiser par le batch, sans détail dans le store ;
+# variante _STALE : aussi ceux dont le détail est antérieur à :cutoff.
+# eligible = 1 si le groupe a ≥ 2 refs OEM ou PM (seuls ceux-là vont dans le monitoring) :
+# les autres ont tout de même leur détail, pour que l'API ne les recalcule pas en live.
+_OPTIMISATION_BATCH_GROUPS = """
+    SELECT grouping_crn, MIN(cod_pro) as cod_pro,
+           CASE WHEN COUNT(CASE WHEN qualite = 'OEM' THEN cod_pro END) > 1
+                  OR COUNT(CASE WHEN qualite IN ('PMV', 'PMQ') THEN cod_pro END) > 1
+                THEN 1 ELSE 0 END AS eligible
+    FROM (
+        SELECT DISTINCT g.grouping_crn, g.cod_pro, g.qualite
+        FROM CBM_DATA.Pricing.Grouping_crn_table g
+        LEFT JOIN {detail} d
+            ON d.grouping_crn = g.grouping_crn
+        WHERE g.grouping_crn IS NOT NULL
+          AND g.qualite IN ('OEM', 'PMQ', 'PMV')
+          AND (d.grouping_crn IS NULL {stale_filter})
+    ) tab
+    GROUP BY grouping_crn
+"""
+
+OPTIMISATION_BATCH_GROUPS = register_query("optimisation.batch_groups", _OPTIMISATION_BATCH_GROUPS.format(
+    detail=OPTIMISATION_DETAIL_TABLE, stale_filter="",
+))
+
+OPTIMISATION_BATCH_GROUPS_STALE = register_query("optimisation.batch_groups_stale", _OPTIMISATION_BATCH_GROUPS.format(
+    detail=OPTIMISATION_DETAIL_TABLE, stale_filter="OR d.generated_at < :cutoff",
+))
+
+# Détail matérialisé des groupes touchés par :cod_pro_list, avec le nombre de membres OEM/PM
+# du groupe et le nombre de ceux demandés : le store ne sert que les groupes demandés en entier
+OPTIMISATION_MATERIALIZED_GROUPS = register_query("optimisation.materialized_groups", f"""
+    WITH demandes AS (
+        SELECT DISTINCT cod_pro FROM ({_CODPRO_LIST}) l(cod_pro)
+    ),
+    membres AS (
+        SELECT DISTINCT gc.grouping_crn, gc.cod_pro
+        FROM CBM_DATA.Pricing.Grouping_crn_table gc WITH (NOLOCK)
+        WHERE gc.qualite IN ('OEM','PMQ','PMV')
+          AND gc.grouping_crn IN (
+              SELECT t.grouping_crn
+              FROM CBM_DATA.Pricing.Grouping_crn_table t WITH (NOLOCK)
+              JOIN demandes dm ON dm.cod_pro = t.cod_pro
+              WHERE t.qualite IN ('OEM','PMQ','PMV')
+          )
+    ),
+    g AS (
+        SELECT m.grouping_crn, COUNT(*) AS nb_membres, COUNT(dm.cod_pro) AS nb_demandes
+        FROM membres m
+        LEFT JOIN demandes dm ON dm.cod_pro = m.cod_pro
+        GROUP BY m.grouping_crn
+    )
+    SELECT g.grouping_crn, g.nb_membres, g.nb_demandes, d.qualite, d.payload, d.generated_at
+    FROM g
+    LEFT JOIN {OPTIMISATION_DETAIL_TABLE} d WITH (NOLOCK)
+        ON d.grouping_crn = g.grouping_crn
+    {_RECOMPILE}
+""")
+
+
+# =====================================================
+# 📤 Exports (lus en curseur serveur par export_service)
+# Ordre des colonnes = export_service.EXPORT_DATASETS.
+# =====================================================
+
+_EXPORT_GROUP_PRODUCTS = f"""
+    SELECT DISTINCT grouping_crn, qualite, cod_pro
+    FROM CBM_DATA.Pricing.Grouping_crn_table WITH (NOLOCK)
+    WHERE grouping_crn IN ({_GROUPING_CRN_LIST})
+"""
+
+# Historique ventes : même source que les lectures ventes (cube + mois ouvert en live,
+# variante _LIVE sans cube), choisie par sales_cube.sales_window_params
+_EXPORT_SALES_HISTORY = """
+    SELECT g.grouping_crn, g.qualite, c.cod_pro, d.refint, c.periode,
+           c.qte, c.ca, c.total_pa, c.marge_pa, c.total_pmp, c.marge_pmp, c.marge_pr
+    FROM ({products}) g
+    JOIN ({source}) c ON c.cod_pro = g.cod_pro
+    LEFT JOIN CBM_DATA.dm.Dim_Produit d WITH (NOLOCK) ON d.cod_pro = c.cod_pro
+    ORDER BY g.grouping_crn, g.qualite, c.cod_pro, c.periode
+"""
+
+_EXPORT_CODPROS = f"SELECT cod_pro FROM ({_EXPORT_GROUP_PRODUCTS}) gp"
+
+EXPORT_SALES_HISTORY = register_query("export.sales_history", _EXPORT_SALES_HISTORY.format(
+    products=_EXPORT_GROUP_PRODUCTS, source=_sales_cube_source(_EXPORT_CODPROS),
+))
+EXPORT_SALES_HISTORY_LIVE = register_query("export.sales_history_live", _EXPORT_SALES_HISTORY.format(
+    products=_EXPORT_GROUP_PRODUCTS, source=_sales_live_source(_EXPORT_CODPROS),
+))
+
+EXPORT_STOCK = register_query("export.stock", f"""
+    SELECT g.grouping_crn, g.qualite, s.cod_pro, s.depot, s.stock, s.pmp_eur
+    FROM ({_EXPORT_GROUP_PRODUCTS}) g
+    JOIN CBM_DATA.stock.Fact_Stock_Actuel s WITH (NOLOCK) ON s.cod_pro = g.cod_pro
+    INNER JOIN (
+        SELECT [WarehouseNumber]
+        FROM CBM_DATA.import.companyStatus WITH (NOLOCK)
+        WHERE [AnalysisFlag] = 1
+    ) AS cs ON cs.WarehouseNumber = s.depot
+    ORDER BY g.grouping_crn, g.qualite, s.cod_pro, s.depot
+""")
+
+EXPORT_PURCHASE_PRICES = register_query("export.purchase_prices", f"""
+    SELECT g.grouping_crn, g.qualite, a.cod_pro, a.px_net_eur AS px_achat_eur
+    FROM ({_EXPORT_GROUP_PRODUCTS}) g
+    JOIN CBM_DATA.Pricing.Px_achat_net a WITH (NOLOCK) ON a.cod_pro = g.cod_pro
+    ORDER BY g.grouping_crn, g.qualite, a.cod_pro
+""")
+
+EXPORT_OPTIMISATION_MONITORING = register_query("export.optimisation_monitoring", f"""
+    SELECT m.grouping_crn, m.qualite, m.cod_pro, m.nb_refs,
+           m.ca_12m, m.gain_manque_achat_12m, m.gain_potentiel_achat_6m,
+           m.gain_total_achat_18m, m.gain_total_pmp_18m, m.amelioration_pct,
+           m.generated_at
+    FROM {OPTIMISATION_MONITORING_TABLE} m WITH (NOLOCK)
+    WHERE m.grouping_crn IN ({_GROUPING_CRN_LIST})
+    ORDER BY m.grouping_crn, m.qualite
+""")
@@ -2,10 +2,62 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
-from app.db.engine import engine
+from app.db.engine import read_engine, write_engine
 
-async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+async_session = sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
+# Sessions des batchs (écritures dans les tables matérialisées)
+async_write_session = sessionmaker(write_engine, expire_on_commit=False, class_=AsyncSession)
 
 async def get_session():
     async with async_session() as session:
         yield session
+
+
+async def get_write_session():
+    async with async_write_session() as session:
+        yield session
+
+
+async def run_with_session(fn):
+    """
+    Exécute fn(session) sur une session dédiée du pool de lecture : permet de lancer
+    plusieurs chargements en parallèle (asyncio.gather), une AsyncSession n'acceptant
+    qu'une opération à la fois.
+    """
+    async with async_session() as session:
+        return await fn(session)
+
+
+async def iter_with_session(iter_factory):
+    """
+    Ouvre une session dédiée pour toute la durée d'un flux (StreamingResponse) :
+    la session injectée par Depends(get_db) est fermée avant l'envoi du corps.
+    """
+    async with async_session() as session:
+        async for record in iter_factory(session):
+            yield record
+
+
+async def open_stream_with_session(open_factory):
+    """
+    Variante de iter_with_session dont l'ouverture a lieu avant la réponse :
+    open_factory(session) ouvre le flux (curseur, premier paquet) et retourne
+    l'itérateur du corps. Une erreur d'ouverture remonte donc à l'appelant, qui
+    répond 4xx/5xx au lieu d'un 200 déjà envoyé. La session dédiée est fermée
+    en fin de flux (ou tout de suite en cas d'échec).
+    """
+    session = async_session()
+    try:
+        records = await open_factory(session)
+    except BaseException:
+        await session.close()
+        raise
+
+    async def _records():
+        try:
+            async for record in records:
+                yield record
+        finally:
+            await session.close()
+
+    return _records()
@@ -0,0 +1,77 @@
+# ============================================
+# 📁 backend/app/db/watermark.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+
+# Dernier état connu des jobs de rafraîchissement incrémental (un enregistrement par job)
+REFRESH_WATERMARK_TABLE = "CBM_DATA.cbm_product_explorer.Refresh_Watermark"
+
+
+async def ensure_watermark_table(db: AsyncSession):
+    """
+    Crée la table des watermarks si elle n'existe pas encore.
+    """
+    await db.execute(text(f"""
+        IF OBJECT_ID('{REFRESH_WATERMARK_TABLE}', 'U') IS NULL
+        BEGIN
+            CREATE TABLE {REFRESH_WATERMARK_TABLE} (
+                job_name VARCHAR(100) NOT NULL PRIMARY KEY,
+                last_mvt DATETIME2 NULL,
+                window_start DATE NULL,
+                refreshed_at DATETIME2 NOT NULL
+            )
+        END
+    """))
+    await db.commit()
+
+
+async def get_watermark(job_name: str, db: AsyncSession) -> Optional[Tuple[Optional[datetime], Optional[date], datetime]]:
+    """
+    Retourne (last_mvt, window_start, refreshed_at) ou None si le job n'a jamais tourné.
+    """
+    result = await db.execute(
+        text(f"""
+            SELECT last_mvt, window_start, refreshed_at
+            FROM {REFRESH_WATERMARK_TABLE} WITH (NOLOCK)
+            WHERE job_name = :job_name
+        """),
+        {"job_name": job_name}
+    )
+    row = result.fetchone()
+    return tuple(row) if row else None
+
+
+async def set_watermark(
+    job_name: str,
+    last_mvt: Optional[datetime],
+    window_start: Optional[date],
+    refreshed_at: datetime,
+    db: AsyncSession
+):
+    """
+    Upsert du watermark. Le commit reste à la charge de l'appelant, pour qu'il
+    soit atomique avec les données rafraîchies.
+    """
+    await db.execute(
+        text(f"""
+            MERGE {REFRESH_WATERMARK_TABLE} WITH (HOLDLOCK) AS t
+            USING (SELECT :job_name AS job_name) AS s
+                ON t.job_name = s.job_name
+            WHEN MATCHED THEN
+                UPDATE SET last_mvt = :last_mvt, window_start = :window_start, refreshed_at = :refreshed_at
+            WHEN NOT MATCHED THEN
+                INSERT (job_name, last_mvt, window_start, refreshed_at)
+                VALUES (:job_name, :last_mvt, :window_start, :refreshed_at);
+        """),
+        {
+            "job_name": job_name,
+            "last_mvt": last_mvt,
+            "window_start": window_start,
+            "refreshed_at": refreshed_at,
+        }
+    )
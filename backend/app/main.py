@@ -9,6 +9,7 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import asynccontextmanager
+import asyncio
 import time
 import traceback
 import uuid
@@ -20,9 +21,16 @@ from app.common.exceptions import (
     DatabaseError, 
     CacheError, 
     ValidationError,
+    QueryTimeoutError,
+    JobAlreadyRunningError,
     to_http_exception
 )
-from app.db.engine import test_db_connection
+from app.db.engine import test_db_connection, get_pool_metrics, pool_health_monitor, read_engine, write_engine
+from app.db.queries import get_query_stats
+from app.services.identifiers.identifier_index import identifier_index_refresh_loop
+from app.services.suggestion.prefix_index import suggestion_index_refresh_loop
+from app.services.sales.sales_cube import sales_cube_refresh_loop
+from app.services.groups.groups_summary_store import group_summary_refresh_loop
 # === Routers ===
 from app.routers import routers
 
@@ -61,8 +69,24 @@ async def lifespan(app: FastAPI):
         logger.warning("⚠️ Démarrage avec des services dégradés")
     else:
         logger.info("✅ Backend prêt - Tous les services sont opérationnels")
+
+    # Contrôle périodique des pools DB (remplace le pre-ping)
+    pool_monitor = asyncio.create_task(pool_health_monitor())
+    # Index identifiants en mémoire (chargement initial puis rafraîchissement périodique)
+    identifier_index_task = asyncio.create_task(identifier_index_refresh_loop())
+    # Index préfixes de l'autocomplétion
+    suggestion_index_task = asyncio.create_task(suggestion_index_refresh_loop())
+    # Cube ventes mensuel (rafraîchissement incrémental, un worker par période)
+    sales_cube_task = asyncio.create_task(sales_cube_refresh_loop())
+    # Synthèse des groupes (liste /groups)
+    group_summary_task = asyncio.create_task(group_summary_refresh_loop())
     
     yield
+    pool_monitor.cancel()
+    identifier_index_task.cancel()
+    suggestion_index_task.cancel()
+    sales_cube_task.cancel()
+    group_summary_task.cancel()
     # Fermeture propre de Redis
     import inspect
     try:
@@ -77,6 +101,9 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Redis close: {e}")
 
+    await read_engine.dispose()
+    await write_engine.dispose()
+
     logger.info("🛑 Arrêt du backend CBM_Product_Explorer")
 
 # === FastAPI App ===
@@ -181,6 +208,8 @@ async def cbm_exception_handler(request: Request, exc: CBMBaseException):
     # Mapping des exceptions vers codes HTTP
     status_codes = {
         DatabaseError: 503,
+        QueryTimeoutError: 504,
+        JobAlreadyRunningError: 409,
         CacheError: 503,
         ValidationError: 422,
     }
@@ -296,7 +325,7 @@ async def healthcheck():
     # Test Database
     try:
         db_ok = await test_db_connection()
-        checks["database"] = {"status": "healthy" if db_ok else "unhealthy"}
+        checks["database"] = {"status": "healthy" if db_ok else "unhealthy", "pools": get_pool_metrics()}
         if not db_ok:
             overall_status = "degraded"
     except Exception as e:
@@ -321,6 +350,11 @@ async def healthcheck():
         }
     )
 
+@app.get("/healthcheck/queries")
+async def healthcheck_queries():
+    """Temps d'exécution cumulés des requêtes nommées (app.db.queries) depuis le démarrage"""
+    return {"timestamp": time.time(), "queries": get_query_stats()}
+
 @app.get("/")
 async def root():
     """Endpoint racine avec informations API"""
@@ -9,6 +9,8 @@ from app.routers.stock.stock_router import router as stock_router
 from app.routers.sales.sales_router import router as sales_router
 from app.routers.purchase.purchase_router import router as purchase_router
 from app.routers.optimisation.optimisation_router import router as optimisation_router
+from app.routers.groups.groups_router import router as groups_router
+from app.routers.export.export_router import router as export_router
 
 routers = [
     identifier_router,
@@ -22,6 +24,8 @@ routers = [
     sales_router,
     purchase_router,
     optimisation_router,
+    groups_router,
+    export_router,
 ]
 
 # Laisse __all__ explicite, c'est plus propre
@@ -37,4 +41,6 @@ __all__ = [
     "sales_router",
     "purchase_router",
     "optimisation_router",
+    "groups_router",
+    "export_router",
 ]
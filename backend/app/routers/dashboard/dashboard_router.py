@@ -1,18 +1,38 @@
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.dependencies import get_db
-from app.schemas.dashboard.dashboard_schema import DashboardFicheResponse, DashboardFilterRequest
-from app.services.dashboard.dashboard_service import get_dashboard_fiche
+from app.schemas.dashboard.dashboard_schema import (
+    DashboardFicheResponse,
+    DashboardFilterRequest,
+    DashboardBulkRequest,
+    DashboardBulkResponse,
+)
+from app.services.dashboard.dashboard_service import get_dashboard_fiche, get_dashboard_fiches_bulk
+from app.common.disconnect import cancel_on_disconnect
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 
 @router.post("/fiche", response_model=DashboardFicheResponse)
 async def dashboard_fiche(
+    request: Request,
     payload: DashboardFilterRequest = Body(...),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Retourne toutes les informations d’une fiche produit (détails, ventes, stock, achat).
     """
-    return await get_dashboard_fiche(payload, db)
+    return await cancel_on_disconnect(request, get_dashboard_fiche(payload, db))
+
+
+@router.post("/fiche/bulk", response_model=DashboardBulkResponse)
+async def dashboard_fiche_bulk(
+    request: Request,
+    payload: DashboardBulkRequest = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Fiches produit pour une liste d'identifiants : une requête par bloc pour l'ensemble
+    des produits au lieu d'un appel /fiche par produit.
+    """
+    return await cancel_on_disconnect(request, get_dashboard_fiches_bulk(payload, db))
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Body, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal
+from app.db.session import open_stream_with_session
+from app.schemas.export.export_schema import ExportRequest
+from app.services.export.export_service import open_export
+from app.services.export.export_formats import (
+    ARROW_FORMATS,
+    EXPORT_EXTENSIONS,
+    EXPORT_MEDIA_TYPES,
+    PYARROW_AVAILABLE,
+)
+from app.common.exceptions import HTTPBadRequest
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+@router.post("/{dataset}")
+async def export_dataset(
+    dataset: Literal["sales_history", "stock", "purchase_prices", "optimisation_monitoring"],
+    payload: ExportRequest = Body(...),
+    format: Literal["csv", "arrow", "parquet"] = Query("csv", description="csv (chunké), arrow (IPC stream) ou parquet"),
+    months: int = Query(12, ge=1, le=60, description="Profondeur de l'historique des ventes (mois)"),
+):
+    """
+    📤 EXPORT EN FLUX
+
+    Ventes mensuelles, stock, prix d'achat ou résultats d'optimisation des groupes demandés,
+    lus en curseur serveur et encodés par paquets : mémoire constante côté API,
+    fichier directement exploitable (pandas / Excel / Arrow) côté client.
+    """
+    if format in ARROW_FORMATS and not PYARROW_AVAILABLE:
+        raise HTTPBadRequest(f"Format {format} indisponible (pyarrow non installé) : utiliser format=csv")
+
+    # Curseur ouvert et premier paquet lu avant la réponse : une erreur SQL
+    # (timeout → 504) n'arrive pas après un 200 et un en-tête CSV déjà envoyés
+    body = await open_stream_with_session(
+        lambda session: open_export(dataset, payload.grouping_crn_list, session, format, months)
+    )
+    filename = f"{dataset}.{EXPORT_EXTENSIONS[format]}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
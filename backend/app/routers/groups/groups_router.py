@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, Query, Body
+from fastapi import APIRouter, Depends, Query, Body, Request
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.dependencies import get_db
+from app.db.dependencies import get_db, get_write_db
 from app.schemas.groups.groups_schema import (
     GroupsFilterRequest,
     GroupsResponse,
@@ -8,14 +9,39 @@ from app.schemas.groups.groups_schema import (
 from app.services.groups.groups_service import (
     get_groups,
 )
+from app.common.disconnect import cancel_on_disconnect
+from app.services.groups.groups_summary_store import (
+    refresh_group_summary,
+    get_group_summary_status,
+)
 
 router = APIRouter(prefix="/groups", tags=["Groups"])
 
 @router.post("/list", response_model=GroupsResponse)
 async def groups_list(
+    request: Request,
     payload: GroupsFilterRequest = Body(...),
     page: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=400),
+    cursor: Optional[str] = Query(None, description="next_cursor de la page précédente (pagination keyset, ignore page)"),
+    live: bool = Query(False, description="Recalculer sur les tables de faits au lieu de Group_Summary"),
     db: AsyncSession = Depends(get_db),
 ):
-    return await get_groups(payload, db, page, limit)
+    return await cancel_on_disconnect(request, get_groups(payload, db, page, limit, cursor, live))
+
+
+@router.post("/summary/refresh")
+async def groups_summary_refresh(
+    full: bool = Query(False, description="Reconstruction complète au lieu de l'incrémental"),
+    db: AsyncSession = Depends(get_write_db),
+):
+    """
+    Rafraîchit Group_Summary à partir des mouvements postérieurs au dernier watermark.
+    409 si un rafraîchissement est déjà en cours (tâche périodique ou autre appel).
+    """
+    return await refresh_group_summary(db, full=full)
+
+
+@router.get("/summary/status")
+async def groups_summary_status(db: AsyncSession = Depends(get_db)):
+    return await get_group_summary_status(db)
@@ -1,10 +1,26 @@
 # backend/app/routers/identifiers/identifier_router.py
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.dependencies import get_db
-from app.services.identifiers.identifier_service import get_codpro_list_from_identifier
-from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest, CodProListResponse
+from app.db.dependencies import get_db, get_write_db
+from app.db.session import iter_with_session
+from app.common.streaming import ndjson_response
+from app.common.disconnect import cancel_on_disconnect
+from app.services.identifiers.identifier_service import (
+    get_codpro_list_from_identifier,
+    get_codpro_lists_bulk,
+    iter_resolve_identifiers_bulk,
+)
+from app.services.identifiers.identifier_index import (
+    refresh_identifier_index,
+    get_identifier_index_status,
+)
+from app.schemas.identifiers.identifier_schema import (
+    ProductIdentifierRequest,
+    CodProListResponse,
+    BulkIdentifierRequest,
+    BulkIdentifierResponse,
+)
 
 router = APIRouter(prefix="/identifiers", tags=["Identifiers"])
 
@@ -17,3 +33,40 @@ async def resolve_codpro_list_route(
     Résout une ou plusieurs références produit (cod_pro_list) à partir d'un identifiant produit.
     """
     return await get_codpro_list_from_identifier(payload, db)
+
+
+@router.post("/resolve-codpro/bulk", response_model=BulkIdentifierResponse)
+async def resolve_codpro_bulk_route(
+    payload: BulkIdentifierRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Résolution en masse (refint, ref_ext, ref_crn, cod_pro) : un résultat par élément,
+    dans l'ordre de la requête. Pour de très gros volumes, préférer /resolve-codpro/bulk/stream.
+    """
+    return await cancel_on_disconnect(request, get_codpro_lists_bulk(payload, db))
+
+
+@router.post("/resolve-codpro/bulk/stream")
+async def resolve_codpro_bulk_stream_route(payload: BulkIdentifierRequest):
+    """
+    Résolution en masse en flux NDJSON : une ligne par élément, émise lot par lot.
+    """
+    return ndjson_response(
+        iter_with_session(lambda session: iter_resolve_identifiers_bulk(payload.items, session))
+    )
+
+
+@router.post("/index/refresh")
+async def identifier_index_refresh(db: AsyncSession = Depends(get_write_db)):
+    """
+    Reconstruit l'index identifiants depuis Grouping_crn_table et publie le snapshot
+    (les autres workers le rechargent à leur prochain cycle).
+    """
+    return await refresh_identifier_index(db)
+
+
+@router.get("/index/status")
+async def identifier_index_status():
+    return get_identifier_index_status()
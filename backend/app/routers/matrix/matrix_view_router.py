@@ -1,27 +1,39 @@
 # backend/app/routers/matrix/matrix_view_router.py
 
-from fastapi import APIRouter, Depends, Body, Query, HTTPException
+from fastapi import APIRouter, Depends, Body, Query, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from typing import Literal, Union
 from app.db.dependencies import get_db
+from app.db.session import iter_with_session
+from app.db.queries import execute_text
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.schemas.matrix.matrix_view_schema import (
     MatrixViewResponse,
+    MatrixViewCompactResponse,
+    MatrixViewWindowResponse,
     MatrixViewFilterRequest
 )
 from app.services.matrix.matrix_view_service import (
     get_matrix_view_data,
-    get_matrix_view_filtered
+    get_matrix_view_filtered,
+    get_matrix_view_compact,
+    get_matrix_view_window,
+    iter_matrix_view
 )
+from app.common.streaming import ndjson_response
+from app.common.disconnect import cancel_on_disconnect
 from app.common.logger import logger
 
 
 router = APIRouter(prefix="/matrix", tags=["Matrix View"])
 
 
-@router.post("/view", response_model=MatrixViewResponse)
+@router.post("/view", response_model=Union[MatrixViewResponse, MatrixViewCompactResponse])
 async def get_matrix_view(
+    request: Request,
     payload: ProductIdentifierRequest = Body(...),
+    format: Literal["full", "compact"] = Query("full", description="compact = colonnes dictionnaire + correspondances CSR"),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -34,6 +46,7 @@ async def get_matrix_view(
     
     Args:
         payload: Critères d'identification des produits (cod_pro, ref_crn, refint, etc.)
+        format: `full` (objets par cellule) ou `compact` (MatrixViewCompactResponse)
         
     Returns:
         MatrixViewResponse: Structure complète pour affichage matriciel
@@ -51,8 +64,50 @@ async def get_matrix_view(
         }
         ```
     """
-    logger.info(f"🎯 Matrix view request: {payload}")
-    return await get_matrix_view_data(payload, db)
+    logger.info(f"🎯 Matrix view request: {payload} (format={format})")
+    if format == "compact":
+        return await cancel_on_disconnect(request, get_matrix_view_compact(payload, db))
+    return await cancel_on_disconnect(request, get_matrix_view_data(payload, db))
+
+
+@router.post("/view/window", response_model=MatrixViewWindowResponse)
+async def get_matrix_view_window_route(
+    request: Request,
+    payload: ProductIdentifierRequest = Body(...),
+    row_offset: int = Query(0, ge=0, description="Première ligne (produit) de la fenêtre"),
+    row_limit: int = Query(100, ge=1, le=1000, description="Nombre de lignes"),
+    col_offset: int = Query(0, ge=0, description="Première colonne (référence) de la fenêtre"),
+    col_limit: int = Query(50, ge=1, le=1000, description="Nombre de colonnes"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Fenêtre de la vue matricielle pour le scroll virtuel : seules les lignes, colonnes
+    et cellules de la fenêtre sont renvoyées ; totaux et statistiques portent sur la famille.
+    """
+    return await cancel_on_disconnect(
+        request,
+        get_matrix_view_window(payload, db, row_offset, row_limit, col_offset, col_limit)
+    )
+
+
+@router.post("/view/stream")
+async def stream_matrix_view(
+    payload: ProductIdentifierRequest = Body(...)
+):
+    """
+    Vue matricielle en streaming NDJSON (`application/x-ndjson`).
+
+    Une ligne JSON par enregistrement, discriminée par `type` :
+    - `column` : référence colonne (ref, type, color_code)
+    - `product` : détail produit (ligne de la matrice)
+    - `correspondence` : cellule cod_pro ↔ ref_crn/ref_ext
+    - `meta` : totaux et statistiques (toujours en dernier)
+
+    Hors cache, les produits et les colonnes + correspondances sont émis par bloc,
+    dans l'ordre où leurs requêtes se terminent.
+    """
+    logger.info(f"🎯 Matrix view stream request: {payload}")
+    return ndjson_response(iter_with_session(lambda session: iter_matrix_view(payload, session)))
 
 
 @router.post("/view/filtered", response_model=MatrixViewResponse)
@@ -117,7 +172,7 @@ async def get_cell_detail(
             AND (bp.ref_crn = :ref OR br.ref_ext = :ref OR dp.refint = :ref)
         """)
         
-        result = await db.execute(query, {"cod_pro": cod_pro, "ref": ref})
+        result = await execute_text(db, "matrix.cell_details", query, {"cod_pro": cod_pro, "ref": ref})
         row = result.first()
         
         if not row:
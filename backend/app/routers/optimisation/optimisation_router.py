@@ -1,26 +1,51 @@
-from fastapi import APIRouter, Depends, Body, HTTPException, Query
+from fastapi import APIRouter, Depends, Body, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from app.db.dependencies import get_db
+from app.db.dependencies import get_db, get_write_db
+from app.db.session import iter_with_session
+from app.db.queries import execute_text
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
-from app.schemas.optimisation.optimisation_schema import GroupOptimizationListResponse
-from app.services.optimisation.optimisation_service import evaluate_group_optimization
+from app.schemas.optimisation.optimisation_schema import (
+    GroupOptimizationListResponse,
+    GroupOptimizationPageResponse,
+)
+from app.services.optimisation.optimisation_service import get_group_optimization, iter_group_optimization
+from app.services.optimisation.optimisation_store import list_materialized_groups
+from app.common.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MIN_PAGE_SIZE
+from app.common.exceptions import HTTPBadRequest
+from app.common.streaming import ndjson_response
+from app.common.disconnect import cancel_on_disconnect
 from typing import Optional
 from app.common.logger import logger
 from datetime import datetime
+from app.common.date_service import PeriodWindow
 
 router = APIRouter(prefix="/optimisation", tags=["Optimisation"])
 
 @router.post("/optimisation", response_model=GroupOptimizationListResponse)
 async def matrix_optimization_route(
+    request: Request,
     payload: ProductIdentifierRequest,
+    live: bool = Query(False, description="Forcer le recalcul live (ignore les résultats matérialisés)"),
     db: AsyncSession = Depends(get_db)
 ):
-    return await evaluate_group_optimization(payload, db)
+    return await cancel_on_disconnect(request, get_group_optimization(payload, db, live=live))
+
+@router.post("/optimisation/stream")
+async def matrix_optimization_stream_route(
+    payload: ProductIdentifierRequest,
+    live: bool = Query(False, description="Forcer le recalcul live (ignore les résultats matérialisés)")
+):
+    """
+    Variante streaming NDJSON : un GroupOptimization par ligne, émis dès qu'il est calculé.
+    """
+    return ndjson_response(
+        iter_with_session(lambda session: iter_group_optimization(payload, session, live=live))
+    )
 
 @router.get("/groups", response_model=GroupOptimizationListResponse)
 async def get_optimisation_groups(
     grouping_crn: Optional[int] = Query(None, description="CRN spécifique"),
+    live: bool = Query(False, description="Forcer le recalcul live (ignore les résultats matérialisés)"),
     db: AsyncSession = Depends(get_db)
 ):
     try:
@@ -31,24 +56,55 @@ async def get_optimisation_groups(
                 WHERE grouping_crn = :grouping_crn
                   AND qualite IN ('OEM','PMQ','PMV')
             """
-            result = await db.execute(text(query), {'grouping_crn': grouping_crn})
+            result = await execute_text(db, "optimisation.group_members", query, {'grouping_crn': grouping_crn})
             cod_pro_list = [row[0] for row in result.fetchall()]
             if not cod_pro_list:
                 return GroupOptimizationListResponse(items=[])
 
+            # Liste complète du groupe : servie par le store matérialisé s'il est à jour
             payload = ProductIdentifierRequest(
                 cod_pro_list=cod_pro_list,
-                grouping_crn=grouping_crn,
                 single_cod_pro=False
             )
         else:
             payload = ProductIdentifierRequest(single_cod_pro=False)
 
-        return await evaluate_group_optimization(payload, db)
+        return await get_group_optimization(payload, db, live=live)
     except Exception as e:
         logger.error(f"💥 Erreur GET groups: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/groups/list", response_model=GroupOptimizationPageResponse)
+async def list_optimisation_groups(
+    sort_by: Optional[str] = Query("gain_total_achat_18m", description="gain_total_achat_18m, gain_total_pmp_18m, amelioration_pct, refs_total, ca_12m..."),
+    sort_dir: Optional[str] = Query("desc", description="asc / desc"),
+    cursor: Optional[str] = Query(None, description="Curseur renvoyé par la page précédente"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=MIN_PAGE_SIZE, le=MAX_PAGE_SIZE),
+    qualite: Optional[str] = Query(None, description="Filtrer par qualité (OEM/PM)"),
+    min_gain: Optional[float] = Query(None, ge=0, description="Gain total 18m minimum en €"),
+    summary_only: bool = Query(True, description="False = joindre l'historique et la projection mensuels"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    📄 LISTE PAGINÉE DES GROUPES OPTIMISÉS
+
+    Pagination keyset sur les résultats du batch (Optimisation_Monitoring).
+    Par défaut seuls les totaux sont renvoyés, sans les tableaux mensuels.
+    """
+    try:
+        return await list_materialized_groups(
+            db,
+            sort_by=sort_by,
+            sort_dir=sort_dir,
+            cursor=cursor,
+            limit=limit,
+            qualite=qualite,
+            min_gain=min_gain,
+            summary_only=summary_only,
+        )
+    except ValueError as e:
+        raise HTTPBadRequest(str(e))
+
 @router.get("/debug/{grouping_crn}")
 async def debug_projection_quality(
     grouping_crn: int,
@@ -65,8 +121,8 @@ async def debug_projection_quality(
             LEFT JOIN (
                 SELECT v.cod_pro, SUM(v.tot_vte_eur) AS ca_total, SUM(v.qte) AS quantite_total
                 FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
-                WHERE v.dat_mvt >= DATEADD(MONTH,-12,DATEADD(DAY, 1-DAY(CONVERT(DATE, GETDATE())), CONVERT(DATE, GETDATE())))
-                AND v.dat_mvt < DATEADD(DAY, 1-DAY(CONVERT(DATE, GETDATE())), CONVERT(DATE, GETDATE()))
+                WHERE v.dat_mvt >= :window_start
+                AND v.dat_mvt < :window_end
                 GROUP BY v.cod_pro
             ) s ON dp.cod_pro = s.cod_pro
             WHERE dp.grouping_crn = :grouping_crn
@@ -75,7 +131,11 @@ async def debug_projection_quality(
             GROUP BY dp.grouping_crn, dp.qualite
             ORDER BY dp.qualite
         """
-        result = await db.execute(text(query), {'grouping_crn': grouping_crn, 'qualite': qualite})
+        window = PeriodWindow.last_n_months(12, include_current=False)
+        result = await execute_text(
+            db, "optimisation.debug_projection", query,
+            {'grouping_crn': grouping_crn, 'qualite': qualite, **window.sql_params()}
+        )
         rows = result.fetchall()
         if not rows:
             raise HTTPException(status_code=404, detail=f"Aucune donnée pour grouping_crn {grouping_crn}")
@@ -129,12 +189,14 @@ async def optimization_health_check():
 
 @router.post("/batch/run")
 async def run_optimization_batch(
-    db: AsyncSession = Depends(get_db)
+    refresh_stale: bool = Query(False, description="Recalculer aussi les groupes dont le détail matérialisé est périmé"),
+    db: AsyncSession = Depends(get_write_db)
 ):
     """
     🚀 LANCE LE BATCH D'OPTIMISATION COMPLET
     
-    Calcule l'optimisation pour TOUS les groupes et sauvegarde dans la table Analytics.
+    Calcule l'optimisation pour TOUS les groupes et sauvegarde dans la table Analytics,
+    ainsi que le détail complet (historique/projection) servi par l'API.
     ⚠️ Attention : peut prendre plusieurs minutes selon le nombre de groupes
     """
     try:
@@ -143,7 +205,7 @@ async def run_optimization_batch(
         logger.info("🎬 Lancement batch optimisation via API")
         
         # Lancement asynchrone du batch
-        await run_full_optimisation_batch(db)
+        await run_full_optimisation_batch(db, refresh_stale=refresh_stale)
         
         return {
             "status": "success",
@@ -178,7 +240,7 @@ async def get_batch_status(
             FROM CBM_DATA.Analytics.Optimisation_Monitoring
         """
         
-        result = await db.execute(text(query))
+        result = await execute_text(db, "optimisation.batch_status", query)
         row = result.fetchone()
         
         if not row or row[0] == 0:
@@ -242,7 +304,7 @@ async def get_top_opportunities(
         if qualite:
             params["qualite"] = qualite
         
-        result = await db.execute(text(query), params)
+        result = await execute_text(db, "optimisation.top_opportunities", query, params)
         rows = result.fetchall()
         
         opportunities = []
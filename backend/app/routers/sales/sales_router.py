@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, Body, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.dependencies import get_db
+from app.db.dependencies import get_db, get_write_db
+from app.db.session import iter_with_session
+from app.common.streaming import ndjson_response
 from app.schemas.sales.sales_schema import (
     ProductSalesHistoryResponse,
     ProductSalesAggregateResponse
 )
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
-from app.services.sales.sales_service import get_sales_history, get_sales_aggregate
+from app.services.sales.sales_service import get_sales_history, get_sales_aggregate, iter_sales_history
+from app.services.sales.sales_cube import refresh_sales_cube
 
 router = APIRouter(prefix="/sales", tags=["Sales"])
 
@@ -21,6 +24,18 @@ async def sales_history(
     """
     return await get_sales_history(payload, db, last_n_months)
 
+@router.post("/history/stream")
+async def sales_history_stream(
+    payload: ProductIdentifierRequest = Body(...),
+    last_n_months: int = Query(12, ge=1, le=36)
+):
+    """
+    Variante streaming NDJSON de /history : une ligne par (cod_pro, mois), lue en curseur serveur.
+    """
+    return ndjson_response(
+        iter_with_session(lambda session: iter_sales_history(payload, session, last_n_months))
+    )
+
 @router.post("/aggregate", response_model=ProductSalesAggregateResponse)
 async def sales_aggregate(
     payload: ProductIdentifierRequest = Body(...),
@@ -30,3 +45,15 @@ async def sales_aggregate(
     Récupère un agrégat global des ventes pour une ou plusieurs références.
     """
     return await get_sales_aggregate(payload, db)
+
+
+@router.post("/cube/refresh")
+async def sales_cube_refresh(
+    full: bool = Query(False, description="Reconstruction complète au lieu de l'incrémental"),
+    db: AsyncSession = Depends(get_write_db)
+):
+    """
+    Rafraîchit le cube ventes mensuel à partir des mouvements postérieurs au dernier watermark.
+    409 si un rafraîchissement est déjà en cours (tâche périodique, batch ou autre appel).
+    """
+    return await refresh_sales_cube(db, full=full)
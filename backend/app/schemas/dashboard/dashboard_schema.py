@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 from app.schemas.products.detail_schema import ProductDetail
@@ -29,3 +29,19 @@ class DashboardFilterRequest(BaseModel):
     statut: Optional[int] = None
     statut_clean: Optional[str] = None
     grouping_crn: Optional[int] = 0
+
+
+class DashboardBulkRequest(BaseModel):
+    items: List[DashboardFilterRequest] = Field(..., min_length=1, max_length=1000, description="Identifiants produits (une fiche par élément)")
+
+
+class DashboardBulkItem(BaseModel):
+    request: DashboardFilterRequest
+    cod_pro_list: List[int]
+    fiche: DashboardFicheResponse
+
+
+class DashboardBulkResponse(BaseModel):
+    items: List[DashboardBulkItem]
+    total_cod_pro: int = Field(..., description="Nombre de cod_pro distincts chargés (union des fiches)")
+    failed_blocks: List[str] = Field(default_factory=list, description="Blocs en erreur, renvoyés vides dans toutes les fiches")
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class ExportRequest(BaseModel):
+    """
+    Groupes (grouping_crn) à exporter : toutes les qualités et tous les cod_pro de chaque groupe.
+    """
+    grouping_crn_list: List[int] = Field(..., min_length=1, max_length=20_000, description="Liste des grouping_crn à exporter")
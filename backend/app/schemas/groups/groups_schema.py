@@ -21,3 +21,4 @@ class GroupOut(BaseModel):
 class GroupsResponse(BaseModel):
     total: int
     rows: List[GroupOut]
+    next_cursor: Optional[str] = None  # pagination keyset : à repasser en ?cursor=
@@ -30,3 +30,21 @@ class CodProListResponse(BaseModel):
     Liste des cod_pro résolus à partir des identifiants fournis.
     """
     cod_pro_list: List[int] = Field(..., description="Liste de codes produits résolus")
+
+
+class BulkIdentifierRequest(BaseModel):
+    """
+    Résolution en masse : un résultat par élément, dans l'ordre de la requête.
+    """
+    items: List[ProductIdentifierRequest] = Field(..., min_length=1, max_length=100_000, description="Identifiants à résoudre")
+
+
+class BulkIdentifierResult(BaseModel):
+    index: int = Field(..., description="Position de l'élément dans la requête")
+    request: ProductIdentifierRequest
+    cod_pro_list: List[int] = Field(..., description="Liste de codes produits résolus")
+
+
+class BulkIdentifierResponse(BaseModel):
+    results: List[BulkIdentifierResult]
+    resolved: int = Field(..., description="Nombre d'éléments résolus (au moins un cod_pro)")
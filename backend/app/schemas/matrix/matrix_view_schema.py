@@ -2,7 +2,7 @@
 # 📁 backend/app/schemas/matrix/matrix_view_schema.py - VERSION SIMPLE
 # ===================================
 
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 from app.schemas.products.detail_schema import ProductDetail  # UTILISER L'EXISTANT
 
@@ -40,6 +40,53 @@ class MatrixViewResponse(BaseModel):
     column_type_stats: dict = Field(default_factory=dict, description="Répartition des colonnes par type")
     quality_stats: dict = Field(default_factory=dict, description="Répartition par qualité")
 
+class MatrixViewCompactResponse(BaseModel):
+    """
+    Vue matricielle compacte (format=compact) : colonnes encodées par dictionnaire
+    et correspondances en CSR (une ligne par cod_pro) au lieu d'un objet par cellule.
+
+    Les correspondances de la ligne i sont aux positions row_ptr[i]..row_ptr[i+1]-1
+    de crn_col / ext_col, qui donnent l'indice de la colonne dans refs (-1 = absente).
+    """
+    products: List[ProductDetail] = Field(..., description="Liste des produits avec détails complets")
+
+    # Colonnes : dictionnaire des références et type de chaque colonne
+    refs: List[str] = Field(..., description="Références colonnes (triées)")
+    ref_types: List[int] = Field(..., description="Type de chaque colonne (indice dans type_codes)")
+    type_codes: List[str] = Field(..., description="Types de colonne: 'crn_only', 'ext_only', 'both'")
+    type_colors: Dict[str, str] = Field(..., description="Code couleur par type de colonne")
+
+    # Correspondances (CSR)
+    row_cod_pros: List[int] = Field(..., description="cod_pro de chaque ligne")
+    row_ptr: List[int] = Field(..., description="Début des correspondances de chaque ligne (len = lignes + 1)")
+    crn_col: List[int] = Field(..., description="Colonne du ref_crn de chaque correspondance (-1 = aucun)")
+    ext_col: List[int] = Field(..., description="Colonne du ref_ext de chaque correspondance (-1 = aucun)")
+
+    # Métadonnées
+    total_products: int = Field(..., description="Nombre total de produits")
+    total_columns: int = Field(..., description="Nombre total de colonnes")
+    total_correspondences: int = Field(..., description="Nombre total de correspondances")
+    column_type_stats: dict = Field(default_factory=dict, description="Répartition des colonnes par type")
+    quality_stats: dict = Field(default_factory=dict, description="Répartition par qualité")
+
+class MatrixViewWindowResponse(BaseModel):
+    """
+    Fenêtre (lignes × colonnes) de la vue matricielle pour le scroll virtuel.
+    Les totaux et statistiques portent sur toute la famille.
+    """
+    products: List[ProductDetail] = Field(..., description="Produits des lignes de la fenêtre")
+    column_refs: List[MatrixColumnRef] = Field(..., description="Colonnes de la fenêtre")
+    correspondences: List[ProductCorrespondence] = Field(..., description="Cellules de la fenêtre")
+
+    row_offset: int = Field(..., description="Indice de la première ligne")
+    col_offset: int = Field(..., description="Indice de la première colonne")
+
+    total_products: int = Field(..., description="Nombre total de produits")
+    total_columns: int = Field(..., description="Nombre total de colonnes")
+    total_correspondences: int = Field(..., description="Nombre total de correspondances")
+    column_type_stats: dict = Field(default_factory=dict, description="Répartition des colonnes par type")
+    quality_stats: dict = Field(default_factory=dict, description="Répartition par qualité")
+
 # Filtres pour les endpoints qui en auraient besoin
 class MatrixViewFilterRequest(BaseModel):
     """
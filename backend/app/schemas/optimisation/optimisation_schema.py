@@ -153,3 +153,28 @@ class GroupOptimization(BaseModel):
 # ==========================================
 class GroupOptimizationListResponse(BaseModel):
     items: List[GroupOptimization]
+
+# ==========================================
+# LISTE PAGINÉE (keyset, depuis Optimisation_Monitoring)
+# ==========================================
+class GroupOptimizationSummary(BaseModel):
+    grouping_crn: int
+    qualite: str
+    cod_pro: Optional[int] = Field(None, description="Référence conservée")
+    refs_total: int
+    ca_12m: float
+    gain_manque_achat_12m: float
+    gain_potentiel_achat_6m: float
+    gain_total_achat_18m: float
+    gain_total_pmp_18m: float
+    amelioration_pct: float
+    generated_at: Optional[str] = None
+
+class GroupOptimizationPageResponse(BaseModel):
+    items: List[GroupOptimizationSummary]
+    details: List[GroupOptimization] = Field(default_factory=list, description="Détail complet (vide si summary_only)")
+    next_cursor: Optional[str] = Field(None, description="Curseur de la page suivante (None = dernière page)")
+    has_more: bool
+    limit: int
+    sort_by: str
+    sort_dir: str
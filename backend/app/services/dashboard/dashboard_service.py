@@ -1,17 +1,33 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.utils.identifier_utils import resolve_codpro_list
-from app.services.products.detail_service import get_product_details
-from app.services.sales.sales_service import get_sales_aggregate , get_sales_history
-from app.services.stock.stock_service import get_stock_actuel
-from app.services.purchase.purchase_service import get_purchase_price
-from app.services.products.match_service import get_codpro_match_list
-
-from app.schemas.dashboard.dashboard_schema import DashboardFilterRequest, DashboardFicheResponse
+from app.utils.identifier_utils import resolve_codpro_list, resolve_codpro_lists_bulk
+from app.services.products.detail_service import get_product_details, load_product_details
+from app.services.sales.sales_service import (
+    get_sales_aggregate,
+    get_sales_history,
+    load_sales_aggregate,
+    load_sales_history,
+)
+from app.services.stock.stock_service import get_stock_actuel, load_stock_actuel
+from app.services.purchase.purchase_service import get_purchase_price, load_purchase_prices
+from app.services.products.match_service import get_codpro_match_list, load_codpro_matches
+
+from app.schemas.dashboard.dashboard_schema import (
+    DashboardFilterRequest,
+    DashboardFicheResponse,
+    DashboardBulkRequest,
+    DashboardBulkItem,
+    DashboardBulkResponse,
+)
 from app.schemas.products.match_schema import ProductMatchListResponse
 from app.common.payload_utils import is_payload_empty
+from app.common.date_service import PeriodWindow
+from app.common.constants import REDIS_TTL_MEDIUM
 
 from app.common.logger import logger
+from app.common.single_flight import single_flight
 from app.cache.cache_keys import (
+    single_flight_key,
+    dashboard_fiche_key,
     dashboard_products_key,
     dashboard_sales_key,
     dashboard_stock_key,
@@ -19,6 +35,9 @@ from app.cache.cache_keys import (
     dashboard_matches_key,
 )
 from app.common.redis_client import redis_client
+from app.db.session import run_with_session
+from app.settings import get_settings
+import asyncio
 import json
 
 
@@ -33,6 +52,31 @@ async def get_dashboard_fiche(payload: DashboardFilterRequest, db: AsyncSession)
             matches=[]
         )
 
+    # ✅ Fiche complète en cache (clé = payload + fenêtre 12 mois) : lue avant toute résolution
+    key_fiche = dashboard_fiche_key(payload, PeriodWindow.last_n_months(12).cache_token)
+    try:
+        if cached := await redis_client.get(key_fiche):
+            logger.debug(f"✅ Cache hit dashboard:fiche")
+            return DashboardFicheResponse(**json.loads(cached))
+    except Exception:
+        logger.exception("[Redis] fallback dashboard:fiche")
+
+    # ✅ Requêtes identiques concurrentes : un seul calcul partagé
+    key = single_flight_key("dashboard:fiche", payload.model_dump(exclude_none=True))
+    response = await single_flight(key, lambda: _build_dashboard_fiche(payload, db), DashboardFicheResponse)
+
+    # Pas de cache des fiches vides (identifiant inconnu à ce jour)
+    if response.details or response.matches:
+        try:
+            await redis_client.set(key_fiche, response.model_dump_json(), ex=REDIS_TTL_MEDIUM)
+        except Exception:
+            logger.exception("[Redis] set dashboard:fiche")
+
+    return response
+
+
+async def _build_dashboard_fiche(payload: DashboardFilterRequest, db: AsyncSession) -> DashboardFicheResponse:
+
     # ✅ Résolution cod_pro_list
     cod_pro_list = await resolve_codpro_list(payload, db)
     if not cod_pro_list:
@@ -150,3 +194,72 @@ async def get_dashboard_fiche(payload: DashboardFilterRequest, db: AsyncSession)
         purchase=purchase,
         matches=matches
     )
+
+
+async def get_dashboard_fiches_bulk(payload: DashboardBulkRequest, db: AsyncSession) -> DashboardBulkResponse:
+    """
+    Fiches produit en masse : tous les identifiants sont résolus en une passe, puis
+    chaque bloc (détails, ventes, historique, stock, achat, correspondances) est chargé
+    par une seule requête sur l'union des cod_pro et redistribué par fiche.
+
+    Les blocs sont chargés sur des sessions distinctes, au plus DASHBOARD_BULK_MAX_SESSIONS
+    à la fois. Un bloc en erreur est renvoyé vide et listé dans failed_blocks, sans
+    faire échouer les autres.
+    """
+    cod_pro_lists = await resolve_codpro_lists_bulk(payload.items, db)
+    union = sorted({int(c) for cod_pro_list in cod_pro_lists for c in cod_pro_list})
+    logger.info(f"📦 Fiches en masse: {len(payload.items)} demandes, {len(union)} cod_pro distincts")
+
+    failed_blocks = []
+    if union:
+        window = PeriodWindow.last_n_months(12)
+        sessions = asyncio.Semaphore(get_settings().DASHBOARD_BULK_MAX_SESSIONS)
+
+        async def _load(block: str, loader) -> list:
+            try:
+                async with sessions:
+                    return await run_with_session(loader)
+            except Exception as e:
+                logger.error(f"❌ Erreur chargement {block} fiches en masse ({len(union)} cod_pro): {e}")
+                failed_blocks.append(block)
+                return []
+
+        blocks = await asyncio.gather(
+            _load("details", lambda session: load_product_details(union, session)),
+            _load("sales", lambda session: load_sales_aggregate(union, session, window)),
+            _load("history", lambda session: load_sales_history(union, session, window)),
+            _load("stock", lambda session: load_stock_actuel(union, session)),
+            _load("purchase", lambda session: load_purchase_prices(union, session)),
+            _load("matches", lambda session: load_codpro_matches(union, session)),
+        )
+    else:
+        blocks = [[] for _ in range(6)]
+
+    # cod_pro → lignes de chaque bloc (l'ordre des lignes est conservé)
+    by_codpro = []
+    for rows in blocks:
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(int(row["cod_pro"]), []).append(row)
+        by_codpro.append(grouped)
+
+    def _pick(block: int, cod_pro_list: list) -> list:
+        return [row for c in dict.fromkeys(cod_pro_list) for row in by_codpro[block].get(int(c), [])]
+
+    items = []
+    for request, cod_pro_list in zip(payload.items, cod_pro_lists):
+        sales = sorted(_pick(1, cod_pro_list), key=lambda item: item["ca_total"], reverse=True)
+        items.append(DashboardBulkItem(
+            request=request,
+            cod_pro_list=cod_pro_list,
+            fiche=DashboardFicheResponse(
+                details=_pick(0, cod_pro_list),
+                sales=sales,
+                history=_pick(2, cod_pro_list),
+                stock=_pick(3, cod_pro_list),
+                purchase=_pick(4, cod_pro_list),
+                matches=_pick(5, cod_pro_list),
+            ),
+        ))
+
+    return DashboardBulkResponse(items=items, total_cod_pro=len(union), failed_blocks=failed_blocks)
@@ -0,0 +1,123 @@
+# ============================================
+# 📁 backend/app/services/export/export_formats.py
+# ============================================
+
+from typing import AsyncIterator, List, Sequence, Tuple
+import csv
+import io
+
+# Arrow IPC / Parquet (optionnel)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# Colonne exportée : (nom, type) avec type parmi "int", "float", "str", "datetime"
+ExportColumn = Tuple[str, str]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_EXTENSIONS = {"csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+ARROW_FORMATS = ("arrow", "parquet")
+
+
+async def csv_chunks(columns: List[ExportColumn], partitions: AsyncIterator[Sequence[tuple]]) -> AsyncIterator[bytes]:
+    """CSV (en-tête puis un morceau par paquet de lignes)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode("utf-8")
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Fichier en écriture seule dont on récupère le contenu au fil de l'eau (writers pyarrow)."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_type(kind: str):
+    return {
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "str": pa.string(),
+        "datetime": pa.timestamp("us"),
+    }[kind]
+
+
+def arrow_schema(columns: List[ExportColumn]):
+    return pa.schema([(name, _arrow_type(kind)) for name, kind in columns])
+
+
+def _record_batch(schema, columns: List[ExportColumn], rows: Sequence[tuple]):
+    """Paquet de tuples → RecordBatch (transposition en colonnes, Decimal → float, codes → str)."""
+    values = list(zip(*rows))
+    arrays = []
+    for (name, kind), column in zip(columns, values):
+        if kind == "float":
+            column = [None if v is None else float(v) for v in column]
+        elif kind == "str":
+            column = [None if v is None else str(v) for v in column]
+        arrays.append(pa.array(column, type=schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def arrow_chunks(columns: List[ExportColumn], partitions: AsyncIterator[Sequence[tuple]]) -> AsyncIterator[bytes]:
+    """Flux Arrow IPC (streaming format) : un RecordBatch par paquet de lignes."""
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()
+        async for rows in partitions:
+            if rows:
+                writer.write_batch(_record_batch(schema, columns, rows))
+                yield sink.drain()
+    yield sink.drain()
+
+
+async def parquet_chunks(columns: List[ExportColumn], partitions: AsyncIterator[Sequence[tuple]]) -> AsyncIterator[bytes]:
+    """Parquet : un row group par paquet de lignes, pied de fichier écrit à la fin."""
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        async for rows in partitions:
+            if rows:
+                writer.write_batch(_record_batch(schema, columns, rows))
+                yield sink.drain()
+    yield sink.drain()
+
+
+EXPORT_ENCODERS = {
+    "csv": csv_chunks,
+    "arrow": arrow_chunks,
+    "parquet": parquet_chunks,
+}
@@ -0,0 +1,117 @@
+# ============================================
+# 📁 backend/app/services/export/export_service.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+from app.common.date_service import PeriodWindow
+from app.common.logger import logger
+from app.db.queries import (
+    EXPORT_SALES_HISTORY,
+    EXPORT_SALES_HISTORY_LIVE,
+    EXPORT_STOCK,
+    EXPORT_PURCHASE_PRICES,
+    EXPORT_OPTIMISATION_MONITORING,
+    NamedQuery,
+    codpro_list_param,
+    stream_query,
+)
+from app.services.export.export_formats import EXPORT_ENCODERS, ExportColumn
+from app.services.sales.sales_cube import sales_window_params
+from app.settings import get_settings
+
+
+settings = get_settings()
+
+
+class ExportDataset(NamedTuple):
+    query: NamedQuery
+    columns: List[ExportColumn]
+    # Ventes sur une fenêtre de mois : bornes et variante données par sales_window_params,
+    # live_query lue quand le cube est absent ou ne couvre pas la fenêtre
+    windowed: bool = False
+    live_query: Optional[NamedQuery] = None
+
+
+_GROUP_COLUMNS: List[ExportColumn] = [("grouping_crn", "int"), ("qualite", "str"), ("cod_pro", "int")]
+
+# Colonnes dans l'ordre des SELECT de app.db.queries (EXPORT_*)
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    "sales_history": ExportDataset(
+        EXPORT_SALES_HISTORY,
+        _GROUP_COLUMNS + [
+            ("refint", "str"), ("periode", "int"),
+            ("qte", "float"), ("ca", "float"), ("total_pa", "float"), ("marge_pa", "float"),
+            ("total_pmp", "float"), ("marge_pmp", "float"), ("marge_pr", "float"),
+        ],
+        windowed=True,
+        live_query=EXPORT_SALES_HISTORY_LIVE,
+    ),
+    "stock": ExportDataset(
+        EXPORT_STOCK,
+        _GROUP_COLUMNS + [("depot", "str"), ("stock", "float"), ("pmp_eur", "float")],
+    ),
+    "purchase_prices": ExportDataset(
+        EXPORT_PURCHASE_PRICES,
+        _GROUP_COLUMNS + [("px_achat_eur", "float")],
+    ),
+    "optimisation_monitoring": ExportDataset(
+        EXPORT_OPTIMISATION_MONITORING,
+        _GROUP_COLUMNS + [
+            ("nb_refs", "int"), ("ca_12m", "float"),
+            ("gain_manque_achat_12m", "float"), ("gain_potentiel_achat_6m", "float"),
+            ("gain_total_achat_18m", "float"), ("gain_total_pmp_18m", "float"),
+            ("amelioration_pct", "float"), ("generated_at", "datetime"),
+        ],
+    ),
+}
+
+
+async def open_export(
+    dataset: str,
+    grouping_crn_list: List[int],
+    db: AsyncSession,
+    export_format: str = "csv",
+    last_n_months: int = 12
+) -> AsyncIterator[bytes]:
+    """
+    Ouvre le curseur serveur d'un export et lit son premier paquet, puis retourne
+    le corps : lignes lues par paquets de EXPORT_PARTITION_SIZE et encodées au fil
+    de l'eau (CSV, Arrow IPC ou Parquet), sans liste de dicts ni sérialisation JSON
+    intermédiaire. Une erreur SQL (timeout compris) est levée ici, avant le premier octet.
+    """
+    spec = EXPORT_DATASETS[dataset]
+    query = spec.query
+    params = {"grouping_crn_list": codpro_list_param(grouping_crn_list)}
+    if spec.windowed:
+        # Mêmes mois et même source que /sales : mois clos du cube, mois ouvert en live
+        use_cube, window_params = await sales_window_params(PeriodWindow.last_n_months(last_n_months), db)
+        params.update(window_params)
+        if not use_cube:
+            query = spec.live_query
+
+    partitions = stream_query(
+        db, query, params,
+        partition_size=settings.EXPORT_PARTITION_SIZE,
+        timeout=settings.EXPORT_QUERY_TIMEOUT,
+    )
+    try:
+        first = await partitions.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def _partitions() -> AsyncIterator[List[tuple]]:
+        if first is None:
+            return
+        yield first
+        async for rows in partitions:
+            yield rows
+
+    async def _body() -> AsyncIterator[bytes]:
+        size = 0
+        async for chunk in EXPORT_ENCODERS[export_format](spec.columns, _partitions()):
+            size += len(chunk)
+            yield chunk
+        logger.info(f"📤 Export {dataset} ({export_format}) : {len(grouping_crn_list)} groupes, {size} octets")
+
+    return _body()
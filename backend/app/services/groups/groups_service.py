@@ -1,40 +1,31 @@
 import json
 import time
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from fastapi import HTTPException
 
 from app.schemas.groups.groups_schema import GroupsFilterRequest
 from app.common.redis_client import redis_client
-from app.common.constants import REDIS_TTL_SHORT
+from app.common.constants import REDIS_TTL_SHORT, REDIS_TTL_MEDIUM
+from app.common.pagination import encode_cursor, decode_cursor
 from app.common.logger import logger
-from app.cache.cache_keys import groups_key
+from app.db.queries import execute_text
+from app.cache.cache_keys import groups_key, groups_count_key
+from app.services.groups.groups_summary_store import (
+    GROUP_SUMMARY_TABLE,
+    GROUP_SUMMARY_TOTAL_TABLE,
+    SUMMARY_READ_HINT,
+    is_group_summary_fresh,
+    rolling_window_start,
+)
 
-async def get_groups(
-    payload: GroupsFilterRequest,
-    db: AsyncSession,
-    page: int = 0,
-    limit: int = 100,
-):
-    redis_key = groups_key(payload.model_dump(), page, limit)
-    try:
-        cached = await redis_client.get(redis_key)
-        if cached:
-            return json.loads(cached)
-    except Exception:
-        logger.exception("[Redis] groups fallback")
 
-    limit = max(min(limit, 400), 10)
-    offset = max(page, 0) * limit
-
-    # Filtres dynamiques
+def _build_filters(payload: GroupsFilterRequest):
     where = []
-    params = {
-        "offset": offset,
-        "limit": limit,
-    }
+    params = {}
     if payload.ref_crn:
-        where.append("grouping_crn = :ref_crn")
+        # grouping_crn est un INT : un ref_crn non numérique ne correspond à aucun groupe
+        where.append("grouping_crn = TRY_CAST(:ref_crn AS INT)")
         params["ref_crn"] = payload.ref_crn
     if payload.famille:
         where.append("famille = :famille")
@@ -45,52 +36,249 @@ async def get_groups(
     if payload.statut:
         where.append("statut = :statut")
         params["statut"] = payload.statut
+    return (" AND ".join(where) if where else "1=1"), params
+
 
-    where_clause = " AND ".join(where) if where else "1=1"
+def _total_groups_source_sql(where_clause: str) -> str:
+    """
+    Agrégat par groupe précalculé (Group_Summary_Total) : sans filtre famille/qualité/statut,
+    la page est lue par seek sur l'index (nb_produits DESC, grouping_crn ASC).
+    """
+    return f"""
+        WITH groupes AS (
+            SELECT grouping_crn, nb_produits, familles, qualite, fournisseur, statut,
+                   qte_totale, ca_total, marge_total
+            FROM {GROUP_SUMMARY_TOTAL_TABLE} {SUMMARY_READ_HINT}
+            WHERE {where_clause}
+        )
+    """
+
+
+def _summary_groups_source_sql(where_clause: str) -> str:
+    """
+    Agrégat par groupe lu depuis Group_Summary (12 mois glissants, rafraîchie par job).
+    """
+    return f"""
+        WITH synthese AS (
+            SELECT grouping_crn, famille, qualite, statut, nb_produits, fournisseur,
+                   qte_12m, ca_12m, marge_12m
+            FROM {GROUP_SUMMARY_TABLE} {SUMMARY_READ_HINT}
+            WHERE {where_clause}
+        ),
+        familles AS (
+            SELECT grouping_crn, STRING_AGG(famille, ', ') AS familles
+            FROM (SELECT DISTINCT grouping_crn, famille FROM synthese WHERE famille IS NOT NULL) d
+            GROUP BY grouping_crn
+        ),
+        groupes AS (
+            SELECT
+                s.grouping_crn,
+                SUM(s.nb_produits) AS nb_produits,
+                MAX(fa.familles) AS familles,
+                MAX(s.qualite) AS qualite,
+                MAX(s.fournisseur) AS fournisseur,
+                MAX(s.statut) AS statut,
+                SUM(s.qte_12m) AS qte_totale,
+                SUM(s.ca_12m) AS ca_total,
+                SUM(s.marge_12m) AS marge_total
+            FROM synthese s
+            LEFT JOIN familles fa ON fa.grouping_crn = s.grouping_crn
+            GROUP BY s.grouping_crn
+        )
+    """
+
+
+def _live_groups_source_sql(where_clause: str) -> str:
+    """
+    Même agrégat calculé sur les tables de faits (diagnostic / table non rafraîchie) :
+    ventes et fournisseur sont pré-agrégés par cod_pro avant la jointure.
+    """
+    return f"""
+        WITH produits AS (
+            SELECT cod_pro, grouping_crn,
+                   famille, qualite, CAST(statut AS VARCHAR(10)) AS statut
+            FROM CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
+            WHERE {where_clause}
+        ),
+        ventes AS (
+            SELECT v.cod_pro,
+                   SUM(v.qte) AS qte,
+                   SUM(v.tot_vte_eur) AS ca,
+                   SUM(v.tot_marge_pr_eur) AS marge
+            FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
+            JOIN produits pr ON pr.cod_pro = v.cod_pro
+            WHERE v.dat_mvt >= :window_start
+            GROUP BY v.cod_pro
+        ),
+        fournisseurs AS (
+            SELECT f.cod_pro, MAX(fou.nom_fou) AS nom_fou
+            FROM (
+                SELECT DISTINCT cod_pro, cod_fou_principal
+                FROM CBM_DATA.dm.Fact_Produit_Depot_Fournisseur WITH (NOLOCK)
+            ) f
+            JOIN produits pr ON pr.cod_pro = f.cod_pro
+            LEFT JOIN CBM_DATA.dm.Dim_Fournisseur fou WITH (NOLOCK)
+                ON fou.cod_fou = f.cod_fou_principal
+            GROUP BY f.cod_pro
+        ),
+        familles AS (
+            SELECT grouping_crn, STRING_AGG(CAST(famille AS VARCHAR(20)), ', ') AS familles
+            FROM (SELECT DISTINCT grouping_crn, famille FROM produits WHERE famille IS NOT NULL) d
+            GROUP BY grouping_crn
+        ),
+        groupes AS (
+            SELECT
+                pr.grouping_crn,
+                COUNT(DISTINCT pr.cod_pro) AS nb_produits,
+                MAX(fa.familles) AS familles,
+                MAX(pr.qualite) AS qualite,
+                MAX(fo.nom_fou) AS fournisseur,
+                MAX(pr.statut) AS statut,
+                SUM(ve.qte) AS qte_totale,
+                SUM(ve.ca) AS ca_total,
+                SUM(ve.marge) AS marge_total
+            FROM produits pr
+            LEFT JOIN ventes ve ON ve.cod_pro = pr.cod_pro
+            LEFT JOIN fournisseurs fo ON fo.cod_pro = pr.cod_pro
+            LEFT JOIN familles fa ON fa.grouping_crn = pr.grouping_crn
+            GROUP BY pr.grouping_crn
+        )
+    """
+
+
+async def _get_groups_total(
+    payload: GroupsFilterRequest,
+    where_clause: str,
+    params: dict,
+    db: AsyncSession,
+    live: bool,
+    source: str
+) -> int:
+    """
+    COUNT(DISTINCT grouping_crn) mis en cache par jeu de filtres (indépendant de la page).
+    """
+    count_key = groups_count_key({**payload.model_dump(), "live": live})
+    try:
+        cached = await redis_client.get(count_key)
+        if cached is not None:
+            return int(cached)
+    except Exception:
+        logger.exception("[Redis] groups count fallback")
 
+    # Tables de synthèse : état validé uniquement (le total est mis en cache)
+    hint = "WITH (NOLOCK)" if live else SUMMARY_READ_HINT
     count_query = f"""
         SELECT COUNT(DISTINCT grouping_crn)
-        FROM CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
+        FROM {source} {hint}
         WHERE {where_clause}
     """
+    result_count = await execute_text(db, "groups.count", count_query, params)
+    total = result_count.scalar() or 0
 
-    query = f"""
-      SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-      SELECT
-        grouping_crn,
-        COUNT(DISTINCT cod_pro) as nb_produits,
-        STRING_AGG(DISTINCT famille, ', ') as familles,
-        MAX(qualite) as qualite,
-        MAX(nom_fou) as fournisseur,
-        MAX(statut) as statut,
-        SUM(qte) as qte_totale,
-        SUM(tot_vte_eur) as ca_total,
-        SUM(tot_marge_pr_eur) as marge_total
-      FROM CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
-      LEFT JOIN CBM_DATA.Pricing.Px_vte_mouvement mvt ON Dim_Produit.cod_pro = mvt.cod_pro
-      LEFT JOIN CBM_DATA.dm.Fact_Produit_Depot_Fournisseur fou ON Dim_Produit.cod_pro = fou.cod_pro
-      WHERE {where_clause}
-      GROUP BY grouping_crn
-      ORDER BY nb_produits DESC
-      OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
+    try:
+        await redis_client.set(count_key, total, ex=REDIS_TTL_MEDIUM)
+    except Exception:
+        logger.exception("[Redis] groups count set failed")
+    return total
+
+
+async def get_groups(
+    payload: GroupsFilterRequest,
+    db: AsyncSession,
+    page: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    live: bool = False,
+):
     """
+    Liste des groupes triée par nb_produits DESC, grouping_crn ASC.
 
-    # Si besoin, adapte les champs (grouping_crn, familles, etc.) selon ta base
+    Les agrégats (12 mois glissants) sont lus dans Group_Summary_Total (sans filtre
+    infra-groupe) ou Group_Summary (filtres famille/qualité/statut) ; live=True
+    les recalcule sur les tables de faits, de même que lorsque la synthèse est
+    absente ou périmée (voir is_group_summary_fresh).
 
-    result_count = await db.execute(text(count_query), params)
-    total = result_count.scalar() or 0
+    Deux modes de pagination :
+    - offset (page) : compatible avec l'existant
+    - keyset (cursor) : reprend après la dernière ligne de la page précédente (next_cursor)
+    """
+    if not live and not await is_group_summary_fresh(db):
+        logger.info("⚠️ Group_Summary absente ou périmée : liste des groupes calculée en live")
+        live = True
+
+    redis_key = groups_key({**payload.model_dump(), "live": live}, page, limit, cursor)
+    try:
+        cached = await redis_client.get(redis_key)
+        if cached:
+            return json.loads(cached)
+    except Exception:
+        logger.exception("[Redis] groups fallback")
+
+    limit = max(min(limit, 400), 10)
+    offset = max(page, 0) * limit
+
+    # Filtres dynamiques
+    where_clause, params = _build_filters(payload)
+    params["limit"] = limit
+
+    if cursor:
+        try:
+            position = decode_cursor(cursor, keys=("nb", "g"))
+            params["c_nb"] = int(position["nb"])
+            params["c_g"] = int(position["g"])
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Forme « seekable » : borne sur la colonne de tête de l'index, puis départage
+        page_clause = """
+            WHERE nb_produits <= :c_nb AND (nb_produits < :c_nb OR grouping_crn > :c_g)
+            ORDER BY nb_produits DESC, grouping_crn ASC
+            OFFSET 0 ROWS FETCH NEXT :limit ROWS ONLY
+        """
+    else:
+        params["offset"] = offset
+        page_clause = """
+            ORDER BY nb_produits DESC, grouping_crn ASC
+            OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
+        """
+
+    if live:
+        source_sql = _live_groups_source_sql(where_clause)
+        count_source = "CBM_DATA.dm.Dim_Produit"
+        params["window_start"] = rolling_window_start()
+    elif payload.famille or payload.qualite or payload.statut:
+        # Filtres infra-groupe : agrégat recalculé sur les seules lignes filtrées
+        source_sql = _summary_groups_source_sql(where_clause)
+        count_source = GROUP_SUMMARY_TABLE
+    else:
+        source_sql = _total_groups_source_sql(where_clause)
+        count_source = GROUP_SUMMARY_TOTAL_TABLE
+
+    query = f"""
+        {source_sql}
+        SELECT grouping_crn, nb_produits, familles, qualite, fournisseur, statut,
+               qte_totale, ca_total, marge_total
+        FROM groupes
+        {page_clause}
+    """
+
+    total = await _get_groups_total(payload, where_clause, params, db, live, count_source)
 
     start = time.perf_counter()
-    result = await db.execute(text(query), params)
+    result = await execute_text(db, "groups.list", query, params)
     rows = result.fetchall()
     elapsed = (time.perf_counter() - start) * 1000
     logger.info(f"[get_groups] {len(rows)} groupes chargés en {elapsed:.1f} ms")
 
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor({"nb": rows[-1][1], "g": rows[-1][0]})
+
     data = {
         "total": total,
+        "next_cursor": next_cursor,
         "rows": [
             {
-                "grouping_crn": r[0],
+                "grouping_crn": str(r[0]),
                 "nb_produits": r[1],
                 "familles": r[2],
                 "qualite": r[3],
@@ -104,7 +292,7 @@ async def get_groups(
         ]
     }
     try:
-        await redis_client.set(redis_key, json.dumps(data), ex=REDIS_TTL_SHORT)
+        await redis_client.set(redis_key, json.dumps(data, default=str), ex=REDIS_TTL_SHORT)
     except Exception:
         logger.exception("[Redis] groups set failed")
 
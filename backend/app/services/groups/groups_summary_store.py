@@ -0,0 +1,415 @@
+# ============================================
+# 📁 backend/app/services/groups/groups_summary_store.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from app.common.date_service import PeriodWindow
+from app.common.periodic_job import job_lock, periodic_job_loop
+from app.common.redis_client import redis_client
+from app.common.logger import logger
+from app.db.queries import execute_text
+from app.db.watermark import REFRESH_WATERMARK_TABLE, ensure_watermark_table, get_watermark, set_watermark
+from app.settings import get_settings
+import time
+
+
+# Agrégats ventes 12 mois glissants par groupe, ventilés par (famille, qualite, statut)
+# pour que les filtres de la liste restent applicables sans revenir aux tables de faits.
+GROUP_SUMMARY_TABLE = "CBM_DATA.cbm_product_explorer.Group_Summary"
+
+# Une ligne par groupe (agrégat de Group_Summary sans filtre), indexée dans l'ordre de la
+# liste (nb_produits DESC, grouping_crn ASC) : la pagination keyset y est un seek.
+GROUP_SUMMARY_TOTAL_TABLE = "CBM_DATA.cbm_product_explorer.Group_Summary_Total"
+
+# Tables de construction de la reconstruction complète (même structure et mêmes index),
+# basculées dans les tables lues par ALTER TABLE ... SWITCH
+GROUP_SUMMARY_STAGING_TABLE = GROUP_SUMMARY_TABLE + "_Staging"
+GROUP_SUMMARY_TOTAL_STAGING_TABLE = GROUP_SUMMARY_TOTAL_TABLE + "_Staging"
+
+# Indicateur de lecture des tables de synthèse : état validé uniquement (pas NOLOCK),
+# une lecture concurrente d'un rafraîchissement ne voit jamais de table vide ou partielle
+SUMMARY_READ_HINT = "WITH (READCOMMITTED)"
+
+GROUP_SUMMARY_JOB = "group_summary"
+
+# État de la synthèse relu au plus toutes les SUMMARY_STATE_TTL secondes par worker
+SUMMARY_STATE_TTL = 60
+_summary_state: Optional[Tuple[float, Optional[tuple]]] = None
+
+
+def _summary_table_ddl(table: str, index_name: str) -> str:
+    return f"""
+        IF OBJECT_ID('{table}', 'U') IS NULL
+        BEGIN
+            CREATE TABLE {table} (
+                grouping_crn INT NOT NULL,
+                famille VARCHAR(50) NULL,
+                qualite VARCHAR(10) NULL,
+                statut VARCHAR(10) NULL,
+                nb_produits INT NOT NULL,
+                fournisseur NVARCHAR(255) NULL,
+                qte_12m FLOAT NULL,
+                ca_12m FLOAT NULL,
+                marge_12m FLOAT NULL,
+                window_start DATE NOT NULL,
+                refreshed_at DATETIME2 NOT NULL
+            );
+            CREATE CLUSTERED INDEX {index_name} ON {table} (grouping_crn);
+        END
+    """
+
+
+def _total_table_ddl(table: str, name: str) -> str:
+    """Création de Group_Summary_Total ou de sa table de construction (index identiques, noms propres)."""
+    return f"""
+            CREATE TABLE {table} (
+                grouping_crn INT NOT NULL CONSTRAINT PK_{name} PRIMARY KEY,
+                nb_produits INT NOT NULL,
+                familles VARCHAR(MAX) NULL,
+                qualite VARCHAR(10) NULL,
+                fournisseur NVARCHAR(255) NULL,
+                statut VARCHAR(10) NULL,
+                qte_totale FLOAT NULL,
+                ca_total FLOAT NULL,
+                marge_total FLOAT NULL
+            );
+            CREATE INDEX IX_{name}_page ON {table} (nb_produits DESC, grouping_crn ASC)
+                INCLUDE (familles, qualite, fournisseur, statut, qte_totale, ca_total, marge_total);
+    """
+
+
+async def ensure_group_summary_table(db: AsyncSession):
+    """
+    Crée la table de synthèse des groupes si elle n'existe pas encore.
+
+    Une table d'une version précédente (grouping_crn en VARCHAR, tri lexicographique)
+    est supprimée avec son watermark : le rafraîchissement suivant la reconstruit.
+    Idem à la création de Group_Summary_Total, pour qu'elle soit complète.
+    Les tables de construction (_Staging) sont créées avec la même structure.
+    La table des watermarks doit exister (ensure_watermark_table).
+    """
+    await db.execute(text(f"""
+        IF OBJECT_ID('{GROUP_SUMMARY_TABLE}', 'U') IS NOT NULL
+           AND EXISTS (
+               SELECT 1 FROM sys.columns
+               WHERE object_id = OBJECT_ID('{GROUP_SUMMARY_TABLE}')
+                 AND name = 'grouping_crn'
+                 AND system_type_id <> TYPE_ID('int')
+           )
+        BEGIN
+            DROP TABLE {GROUP_SUMMARY_TABLE};
+            DELETE FROM {REFRESH_WATERMARK_TABLE} WHERE job_name = '{GROUP_SUMMARY_JOB}';
+        END
+
+        {_summary_table_ddl(GROUP_SUMMARY_TABLE, "IX_Group_Summary_grouping_crn")}
+        {_summary_table_ddl(GROUP_SUMMARY_STAGING_TABLE, "IX_Group_Summary_Staging_grouping_crn")}
+
+        IF OBJECT_ID('{GROUP_SUMMARY_TOTAL_TABLE}', 'U') IS NULL
+        BEGIN
+            {_total_table_ddl(GROUP_SUMMARY_TOTAL_TABLE, "Group_Summary_Total")}
+            DELETE FROM {REFRESH_WATERMARK_TABLE} WHERE job_name = '{GROUP_SUMMARY_JOB}';
+        END
+        IF OBJECT_ID('{GROUP_SUMMARY_TOTAL_STAGING_TABLE}', 'U') IS NULL
+        BEGIN
+            {_total_table_ddl(GROUP_SUMMARY_TOTAL_STAGING_TABLE, "Group_Summary_Total_Staging")}
+        END
+    """))
+    await db.commit()
+
+
+def rolling_window_start() -> date:
+    """
+    Premier jour du plus ancien des 12 derniers mois (mois courant inclus).
+    """
+    return PeriodWindow.last_n_months(12).start
+
+
+def _impacted_scope(alias: str) -> str:
+    return f"AND {alias}.grouping_crn IN (SELECT grouping_crn FROM #groupes_impactes)"
+
+
+def _summary_insert_sql(incremental: bool, table: str = GROUP_SUMMARY_TABLE) -> str:
+    """
+    Recalcul des lignes de synthèse : groupes impactés (#groupes_impactes) en
+    incrémental, tout le catalogue sinon. Ventes et fournisseur sont pré-agrégés
+    par cod_pro avant jointure.
+    """
+    product_scope = _impacted_scope("pr") if incremental else ""
+    sales_scope = _impacted_scope("sp") if incremental else ""
+    return f"""
+        INSERT INTO {table} (
+            grouping_crn, famille, qualite, statut, nb_produits, fournisseur,
+            qte_12m, ca_12m, marge_12m, window_start, refreshed_at
+        )
+        SELECT
+            pr.grouping_crn,
+            CAST(pr.famille AS VARCHAR(50)),
+            pr.qualite,
+            CAST(pr.statut AS VARCHAR(10)),
+            COUNT(DISTINCT pr.cod_pro),
+            MAX(fo.nom_fou),
+            SUM(ve.qte),
+            SUM(ve.ca),
+            SUM(ve.marge),
+            :window_start,
+            :refreshed_at
+        FROM CBM_DATA.dm.Dim_Produit pr WITH (NOLOCK)
+        LEFT JOIN (
+            SELECT v.cod_pro,
+                   SUM(v.qte) AS qte,
+                   SUM(v.tot_vte_eur) AS ca,
+                   SUM(v.tot_marge_pr_eur) AS marge
+            FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
+            JOIN CBM_DATA.dm.Dim_Produit sp WITH (NOLOCK) ON sp.cod_pro = v.cod_pro
+            WHERE v.dat_mvt >= :window_start {sales_scope}
+            GROUP BY v.cod_pro
+        ) ve ON ve.cod_pro = pr.cod_pro
+        LEFT JOIN (
+            SELECT f.cod_pro, MAX(fou.nom_fou) AS nom_fou
+            FROM (
+                SELECT DISTINCT cod_pro, cod_fou_principal
+                FROM CBM_DATA.dm.Fact_Produit_Depot_Fournisseur WITH (NOLOCK)
+            ) f
+            LEFT JOIN CBM_DATA.dm.Dim_Fournisseur fou WITH (NOLOCK)
+                ON fou.cod_fou = f.cod_fou_principal
+            GROUP BY f.cod_pro
+        ) fo ON fo.cod_pro = pr.cod_pro
+        WHERE pr.grouping_crn IS NOT NULL {product_scope}
+        GROUP BY pr.grouping_crn, pr.famille, pr.qualite, pr.statut
+    """
+
+
+def _total_insert_sql(
+    incremental: bool,
+    summary_table: str = GROUP_SUMMARY_TABLE,
+    total_table: str = GROUP_SUMMARY_TOTAL_TABLE
+) -> str:
+    """
+    Agrégat par groupe recalculé depuis Group_Summary (mêmes règles que la liste
+    non filtrée de get_groups).
+    """
+    scope = _impacted_scope("s") if incremental else ""
+    return f"""
+        WITH familles AS (
+            SELECT grouping_crn, STRING_AGG(famille, ', ') AS familles
+            FROM (
+                SELECT DISTINCT s.grouping_crn, s.famille
+                FROM {summary_table} s
+                WHERE s.famille IS NOT NULL {scope}
+            ) d
+            GROUP BY grouping_crn
+        )
+        INSERT INTO {total_table} (
+            grouping_crn, nb_produits, familles, qualite, fournisseur, statut,
+            qte_totale, ca_total, marge_total
+        )
+        SELECT
+            s.grouping_crn,
+            SUM(s.nb_produits),
+            MAX(fa.familles),
+            MAX(s.qualite),
+            MAX(s.fournisseur),
+            MAX(s.statut),
+            SUM(s.qte_12m),
+            SUM(s.ca_12m),
+            SUM(s.marge_12m)
+        FROM {summary_table} s
+        LEFT JOIN familles fa ON fa.grouping_crn = s.grouping_crn
+        WHERE 1=1 {scope}
+        GROUP BY s.grouping_crn
+    """
+
+
+async def _invalidate_groups_cache():
+    try:
+        async for key in redis_client.scan_iter(match="groups:*"):
+            await redis_client.delete(key)
+    except Exception:
+        logger.exception("[Redis] invalidation groups échouée")
+
+
+async def refresh_group_summary(db: AsyncSession, full: bool = False) -> dict:
+    """
+    Point d'entrée unique du rafraîchissement (tâche périodique, endpoint) : sous le
+    verrou de job partagé, un seul rafraîchissement à la fois tous workers confondus.
+    Lève JobAlreadyRunningError si un autre est en cours.
+    """
+    async with job_lock(GROUP_SUMMARY_JOB):
+        return await _refresh_group_summary(db, full)
+
+
+async def _refresh_group_summary(db: AsyncSession, full: bool) -> dict:
+    """
+    Rafraîchit Group_Summary.
+
+    En incrémental, seuls les groupes dont un produit a un mouvement depuis le
+    watermark (borne incluse : lignes arrivées après coup sur le même horodatage),
+    ou un mouvement sorti de la fenêtre 12 mois depuis le dernier passage, sont
+    recalculés (DELETE + INSERT dans une transaction, invisible des lectures en
+    SUMMARY_READ_HINT avant le commit). full=True reconstruit toute la table : à
+    utiliser après un changement de rattachement produit/groupe ou un mouvement
+    antidaté. La reconstruction remplit les tables _Staging puis les bascule
+    (TRUNCATE + SWITCH) dans la transaction du watermark : la liste des groupes
+    n'est jamais servie depuis une table vide ou partielle.
+    """
+    global _summary_state
+    await ensure_watermark_table(db)
+    await ensure_group_summary_table(db)
+
+    window_start = rolling_window_start()
+    refreshed_at = datetime.now()
+    watermark = None if full else await get_watermark(GROUP_SUMMARY_JOB, db)
+
+    result = await db.execute(text("""
+        SELECT MAX(dat_mvt) FROM CBM_DATA.Pricing.Px_vte_mouvement WITH (NOLOCK)
+    """))
+    new_mark = result.scalar()
+
+    params = {"window_start": window_start, "refreshed_at": refreshed_at}
+
+    try:
+        if watermark is None or watermark[0] is None:
+            logger.info(f"🧮 Group_Summary : reconstruction complète (fenêtre depuis {window_start})")
+            for staging in (GROUP_SUMMARY_STAGING_TABLE, GROUP_SUMMARY_TOTAL_STAGING_TABLE):
+                await db.execute(text(f"TRUNCATE TABLE {staging}"))
+            await db.execute(text(_summary_insert_sql(False, GROUP_SUMMARY_STAGING_TABLE)), params)
+            await db.execute(text(_total_insert_sql(False, GROUP_SUMMARY_STAGING_TABLE, GROUP_SUMMARY_TOTAL_STAGING_TABLE)))
+            # Bascule (métadonnées) : les lectures en cours terminent sur les anciennes tables
+            await db.execute(text(f"""
+                TRUNCATE TABLE {GROUP_SUMMARY_TABLE};
+                ALTER TABLE {GROUP_SUMMARY_STAGING_TABLE} SWITCH TO {GROUP_SUMMARY_TABLE};
+                TRUNCATE TABLE {GROUP_SUMMARY_TOTAL_TABLE};
+                ALTER TABLE {GROUP_SUMMARY_TOTAL_STAGING_TABLE} SWITCH TO {GROUP_SUMMARY_TOTAL_TABLE};
+            """))
+            mode = "full"
+        else:
+            last_mvt, previous_start, _ = watermark
+            await db.execute(text("IF OBJECT_ID('tempdb..#groupes_impactes') IS NOT NULL DROP TABLE #groupes_impactes"))
+            await db.execute(
+                text("""
+                    SELECT DISTINCT p.grouping_crn
+                    INTO #groupes_impactes
+                    FROM CBM_DATA.dm.Dim_Produit p WITH (NOLOCK)
+                    JOIN (
+                        SELECT DISTINCT cod_pro
+                        FROM CBM_DATA.Pricing.Px_vte_mouvement WITH (NOLOCK)
+                        WHERE dat_mvt >= :last_mvt
+                           OR (dat_mvt >= :previous_start AND dat_mvt < :window_start)
+                    ) m ON m.cod_pro = p.cod_pro
+                    WHERE p.grouping_crn IS NOT NULL
+                """),
+                {
+                    "last_mvt": last_mvt,
+                    "previous_start": previous_start or window_start,
+                    "window_start": window_start,
+                }
+            )
+            for table in (GROUP_SUMMARY_TABLE, GROUP_SUMMARY_TOTAL_TABLE):
+                await db.execute(text(f"""
+                    DELETE FROM {table}
+                    WHERE grouping_crn IN (SELECT grouping_crn FROM #groupes_impactes)
+                """))
+            await db.execute(text(_summary_insert_sql(incremental=True)), params)
+            await db.execute(text(_total_insert_sql(incremental=True)))
+            mode = "incremental"
+
+        await set_watermark(GROUP_SUMMARY_JOB, new_mark, window_start, refreshed_at, db)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    _summary_state = None
+
+    result = await db.execute(text(f"""
+        SELECT COUNT(*) FROM {GROUP_SUMMARY_TOTAL_TABLE} {SUMMARY_READ_HINT}
+    """))
+    nb_groupes = result.scalar() or 0
+
+    await _invalidate_groups_cache()
+    logger.info(f"✅ Group_Summary rafraîchie ({mode}) : {nb_groupes} groupes, watermark={new_mark}")
+
+    return {
+        "mode": mode,
+        "nb_groupes": nb_groupes,
+        "window_start": window_start.isoformat(),
+        "last_mvt": new_mark.isoformat() if new_mark else None,
+        "refreshed_at": refreshed_at.isoformat(),
+    }
+
+
+async def _read_summary_state(db: AsyncSession) -> Optional[Tuple[Optional[datetime], Optional[date], datetime]]:
+    """
+    (last_mvt, window_start, refreshed_at) du dernier rafraîchissement, None si la
+    table ou le watermark n'existe pas. Lecture seule : aucune DDL.
+    """
+    result = await execute_text(
+        db,
+        "groups.summary_state",
+        f"""
+            IF OBJECT_ID('{GROUP_SUMMARY_TABLE}', 'U') IS NOT NULL
+               AND OBJECT_ID('{GROUP_SUMMARY_TOTAL_TABLE}', 'U') IS NOT NULL
+               AND OBJECT_ID('{REFRESH_WATERMARK_TABLE}', 'U') IS NOT NULL
+                SELECT MAX(last_mvt), MAX(window_start), MAX(refreshed_at)
+                FROM {REFRESH_WATERMARK_TABLE} {SUMMARY_READ_HINT}
+                WHERE job_name = :job_name
+            ELSE
+                SELECT CAST(NULL AS DATETIME2), CAST(NULL AS DATE), CAST(NULL AS DATETIME2)
+        """,
+        {"job_name": GROUP_SUMMARY_JOB}
+    )
+    row = result.fetchone()
+    if not row or row[2] is None:
+        return None
+    return tuple(row)
+
+
+def _is_fresh(state) -> bool:
+    if state is None:
+        return False
+    _, window_start, refreshed_at = state
+    max_age = timedelta(seconds=get_settings().GROUP_SUMMARY_MAX_AGE_SECONDS)
+    return window_start == rolling_window_start() and datetime.now() - refreshed_at < max_age
+
+
+async def is_group_summary_fresh(db: AsyncSession) -> bool:
+    """
+    Group_Summary exploitable : rafraîchie depuis moins de GROUP_SUMMARY_MAX_AGE_SECONDS
+    et sur la fenêtre 12 mois courante. Sinon get_groups recalcule sur les tables de faits.
+    """
+    global _summary_state
+    if _summary_state is None or _summary_state[0] <= time.monotonic():
+        try:
+            state = await _read_summary_state(db)
+        except Exception as e:
+            logger.warning(f"⚠️ État Group_Summary illisible, lecture live: {e}")
+            state = None
+        _summary_state = (time.monotonic() + SUMMARY_STATE_TTL, state)
+
+    return _is_fresh(_summary_state[1])
+
+
+async def get_group_summary_status(db: AsyncSession) -> dict:
+    """
+    Dernier rafraîchissement connu de Group_Summary.
+    """
+    state = await _read_summary_state(db)
+    if state is None:
+        return {"status": "no_data", "message": "Group_Summary n'a jamais été rafraîchie"}
+    last_mvt, window_start, refreshed_at = state
+    return {
+        "status": "ok" if _is_fresh(state) else "stale",
+        "last_mvt": last_mvt.isoformat() if last_mvt else None,
+        "window_start": window_start.isoformat() if window_start else None,
+        "refreshed_at": refreshed_at.isoformat() if refreshed_at else None,
+    }
+
+
+async def group_summary_refresh_loop():
+    """
+    Tâche de fond (lifespan) : rafraîchissement incrémental de Group_Summary toutes les
+    GROUP_SUMMARY_REFRESH_SECONDS, sur un seul worker (bail Redis).
+    """
+    await periodic_job_loop("group_summary", get_settings().GROUP_SUMMARY_REFRESH_SECONDS, refresh_group_summary)
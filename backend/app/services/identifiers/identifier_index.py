@@ -0,0 +1,216 @@
+# ============================================
+# 📁 backend/app/services/identifiers/identifier_index.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
+from app.common.logger import logger
+from app.common.redis_client import redis_client
+from app.common.strings import sql_key
+from app.db.queries import IDENTIFIER_INDEX_SOURCE, run_query
+from app.db.session import async_write_session
+from app.services.identifiers.reference_snapshot import (
+    NULL_INT,
+    SNAPSHOT_COLUMNS,
+    ReferenceSnapshot,
+    current_version,
+    open_snapshot,
+    snapshot_age_seconds,
+    write_snapshot,
+)
+from app.settings import get_settings
+import asyncio
+import numpy as np
+
+
+settings = get_settings()
+
+# Bail Redis : un seul worker reconstruit le snapshot par période
+INDEX_REFRESH_LEASE_KEY = "identifier_index:lease"
+
+# Fréquence de vérification du pointeur CURRENT (lecture d'un petit fichier)
+SNAPSHOT_POLL_SECONDS = 30
+
+
+class IdentifierIndex:
+    """
+    Index de résolution des identifiants produit sur le snapshot mémoire-mappé
+    de Grouping_crn_table (cf. reference_snapshot) :
+
+    - refint → cod_pro, ref_ext → cod_pro (première ligne, comme TOP 1)
+    - ref_crn → cod_pros
+    - cod_pro → grouping_crn
+    - grouping_crn → membres, filtrables par qualité
+
+    Aucune copie des données dans le worker : chaque recherche est un searchsorted
+    sur les colonnes triées partagées. Les références sont comparées comme par
+    SQL Server (casse et espaces de fin ignorés, cf. sql_key).
+    """
+
+    def __init__(self, snapshot: ReferenceSnapshot):
+        self.snapshot = snapshot
+
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+
+    @property
+    def size(self) -> int:
+        return len(self.snapshot)
+
+    def _first_codpro(self, column: str, value: Optional[str]) -> Optional[int]:
+        if not value:
+            return None
+        rows = self.snapshot.rows_for(column, value)
+        return int(self.snapshot.columns["cod_pro"][rows[0]]) if len(rows) else None
+
+    def codpro_for(self, refint: Optional[str] = None, ref_ext: Optional[str] = None) -> Optional[int]:
+        """cod_pro correspondant à un refint, sinon à un ref_ext."""
+        cod_pro = self._first_codpro("refint", refint)
+        if cod_pro is None:
+            cod_pro = self._first_codpro("ref_ext", ref_ext)
+        return cod_pro
+
+    def groups_for(self, cod_pros: Iterable[int]) -> List[int]:
+        rows = self.snapshot.rows_for_many("cod_pro", cod_pros)
+        groups = np.unique(self.snapshot.columns["grouping_crn"][rows])
+        return [int(g) for g in groups if g != NULL_INT]
+
+    def group_members(self, groups: Iterable[int], qualite: Optional[str] = None) -> List[int]:
+        """cod_pro des groupes donnés, filtrés par qualité si demandée."""
+        rows = self.snapshot.rows_for_many("grouping_crn", groups)
+        if qualite is not None:
+            rows = rows[self.snapshot.matches_text("qualite", rows, qualite)]
+        return [int(c) for c in np.unique(self.snapshot.columns["cod_pro"][rows])]
+
+    def resolve(self, payload: ProductIdentifierRequest) -> List[int]:
+        """
+        Équivalent mémoire de la résolution SQL de identifier_service
+        (mêmes priorités : ref_crn, puis cod_pro / refint / ref_ext).
+        """
+        if payload.ref_crn:
+            rows = self.snapshot.rows_for("ref_crn", payload.ref_crn)
+            cod_pros = self.snapshot.columns["cod_pro"][rows]
+            if payload.grouping_crn == 1:
+                return self.group_members(self.groups_for(np.unique(cod_pros)), payload.qualite)
+            if payload.qualite is not None:
+                cod_pros = cod_pros[self.snapshot.matches_text("qualite", rows, payload.qualite)]
+            return [int(c) for c in np.unique(cod_pros)]
+
+        cod_pro = payload.cod_pro or self.codpro_for(payload.refint, payload.ref_ext)
+        if not cod_pro:
+            return []
+        if payload.grouping_crn == 1:
+            return self.group_members(self.groups_for([int(cod_pro)]), payload.qualite)
+        return [int(cod_pro)]
+
+    def matches_for(self, cod_pros: Iterable[int]) -> List[dict]:
+        """
+        Triplets distincts cod_pro / ref_crn / refext (Dim_Produit), comme PRODUCT_MATCHES :
+        le DISTINCT SQL confond les variantes de casse / espaces de fin, on garde la première.
+        """
+        rows = self.snapshot.rows_for_many("cod_pro", cod_pros)
+        seen = set()
+        matches = []
+        for cod_pro, ref_crn, ref_ext in zip(
+            self.snapshot.columns["cod_pro"][rows],
+            self.snapshot.text("ref_crn", rows),
+            self.snapshot.text("dim_ref_ext", rows),
+        ):
+            key = (int(cod_pro), sql_key(ref_crn), sql_key(ref_ext))
+            if key not in seen:
+                seen.add(key)
+                matches.append({"cod_pro": key[0], "ref_crn": ref_crn, "ref_ext": ref_ext})
+        return matches
+
+
+_index: Optional[IdentifierIndex] = None
+
+
+def get_identifier_index() -> Optional[IdentifierIndex]:
+    """Index courant du worker (None tant qu'aucun snapshot n'a été ouvert)."""
+    return _index
+
+
+def load_identifier_index_snapshot() -> bool:
+    """
+    Ouvre la version pointée par CURRENT si elle diffère de celle du worker.
+    Retourne True si un index est disponible après l'appel.
+    """
+    global _index
+    version = current_version()
+    if version is None or (_index is not None and _index.version == version):
+        return _index is not None
+    try:
+        _index = IdentifierIndex(open_snapshot(version))
+        logger.info(f"🗂️ Index identifiants ouvert ({_index.size} lignes, version {version})")
+    except Exception as e:
+        logger.error(f"❌ Ouverture snapshot index identifiants {version}: {e}")
+    return _index is not None
+
+
+async def refresh_identifier_index(db: AsyncSession) -> dict:
+    """
+    Recharge Grouping_crn_table depuis SQL Server, écrit une nouvelle version du
+    snapshot et bascule le pointeur ; les autres workers l'ouvrent à leur prochain
+    contrôle (SNAPSHOT_POLL_SECONDS) sans repasser par SQL.
+    """
+    result = await run_query(db, IDENTIFIER_INDEX_SOURCE, timeout=settings.IDENTIFIER_INDEX_LOAD_TIMEOUT)
+    columns = {c: [] for c in SNAPSHOT_COLUMNS}
+    for row in result.fetchall():
+        for c, value in zip(SNAPSHOT_COLUMNS, row):
+            columns[c].append(value)
+
+    # Écriture disque + tri : hors boucle événementielle
+    path = await asyncio.to_thread(write_snapshot, columns)
+    logger.info(f"🗂️ Snapshot index identifiants écrit ({len(columns['cod_pro'])} lignes, version {path.name})")
+    load_identifier_index_snapshot()
+    return get_identifier_index_status()
+
+
+def get_identifier_index_status() -> dict:
+    if _index is None:
+        return {"loaded": False, "current_version": current_version()}
+    return {
+        "loaded": True,
+        "version": _index.version,
+        "current_version": current_version(),
+        "rows": _index.size,
+        "path": str(_index.snapshot.path),
+    }
+
+
+async def _should_rebuild() -> bool:
+    """
+    Snapshot absent, illisible (format d'une version précédente) ou plus vieux que
+    la période, et bail de reconstruction obtenu.
+    """
+    interval = settings.IDENTIFIER_INDEX_REFRESH_SECONDS
+    age = snapshot_age_seconds()
+    if age is not None and age < interval and _index is not None:
+        return False
+    try:
+        return bool(await redis_client.set(INDEX_REFRESH_LEASE_KEY, "1", nx=True, ex=interval))
+    except Exception:
+        logger.exception("[Redis] bail index identifiants")
+        # Sans Redis, plusieurs workers peuvent reconstruire : les versions restent distinctes
+        return True
+
+
+async def identifier_index_refresh_loop():
+    """
+    Tâche de fond (lifespan) : ouvre la version courante du snapshot dès qu'elle change ;
+    un seul worker (bail Redis) la reconstruit depuis SQL Server quand elle est périmée.
+    """
+    while True:
+        try:
+            load_identifier_index_snapshot()
+            if await _should_rebuild():
+                async with async_write_session() as db:
+                    await refresh_identifier_index(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Rafraîchissement index identifiants: {e}")
+        await asyncio.sleep(SNAPSHOT_POLL_SECONDS)
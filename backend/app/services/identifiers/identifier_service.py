@@ -4,16 +4,45 @@
 # =============================================
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.common.redis_client import redis_client
 from app.cache.cache_keys import resolve_codpro_key
-from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest, CodProListResponse
+from app.schemas.identifiers.identifier_schema import (
+    ProductIdentifierRequest,
+    CodProListResponse,
+    BulkIdentifierRequest,
+    BulkIdentifierResponse,
+    BulkIdentifierResult,
+)
 from app.common.constants import REDIS_TTL_SHORT
 from app.common.logger import logger
+from app.common.strings import sql_key
+from app.services.identifiers.identifier_index import get_identifier_index
+from app.db.queries import (
+    IDENTIFIER_BY_REF_CRN,
+    IDENTIFIER_GROUP_BY_REF_CRN,
+    IDENTIFIER_CODPRO_BY_REFINT,
+    IDENTIFIER_CODPRO_BY_REF_EXT,
+    IDENTIFIER_GROUP_BY_CODPRO,
+    IDENTIFIER_BY_GROUPING_CRN,
+    IDENTIFIER_BULK_CODPRO_BY_REFINT,
+    IDENTIFIER_BULK_CODPRO_BY_REF_EXT,
+    IDENTIFIER_BULK_BY_REF_CRN,
+    IDENTIFIER_BULK_GROUP_BY_CODPRO,
+    IDENTIFIER_BULK_GROUP_MEMBERS,
+    codpro_list_param,
+    ref_list_param,
+    run_query,
+)
+from app.settings import get_settings
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
 import json
 
 
+settings = get_settings()
+
+
 async def get_codpro_list_from_identifier(payload: ProductIdentifierRequest, db: AsyncSession) -> CodProListResponse:
     """
     Résout la liste des cod_pro à partir d’un identifiant produit (cod_pro, ref_crn, refint, ref_ext),
@@ -25,8 +54,15 @@ async def get_codpro_list_from_identifier(payload: ProductIdentifierRequest, db:
     3️⃣ refint   → résolution cod_pro, puis même logique
     4️⃣ ref_ext  → résolution cod_pro, puis même logique
     5️⃣ sinon    → liste vide
+
+    Résolution purement mémoire quand l'index identifiants est chargé
+    (cf. identifier_index) ; sinon requêtes SQL avec cache Redis court.
     """
 
+    index = get_identifier_index()
+    if index is not None:
+        return CodProListResponse(cod_pro_list=index.resolve(payload))
+
     payload_dict = payload.model_dump(exclude_none=False)
     redis_key = resolve_codpro_key(payload_dict)
 
@@ -48,24 +84,8 @@ async def get_codpro_list_from_identifier(payload: ProductIdentifierRequest, db:
         if payload.ref_crn:
             logger.info(f"📌 Résolution via ref_crn={payload.ref_crn}, qualite={payload.qualite}, grouping_crn={payload.grouping_crn}")
 
-            if payload.grouping_crn == 1:
-                query = """
-                    SELECT DISTINCT t2.cod_pro
-                    FROM CBM_DATA.Pricing.Grouping_crn_table AS t1
-                    JOIN CBM_DATA.Pricing.Grouping_crn_table AS t2
-                      ON t2.grouping_crn = t1.grouping_crn
-                    WHERE t1.ref_crn = :ref_crn
-                      AND (:qualite IS NULL OR t2.qualite = :qualite)
-                """
-            else:
-                query = """
-                    SELECT DISTINCT cod_pro
-                    FROM CBM_DATA.Pricing.Grouping_crn_table
-                    WHERE ref_crn = :ref_crn
-                      AND (:qualite IS NULL OR qualite = :qualite)
-                """
-
-            result = await db.execute(text(query), {"ref_crn": payload.ref_crn, "qualite": payload.qualite})
+            query = IDENTIFIER_GROUP_BY_REF_CRN if payload.grouping_crn == 1 else IDENTIFIER_BY_REF_CRN
+            result = await run_query(db, query, {"ref_crn": payload.ref_crn, "qualite": payload.qualite})
             resolved = [int(r[0]) for r in result.fetchall()]
 
         else:
@@ -76,26 +96,12 @@ async def get_codpro_list_from_identifier(payload: ProductIdentifierRequest, db:
 
             # 2a. Résolution cod_pro à partir de refint
             if not cod_pro and payload.refint:
-                result = await db.execute(
-                    text("""
-                        SELECT TOP 1 cod_pro
-                        FROM CBM_DATA.Pricing.Grouping_crn_table
-                        WHERE refint = :refint
-                    """),
-                    {"refint": payload.refint},
-                )
+                result = await run_query(db, IDENTIFIER_CODPRO_BY_REFINT, {"refint": payload.refint})
                 cod_pro = result.scalar()
 
             # 2b. Résolution cod_pro à partir de ref_ext
             if not cod_pro and payload.ref_ext:
-                result = await db.execute(
-                    text("""
-                        SELECT TOP 1 cod_pro
-                        FROM CBM_DATA.Pricing.Grouping_crn_table
-                        WHERE ref_ext = :ref_ext
-                    """),
-                    {"ref_ext": payload.ref_ext},
-                )
+                result = await run_query(db, IDENTIFIER_CODPRO_BY_REF_EXT, {"ref_ext": payload.ref_ext})
                 cod_pro = result.scalar()
 
             # 2c. Si aucun cod_pro trouvé → rien
@@ -109,16 +115,7 @@ async def get_codpro_list_from_identifier(payload: ProductIdentifierRequest, db:
             if payload.grouping_crn == 1:
                 logger.info(f"📌 Résolution groupée via cod_pro={cod_pro}, qualite={payload.qualite}")
 
-                query = """
-                    SELECT DISTINCT t2.cod_pro
-                    FROM CBM_DATA.Pricing.Grouping_crn_table AS t1
-                    JOIN CBM_DATA.Pricing.Grouping_crn_table AS t2
-                      ON t2.grouping_crn = t1.grouping_crn
-                    WHERE t1.cod_pro = :cod_pro
-                      AND (:qualite IS NULL OR t2.qualite = :qualite)
-                """
-
-                result = await db.execute(text(query), {"cod_pro": cod_pro, "qualite": payload.qualite})
+                result = await run_query(db, IDENTIFIER_GROUP_BY_CODPRO, {"cod_pro": cod_pro, "qualite": payload.qualite})
                 resolved = [int(r[0]) for r in result.fetchall()]
 
             else:
@@ -144,6 +141,156 @@ async def get_codpro_list_from_identifier(payload: ProductIdentifierRequest, db:
     return CodProListResponse(cod_pro_list=resolved)
 
 
+# ======================================================================
+# 📦 Résolution en masse
+# ======================================================================
+
+# Résolution refint puis ref_ext (mêmes priorités que get_codpro_list_from_identifier)
+_BULK_CODPRO_QUERIES = (
+    ("refint", IDENTIFIER_BULK_CODPRO_BY_REFINT),
+    ("ref_ext", IDENTIFIER_BULK_CODPRO_BY_REF_EXT),
+)
+
+
+async def _resolve_bulk_sql(payloads: List[ProductIdentifierRequest], db: AsyncSession) -> List[List[int]]:
+    """
+    Résolution SQL ensembliste d'un lot : une requête par type d'identifiant
+    (refint, ref_ext, ref_crn) et deux pour les groupes, quelle que soit la taille du lot.
+    """
+    cod_pros: List[Optional[int]] = [None if p.ref_crn else (p.cod_pro or None) for p in payloads]
+
+    for column, query in _BULK_CODPRO_QUERIES:
+        pending = {
+            getattr(p, column) for p, cod_pro in zip(payloads, cod_pros)
+            if cod_pro is None and not p.ref_crn and getattr(p, column)
+        }
+        if not pending:
+            continue
+        result = await run_query(db, query, {"refs": ref_list_param(pending)})
+        # Clé repliée (sql_key) : la requête regroupe les variantes de casse / espaces finaux
+        found = {sql_key(ref): int(cod_pro) for ref, cod_pro in result.fetchall()}
+        for i, p in enumerate(payloads):
+            if cod_pros[i] is None and not p.ref_crn:
+                cod_pros[i] = found.get(sql_key(getattr(p, column)))
+
+    # sql_key(ref_crn) → (cod_pro, grouping_crn, qualite)
+    crn_rows: Dict[str, list] = defaultdict(list)
+    ref_crns = {p.ref_crn for p in payloads if p.ref_crn}
+    if ref_crns:
+        result = await run_query(db, IDENTIFIER_BULK_BY_REF_CRN, {"refs": ref_list_param(ref_crns)})
+        for ref, cod_pro, grouping_crn, qualite in result.fetchall():
+            crn_rows[sql_key(ref)].append((int(cod_pro), grouping_crn, qualite))
+
+    # cod_pro → grouping_crn pour les résolutions groupées
+    groups_of: Dict[int, Set[int]] = defaultdict(set)
+    grouped_codpros = {c for p, c in zip(payloads, cod_pros) if c and p.grouping_crn == 1}
+    if grouped_codpros:
+        result = await run_query(db, IDENTIFIER_BULK_GROUP_BY_CODPRO, {"cod_pro_list": codpro_list_param(grouped_codpros)})
+        for cod_pro, grouping_crn in result.fetchall():
+            groups_of[int(cod_pro)].add(int(grouping_crn))
+
+    groups = set().union(*groups_of.values()) if groups_of else set()
+    for p in payloads:
+        if p.ref_crn and p.grouping_crn == 1:
+            groups.update(g for _, g, _ in crn_rows.get(sql_key(p.ref_crn), []) if g is not None)
+
+    members: Dict[int, list] = defaultdict(list)
+    if groups:
+        result = await run_query(db, IDENTIFIER_BULK_GROUP_MEMBERS, {"grouping_crn_list": codpro_list_param(groups)})
+        for grouping_crn, cod_pro, qualite in result.fetchall():
+            members[int(grouping_crn)].append((int(cod_pro), qualite))
+
+    def members_of(group_ids: Iterable[int], qualite: Optional[str]) -> List[int]:
+        return sorted({c for g in group_ids for c, q in members.get(g, []) if qualite is None or q == qualite})
+
+    resolved = []
+    for p, cod_pro in zip(payloads, cod_pros):
+        if p.ref_crn:
+            rows = crn_rows.get(sql_key(p.ref_crn), [])
+            if p.grouping_crn == 1:
+                resolved.append(members_of({g for _, g, _ in rows if g is not None}, p.qualite))
+            else:
+                resolved.append(sorted({c for c, _, q in rows if p.qualite is None or q == p.qualite}))
+        elif not cod_pro:
+            resolved.append([])
+        elif p.grouping_crn == 1:
+            resolved.append(members_of(groups_of.get(int(cod_pro), ()), p.qualite))
+        else:
+            resolved.append([int(cod_pro)])
+    return resolved
+
+
+async def resolve_identifiers_bulk(payloads: List[ProductIdentifierRequest], db: AsyncSession) -> List[List[int]]:
+    """
+    Résout une liste d'identifiants, un résultat par élément (même ordre).
+
+    Index identifiants chargé : résolution mémoire élément par élément.
+    Sinon : lecture groupée (MGET) du cache unitaire resolve_codpro, résolution SQL
+    ensembliste des éléments absents (dédoublonnés), puis écriture groupée de leurs
+    résultats dans ce même cache : les appels unitaires suivants en profitent.
+    """
+    index = get_identifier_index()
+    if index is not None:
+        return [index.resolve(p) for p in payloads]
+
+    keys = [resolve_codpro_key(p.model_dump(exclude_none=False)) for p in payloads]
+    unique = dict(zip(keys, payloads))
+    resolved: Dict[str, List[int]] = {}
+
+    try:
+        cached = await redis_client.mget(list(unique))
+        for key, value in zip(unique, cached):
+            if value:
+                resolved[key] = json.loads(value)["cod_pro_list"]
+    except Exception:
+        logger.exception("[Redis] mget resolve_codpro")
+
+    missing = [key for key in unique if key not in resolved]
+    if missing:
+        try:
+            loaded = dict(zip(missing, await _resolve_bulk_sql([unique[k] for k in missing], db)))
+        except SQLAlchemyError as e:
+            logger.error(f"❌ SQLAlchemyError résolution en masse ({len(missing)} identifiants): {e}")
+            loaded = {}
+        except Exception as e:
+            logger.error(f"❌ Exception résolution en masse ({len(missing)} identifiants): {e}")
+            loaded = {}
+
+        if loaded:
+            try:
+                pipe = redis_client.pipeline()
+                for key, cod_pro_list in loaded.items():
+                    pipe.set(key, json.dumps({"cod_pro_list": cod_pro_list}), ex=REDIS_TTL_SHORT)
+                await pipe.execute()
+            except Exception:
+                logger.exception("[Redis] set resolve_codpro (masse)")
+        resolved.update(loaded)
+
+    logger.info(f"📦 Résolution en masse: {len(payloads)} éléments, {len(unique)} distincts, {len(missing)} hors cache")
+    return [resolved.get(key, []) for key in keys]
+
+
+async def iter_resolve_identifiers_bulk(
+    payloads: List[ProductIdentifierRequest],
+    db: AsyncSession
+) -> AsyncIterator[BulkIdentifierResult]:
+    """
+    Résolution en masse par lots de IDENTIFIER_BULK_CHUNK_SIZE, résultats émis
+    au fil des lots (flux NDJSON) : les premières lignes partent sans attendre la fin.
+    """
+    chunk_size = settings.IDENTIFIER_BULK_CHUNK_SIZE
+    for start in range(0, len(payloads), chunk_size):
+        chunk = payloads[start:start + chunk_size]
+        for offset, (payload, cod_pro_list) in enumerate(zip(chunk, await resolve_identifiers_bulk(chunk, db))):
+            yield BulkIdentifierResult(index=start + offset, request=payload, cod_pro_list=cod_pro_list)
+
+
+async def get_codpro_lists_bulk(payload: BulkIdentifierRequest, db: AsyncSession) -> BulkIdentifierResponse:
+    """Réponse JSON complète de la résolution en masse (lots identiques au flux NDJSON)."""
+    results = [result async for result in iter_resolve_identifiers_bulk(payload.items, db)]
+    return BulkIdentifierResponse(results=results, resolved=sum(1 for r in results if r.cod_pro_list))
+
+
 # ======================================================================
 # 🔧 Sous-fonction (fallback direct utilisée pour debug ou cas spéciaux)
 # ======================================================================
@@ -164,21 +311,9 @@ async def _get_codpro_from_grouping_table(
 
     try:
         if filter_column == "ref_crn":
-            query = """
-                SELECT DISTINCT cod_pro
-                FROM CBM_DATA.Pricing.Grouping_crn_table
-                WHERE ref_crn = :filter_value
-                  AND (:qualite IS NULL OR qualite = :qualite)
-            """
+            result = await run_query(db, IDENTIFIER_BY_REF_CRN, {"ref_crn": filter_value, "qualite": qualite})
         else:
-            query = """
-                SELECT DISTINCT cod_pro
-                FROM CBM_DATA.Pricing.Grouping_crn_table
-                WHERE grouping_crn = :filter_value
-                  AND (:qualite IS NULL OR qualite = :qualite)
-            """
-
-        result = await db.execute(text(query), {"filter_value": filter_value, "qualite": qualite})
+            result = await run_query(db, IDENTIFIER_BY_GROUPING_CRN, {"grouping_crn": filter_value, "qualite": qualite})
         return [int(r[0]) for r in result.fetchall()]
 
     except Exception as e:
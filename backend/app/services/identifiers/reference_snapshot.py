@@ -0,0 +1,175 @@
+# ============================================
+# 📁 backend/app/services/identifiers/reference_snapshot.py
+# ============================================
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from app.common.logger import logger
+from app.common.strings import sql_key
+from app.settings import get_settings
+import numpy as np
+import os
+import shutil
+import time
+
+
+settings = get_settings()
+
+# Colonnes du snapshot (Grouping_crn_table + refext de Dim_Produit) et leur type
+INT_COLUMNS = ("cod_pro", "grouping_crn")
+TEXT_COLUMNS = ("refint", "ref_ext", "ref_crn", "qualite", "dim_ref_ext")
+SNAPSHOT_COLUMNS = INT_COLUMNS + TEXT_COLUMNS
+
+# Colonnes recherchables : copie triée + permutation vers les lignes d'origine
+KEY_COLUMNS = ("cod_pro", "grouping_crn", "refint", "ref_ext", "ref_crn")
+
+# Colonnes texte comparées comme SQL Server (cf. sql_key) : copie normalisée <col>.key.npy,
+# dont dérivent aussi la copie triée des colonnes de KEY_COLUMNS
+NORMALIZED_COLUMNS = ("refint", "ref_ext", "ref_crn", "qualite")
+
+# Valeur des entiers NULL (grouping_crn absent)
+NULL_INT = -1
+
+# Fichier pointeur vers la version courante (remplacé atomiquement)
+CURRENT_POINTER = "CURRENT"
+KEEP_VERSIONS = 2
+
+
+def snapshot_root() -> Path:
+    return Path(settings.REFERENCE_SNAPSHOT_DIR) / "grouping"
+
+
+class ReferenceSnapshot:
+    """
+    Snapshot colonne par colonne (.npy) du référentiel produits, ouvert en lecture seule
+    par memory-mapping : tous les workers partagent les mêmes pages physiques (page cache).
+
+    Les colonnes texte sont stockées en octets UTF-8 de largeur fixe (chaîne vide = NULL).
+    Chaque colonne de KEY_COLUMNS a une copie triée (<col>.sorted.npy) et la permutation
+    stable correspondante (<col>.order.npy) : une recherche est un searchsorted.
+    Les colonnes de NORMALIZED_COLUMNS sont comparées sur leur clé sql_key (casse et
+    espaces de fin ignorés), comme les requêtes SQL qu'elles remplacent.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.version = path.name
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r") for name in SNAPSHOT_COLUMNS
+        }
+        self.sorted: Dict[str, np.ndarray] = {
+            name: np.load(path / f"{name}.sorted.npy", mmap_mode="r") for name in KEY_COLUMNS
+        }
+        self.order: Dict[str, np.ndarray] = {
+            name: np.load(path / f"{name}.order.npy", mmap_mode="r") for name in KEY_COLUMNS
+        }
+        self.keys: Dict[str, np.ndarray] = {
+            name: np.load(path / f"{name}.key.npy", mmap_mode="r") for name in NORMALIZED_COLUMNS
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns["cod_pro"])
+
+    def rows_for(self, column: str, value) -> np.ndarray:
+        """Positions (ordre d'origine) des lignes où column == value."""
+        keys = self.sorted[column]
+        if column in TEXT_COLUMNS:
+            value = sql_key(value).encode("utf-8")
+            # Au-delà de la largeur stockée, numpy tronquerait la valeur recherchée
+            if len(value) > keys.dtype.itemsize:
+                return np.empty(0, dtype=np.int64)
+        lo = np.searchsorted(keys, value, side="left")
+        hi = np.searchsorted(keys, value, side="right")
+        return np.sort(self.order[column][lo:hi])
+
+    def rows_for_many(self, column: str, values: Iterable) -> np.ndarray:
+        parts = [self.rows_for(column, v) for v in values]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def text(self, column: str, rows: np.ndarray) -> List[Optional[str]]:
+        return [v.decode("utf-8") or None for v in self.columns[column][rows]]
+
+    def matches_text(self, column: str, rows: np.ndarray, value: Optional[str]) -> np.ndarray:
+        """Masque des lignes dont la colonne texte (NORMALIZED_COLUMNS) vaut value au sens SQL Server."""
+        return self.keys[column][rows] == sql_key(value).encode("utf-8")
+
+
+def _text_array(values: list) -> np.ndarray:
+    encoded = [(v or "").encode("utf-8") for v in values]
+    width = max((len(v) for v in encoded), default=1) or 1
+    return np.array(encoded, dtype=f"S{width}")
+
+
+def write_snapshot(columns: Dict[str, list]) -> Path:
+    """
+    Écrit une nouvelle version du snapshot puis bascule le pointeur CURRENT
+    (écriture dans un répertoire temporaire, renommage, puis os.replace du pointeur :
+    un worker voit soit l'ancienne version complète, soit la nouvelle).
+    """
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    tmp = root / f".{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    arrays = {
+        name: np.array([NULL_INT if v is None else int(v) for v in columns[name]], dtype=np.int64)
+        for name in INT_COLUMNS
+    }
+    arrays.update({name: _text_array(columns[name]) for name in TEXT_COLUMNS})
+    keys = {name: _text_array([sql_key(v) for v in columns[name]]) for name in NORMALIZED_COLUMNS}
+
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", arr)
+    for name, arr in keys.items():
+        np.save(tmp / f"{name}.key.npy", arr)
+    for name in KEY_COLUMNS:
+        searchable = keys.get(name, arrays[name])
+        order = np.argsort(searchable, kind="stable")
+        np.save(tmp / f"{name}.order.npy", order)
+        np.save(tmp / f"{name}.sorted.npy", searchable[order])
+
+    final = root / version
+    os.replace(tmp, final)
+    pointer_tmp = root / f".{CURRENT_POINTER}.{os.getpid()}"
+    pointer_tmp.write_text(version)
+    os.replace(pointer_tmp, root / CURRENT_POINTER)
+
+    _cleanup_old_versions(root, version)
+    return final
+
+
+def current_version() -> Optional[str]:
+    try:
+        return (snapshot_root() / CURRENT_POINTER).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_age_seconds() -> Optional[float]:
+    """Âge de la version courante (date de bascule du pointeur)."""
+    try:
+        return time.time() - (snapshot_root() / CURRENT_POINTER).stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def open_snapshot(version: str) -> ReferenceSnapshot:
+    return ReferenceSnapshot(snapshot_root() / version)
+
+
+def _cleanup_old_versions(root: Path, current: str):
+    """
+    Supprime les versions au-delà des KEEP_VERSIONS plus récentes. Une version encore
+    mappée par un worker reste lisible jusqu'à sa fermeture (suppression POSIX) ;
+    en cas d'échec (fichier verrouillé), elle sera retentée au prochain rafraîchissement.
+    """
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for path in versions[:-KEEP_VERSIONS]:
+        if path.name == current:
+            continue
+        try:
+            shutil.rmtree(path)
+        except OSError as e:
+            logger.debug(f"♻️ Snapshot {path.name} non supprimé: {e}")
@@ -11,10 +11,16 @@ Ce module contient les services pour :
 
 from .matrix_view_service import (
     get_matrix_view_data,
-    get_matrix_view_filtered
+    get_matrix_view_filtered,
+    get_matrix_view_compact,
+    get_matrix_view_window,
+    iter_matrix_view
 )
 
 __all__ = [
     "get_matrix_view_data",
-    "get_matrix_view_filtered"
+    "get_matrix_view_filtered",
+    "get_matrix_view_compact",
+    "get_matrix_view_window",
+    "iter_matrix_view"
 ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+# ============================================
+# 📁 backend/app/services/matrix/matrix_columns.py
+# ============================================
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+# Type et couleur des colonnes : l'indice dans COLUMN_TYPE_CODES sert de code (format compact)
+COLUMN_TYPE_CODES = ["crn_only", "ext_only", "both"]
+COLUMN_TYPE_COLORS = {"both": "#c8e6c9", "crn_only": "#bbdefb", "ext_only": "#ffcc80"}
+
+_TYPES = np.array(COLUMN_TYPE_CODES)
+_COLORS = np.array([COLUMN_TYPE_COLORS[t] for t in COLUMN_TYPE_CODES])
+
+
+def _unique_refs(values: Iterable[Optional[str]]) -> np.ndarray:
+    return np.unique(np.array([v for v in values if v], dtype=str))
+
+
+def classify_columns(
+    ref_crns: Iterable[Optional[str]],
+    ref_exts: Iterable[Optional[str]]
+) -> Tuple[List[dict], Dict[str, int]]:
+    """
+    Colonnes de la matrice (union triée des ref_crn et ref_ext) avec type, couleur
+    et répartition par type, calculés sur des tableaux numpy en une passe.
+
+    Retourne des dicts (validés en bloc par le schéma de réponse) plutôt qu'un
+    MatrixColumnRef construit par colonne.
+    """
+    crn = _unique_refs(ref_crns)
+    ext = _unique_refs(ref_exts)
+    refs = np.union1d(crn, ext)
+
+    in_crn = np.isin(refs, crn, assume_unique=True)
+    in_ext = np.isin(refs, ext, assume_unique=True)
+    codes = np.where(in_crn & in_ext, 2, np.where(in_crn, 0, 1))
+
+    counts = np.bincount(codes, minlength=len(COLUMN_TYPE_CODES))
+    stats = {COLUMN_TYPE_CODES[i]: int(n) for i, n in enumerate(counts) if n}
+
+    columns = [
+        {"ref": ref, "type": ref_type, "color_code": color}
+        for ref, ref_type, color in zip(refs.tolist(), _TYPES[codes].tolist(), _COLORS[codes].tolist())
+    ]
+    return columns, stats
+
+
+def count_values(values: Iterable[Optional[str]], default: str = "Inconnue") -> Dict[str, int]:
+    """Répartition des valeurs (ex. qualité des produits), None comptée sous default."""
+    labels, counts = np.unique(np.array([v or default for v in values], dtype=str), return_counts=True)
+    return dict(zip(labels.tolist(), counts.tolist()))
@@ -1,67 +1,145 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Set, List
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.schemas.matrix.matrix_view_schema import (
     MatrixViewResponse, 
-    MatrixColumnRef,
+    MatrixViewCompactResponse,
+    MatrixViewWindowResponse,
     ProductCorrespondence
 )
-from app.services.products.detail_service import get_product_details  
-from app.services.products.match_service import get_codpro_match_list
+from app.schemas.products.detail_schema import ProductDetail
+from app.services.matrix.matrix_columns import (
+    COLUMN_TYPE_CODES,
+    COLUMN_TYPE_COLORS,
+    classify_columns,
+    count_values,
+)
+from app.services.products.detail_service import load_product_details
+from app.services.products.match_service import load_codpro_matches
+from app.db.session import run_with_session
 from app.utils.identifier_utils import resolve_codpro_list
 from app.common.logger import logger
 from app.common.redis_client import redis_client
-from app.cache.cache_keys import matrix_view_key
+from app.common.single_flight import single_flight
+from app.cache.cache_keys import (
+    matrix_view_key,
+    match_codpro_key,
+    product_details_key,
+    single_flight_key,
+)
+import asyncio
 import json
+import time
 
 
-async def get_matrix_view_data(payload: ProductIdentifierRequest, db: AsyncSession) -> MatrixViewResponse:
-    """
-    Récupère les données complètes pour la vue matricielle.
-    Inclut le cache Redis.
-    """
-    logger.info(f"🎯 Matrix view request: {payload}")
+# Vues de base récemment servies par ce worker, indexées pour le filtrage (clé matrix_view_key)
+_VIEW_INDEX_TTL = 300
+_VIEW_INDEX_MAX_ENTRIES = 64
+_view_indexes: "OrderedDict[str, Tuple[float, MatrixViewIndex]]" = OrderedDict()
 
-    cod_pro_list = await resolve_codpro_list(payload, db)
-    if not cod_pro_list:
-        logger.warning("❌ Aucun produit trouvé")
-        return MatrixViewResponse(
-            products=[], column_refs=[], correspondences=[],
-            total_products=0, total_columns=0, total_correspondences=0
-        )
-
-    redis_key = matrix_view_key(payload)
-    try:
-        cached = await redis_client.get(redis_key)
-        if cached:
-            logger.debug(f"✅ Cache hit matrix:view pour {redis_key}")
-            return MatrixViewResponse(**json.loads(cached))
-    except Exception:
-        logger.exception("[Redis] fallback matrix:view")
 
-    # Payload enrichi
-    payload.cod_pro_list = cod_pro_list
-    products_response = await get_product_details(payload, db)
-    products = products_response.products
+class MatrixViewIndex:
+    """
+    Vue matricielle de base + index cod_pro → correspondances, construit une fois :
+    chaque filtre est ensuite appliqué en mémoire, sans SQL ni Redis.
+    """
 
-    matches_response = await get_codpro_match_list(payload, db)
-    correspondences = [
-        ProductCorrespondence(cod_pro=m.cod_pro, ref_crn=m.ref_crn, ref_ext=m.ref_ext)
-        for m in matches_response.matches
-    ]
+    def __init__(self, response: MatrixViewResponse):
+        self.response = response
+        self.correspondences_by_codpro: Dict[int, List[ProductCorrespondence]] = {}
+        for c in response.correspondences:
+            self.correspondences_by_codpro.setdefault(c.cod_pro, []).append(c)
+        self._column_position: Optional[Dict[str, int]] = None
+
+    @property
+    def column_position(self) -> Dict[str, int]:
+        """Indice de chaque référence dans column_refs (construit au premier fenêtrage)."""
+        if self._column_position is None:
+            self._column_position = {col.ref: i for i, col in enumerate(self.response.column_refs)}
+        return self._column_position
+
+    def window(self, row_offset: int, row_limit: int, col_offset: int, col_limit: int) -> MatrixViewWindowResponse:
+        """
+        Découpe la vue de base : lignes [row_offset, row_offset + row_limit) et colonnes
+        [col_offset, col_offset + col_limit). Seules les correspondances des lignes de la
+        fenêtre sont parcourues : le coût suit la taille de la fenêtre, pas celle de la famille.
+        """
+        base = self.response
+        products = base.products[row_offset:row_offset + row_limit]
+        column_refs = base.column_refs[col_offset:col_offset + col_limit]
+        col_end = col_offset + col_limit
+        position = self.column_position
+
+        def _in_window(ref: Optional[str]) -> bool:
+            return ref is not None and col_offset <= position.get(ref, -1) < col_end
+
+        correspondences = [
+            c for cod_pro in dict.fromkeys(p.cod_pro for p in products)
+            for c in self.correspondences_by_codpro.get(cod_pro, [])
+            if _in_window(c.ref_crn) or _in_window(c.ref_ext)
+        ]
 
-    column_refs = _analyze_column_references(correspondences)
+        return MatrixViewWindowResponse(
+            products=products,
+            column_refs=column_refs,
+            correspondences=correspondences,
+            row_offset=row_offset,
+            col_offset=col_offset,
+            total_products=base.total_products,
+            total_columns=base.total_columns,
+            total_correspondences=base.total_correspondences,
+            column_type_stats=base.column_type_stats,
+            quality_stats=base.quality_stats,
+        )
 
-    column_type_stats = {}
-    for col in column_refs:
-        column_type_stats[col.type] = column_type_stats.get(col.type, 0) + 1
+    def filter(
+        self,
+        qualite_filter: Optional[str] = None,
+        famille_filter: Optional[int] = None,
+        statut_filter: Optional[int] = None,
+        search_term: Optional[str] = None
+    ) -> MatrixViewResponse:
+        products = self.response.products
+        if qualite_filter:
+            products = [p for p in products if p.qualite == qualite_filter]
+        if famille_filter is not None:
+            products = [p for p in products if p.famille == famille_filter]
+        if statut_filter is not None:
+            products = [p for p in products if p.statut == statut_filter]
+        if search_term:
+            s = search_term.lower()
+            products = [
+                p for p in products if s in (p.refint or '').lower() or s in (p.nom_pro or '').lower()
+            ]
+
+        correspondences = [
+            c for cod_pro in dict.fromkeys(p.cod_pro for p in products)
+            for c in self.correspondences_by_codpro.get(cod_pro, [])
+        ]
+        return _assemble_view(
+            products,
+            [p.qualite for p in products],
+            correspondences,
+            [c.ref_crn for c in correspondences],
+            [c.ref_ext for c in correspondences],
+        )
 
-    quality_stats = {}
-    for p in products:
-        q = p.qualite or "Inconnue"
-        quality_stats[q] = quality_stats.get(q, 0) + 1
 
-    response = MatrixViewResponse(
+def _assemble_view(
+    products: list,
+    qualites: List[Optional[str]],
+    correspondences: list,
+    ref_crns: List[Optional[str]],
+    ref_exts: List[Optional[str]]
+) -> MatrixViewResponse:
+    """
+    Réponse matricielle à partir des produits et correspondances (modèles ou dicts) :
+    colonnes et statistiques calculées en colonnes (matrix_columns), validation en bloc.
+    """
+    column_refs, column_type_stats = classify_columns(ref_crns, ref_exts)
+    logger.debug(f"🎨 Colonnes analysées: {len(column_refs)}")
+    return MatrixViewResponse(
         products=products,
         column_refs=column_refs,
         correspondences=correspondences,
@@ -69,129 +147,147 @@ async def get_matrix_view_data(payload: ProductIdentifierRequest, db: AsyncSessi
         total_columns=len(column_refs),
         total_correspondences=len(correspondences),
         column_type_stats=column_type_stats,
-        quality_stats=quality_stats
+        quality_stats=count_values(qualites)
     )
 
-    try:
-        await redis_client.set(redis_key, json.dumps(response.model_dump()), ex=3600)
-        logger.debug(f"✅ Cache enregistré matrix:view pour {redis_key}")
-    except Exception:
-        logger.exception("[Redis] set matrix:view")
 
-    return response
+def _remember_view_index(key: str, response: MatrixViewResponse) -> MatrixViewIndex:
+    index = MatrixViewIndex(response)
+    _view_indexes[key] = (time.monotonic() + _VIEW_INDEX_TTL, index)
+    _view_indexes.move_to_end(key)
+    while len(_view_indexes) > _VIEW_INDEX_MAX_ENTRIES:
+        _view_indexes.popitem(last=False)
+    return index
 
 
-def _analyze_column_references(correspondences: List[ProductCorrespondence]) -> List[MatrixColumnRef]:
-    ref_crn_set: Set[str] = set()
-    ref_ext_set: Set[str] = set()
+def _cached_view_index(key: str) -> Optional[MatrixViewIndex]:
+    entry = _view_indexes.get(key)
+    if entry is None:
+        return None
+    expires, index = entry
+    if expires < time.monotonic():
+        del _view_indexes[key]
+        return None
+    _view_indexes.move_to_end(key)
+    return index
 
-    for c in correspondences:
-        if c.ref_crn: ref_crn_set.add(c.ref_crn)
-        if c.ref_ext: ref_ext_set.add(c.ref_ext)
 
-    all_refs = ref_crn_set.union(ref_ext_set)
-    column_refs = []
+async def _get_view_index(payload: ProductIdentifierRequest, db: AsyncSession) -> MatrixViewIndex:
+    """
+    Vue de base indexée par ce worker, chargée une fois via get_matrix_view_data si absente.
+    Seuls les chemins qui filtrent / fenêtrent la vue l'indexent : get_matrix_view_data
+    seul ne construit pas de MatrixViewIndex.
+    """
+    view_key = matrix_view_key(payload)
+    index = _cached_view_index(view_key)
+    if index is None:
+        response = await get_matrix_view_data(payload, db)
+        index = _cached_view_index(view_key) or _remember_view_index(view_key, response)
+    return index
 
-    for ref in sorted(all_refs):
-        is_in_crn = ref in ref_crn_set
-        is_in_ext = ref in ref_ext_set
 
-        if is_in_crn and is_in_ext:
-            ref_type = 'both'
-            color_code = '#c8e6c9'
-        elif is_in_crn:
-            ref_type = 'crn_only'
-            color_code = '#bbdefb'
-        else:
-            ref_type = 'ext_only'
-            color_code = '#ffcc80'
+async def get_matrix_view_data(payload: ProductIdentifierRequest, db: AsyncSession) -> MatrixViewResponse:
+    """
+    Récupère les données complètes pour la vue matricielle.
 
-        column_refs.append(MatrixColumnRef(ref=ref, type=ref_type, color_code=color_code))
+    Le cache matrix:view (clé = payload) est lu avant toute résolution d'identifiants :
+    un hit coûte une seule lecture Redis. Sur un miss, les requêtes identiques
+    concurrentes partagent un seul calcul (single-flight).
+    """
+    response = await _read_cached_view(matrix_view_key(payload))
+    if response is not None:
+        return response
 
-    logger.debug(f"🎨 Colonnes analysées: {len(column_refs)}")
-    return column_refs
+    key = single_flight_key("matrix:view", payload.model_dump(exclude_none=True))
+    return await single_flight(key, lambda: _build_matrix_view_data(payload, db), MatrixViewResponse)
 
 
-async def get_matrix_view_filtered(
+async def _read_cached_view(view_key: str) -> Optional[MatrixViewResponse]:
+    try:
+        cached = await redis_client.get(view_key)
+        if cached:
+            logger.debug(f"✅ Cache hit matrix:view pour {view_key}")
+            return MatrixViewResponse(**json.loads(cached))
+    except Exception:
+        logger.exception("[Redis] fallback matrix:view")
+    return None
+
+
+async def _store_view(view_key: str, response: MatrixViewResponse):
+    try:
+        await redis_client.set(view_key, json.dumps(response.model_dump()), ex=3600)
+        logger.debug(f"✅ Cache enregistré matrix:view pour {view_key}")
+    except Exception:
+        logger.exception("[Redis] set matrix:view")
+
+
+async def _load_block(loader, block: str, cod_pro_list: List[int]) -> Optional[List[dict]]:
+    """Charge un bloc (détails / correspondances) sur une session dédiée ; None en cas d'erreur."""
+    try:
+        return await run_with_session(lambda session: loader(cod_pro_list, session))
+    except Exception as e:
+        logger.error(f"❌ Erreur chargement {block} vue matricielle pour cod_pro_list={cod_pro_list}: {e}")
+        return None
+
+
+async def _load_details_and_matches(
     payload: ProductIdentifierRequest,
-    qualite_filter: str = None,
-    famille_filter: int = None,
-    statut_filter: int = None,
-    search_term: str = None,
-    db: AsyncSession = None
-) -> MatrixViewResponse:
+    cod_pro_list: List[int]
+) -> Tuple[List[dict], List[dict]]:
     """
-    Version filtrée de la vue matricielle.
-    Pas de cache ici : filtrage dynamique.
+    Détails produits et correspondances pour une cod_pro_list déjà résolue :
+    une lecture Redis groupée (MGET) pour les deux blocs, puis chargement SQL
+    des blocs manquants en parallèle sur des sessions distinctes, et écriture
+    groupée (pipeline) des blocs chargés.
     """
-    base_response = await get_matrix_view_data(payload, db)
-    filtered_products = base_response.products
-
-    if qualite_filter:
-        filtered_products = [p for p in filtered_products if p.qualite == qualite_filter]
-    if famille_filter is not None:
-        filtered_products = [p for p in filtered_products if p.famille == famille_filter]
-    if statut_filter is not None:
-        filtered_products = [p for p in filtered_products if p.statut == statut_filter]
-    if search_term:
-        s = search_term.lower()
-        filtered_products = [
-            p for p in filtered_products if s in (p.refint or '').lower() or s in (p.nom_pro or '').lower()
-        ]
+    details_key = product_details_key(payload)
+    matches_key = match_codpro_key(payload)
 
-    filtered_codpros = {p.cod_pro for p in filtered_products}
-    filtered_payload = ProductIdentifierRequest(cod_pro_list=list(filtered_codpros))
-    matches_response = await get_codpro_match_list(filtered_payload, db)
-    filtered_correspondences = [
-        ProductCorrespondence(cod_pro=m.cod_pro, ref_crn=m.ref_crn, ref_ext=m.ref_ext)
-        for m in matches_response.matches
-    ]
+    products = matches = None
+    try:
+        cached_details, cached_matches = await redis_client.mget(details_key, matches_key)
+        if cached_details:
+            products = json.loads(cached_details).get("products", [])
+        if cached_matches:
+            matches = json.loads(cached_matches).get("matches", [])
+    except Exception:
+        logger.exception("[Redis] fallback matrix:details/matches")
 
-    filtered_column_refs = _analyze_column_references(filtered_correspondences)
+    loaded_details, loaded_matches = await asyncio.gather(
+        _load_block(load_product_details, "détails", cod_pro_list) if products is None else _none(),
+        _load_block(load_codpro_matches, "correspondances", cod_pro_list) if matches is None else _none(),
+    )
 
-    column_type_stats = {}
-    for c in filtered_column_refs:
-        column_type_stats[c.type] = column_type_stats.get(c.type, 0) + 1
+    try:
+        pipe = redis_client.pipeline()
+        if loaded_details is not None:
+            pipe.set(details_key, json.dumps({"products": loaded_details}, default=str), ex=3600)
+        if loaded_matches is not None:
+            pipe.set(matches_key, json.dumps({"matches": loaded_matches}), ex=3600)
+        if loaded_details is not None or loaded_matches is not None:
+            await pipe.execute()
+    except Exception:
+        logger.exception("[Redis] set matrix:details/matches")
 
-    quality_stats = {}
-    for p in filtered_products:
-        q = p.qualite or 'Inconnue'
-        quality_stats[q] = quality_stats.get(q, 0) + 1
+    if products is None:
+        products = loaded_details or []
+    if matches is None:
+        matches = loaded_matches or []
+    return products, matches
 
-    return MatrixViewResponse(
-        products=filtered_products,
-        column_refs=filtered_column_refs,
-        correspondences=filtered_correspondences,
-        total_products=len(filtered_products),
-        total_columns=len(filtered_column_refs),
-        total_correspondences=len(filtered_correspondences),
-        column_type_stats=column_type_stats,
-        quality_stats=quality_stats
-    )
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Set, List
-from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
-from app.schemas.matrix.matrix_view_schema import (
-    MatrixViewResponse, 
-    MatrixColumnRef,
-    ProductCorrespondence
-)
-from app.services.products.detail_service import get_product_details  
-from app.services.products.match_service import get_codpro_match_list
-from app.utils.identifier_utils import resolve_codpro_list
-from app.common.logger import logger
-from app.common.redis_client import redis_client
-from app.cache.cache_keys import matrix_view_key
-import json
 
+async def _none():
+    return None
 
-async def get_matrix_view_data(payload: ProductIdentifierRequest, db: AsyncSession) -> MatrixViewResponse:
+
+async def _build_matrix_view_data(payload: ProductIdentifierRequest, db: AsyncSession) -> MatrixViewResponse:
     """
-    Récupère les données complètes pour la vue matricielle.
-    Inclut le cache Redis.
+    Construit la vue matricielle complète (cache matrix:view déjà manqué)
+    et l'enregistre dans Redis.
     """
     logger.info(f"🎯 Matrix view request: {payload}")
 
+    redis_key = matrix_view_key(payload)
     cod_pro_list = await resolve_codpro_list(payload, db)
     if not cod_pro_list:
         logger.warning("❌ Aucun produit trouvé")
@@ -200,86 +296,161 @@ async def get_matrix_view_data(payload: ProductIdentifierRequest, db: AsyncSessi
             total_products=0, total_columns=0, total_correspondences=0
         )
 
-    redis_key = matrix_view_key(payload)
-    try:
-        cached = await redis_client.get(redis_key)
-        if cached:
-            logger.debug(f"✅ Cache hit matrix:view pour {redis_key}")
-            return MatrixViewResponse(**json.loads(cached))
-    except Exception:
-        logger.exception("[Redis] fallback matrix:view")
-
     # Payload enrichi
     payload.cod_pro_list = cod_pro_list
-    products_response = await get_product_details(payload, db)
-    products = products_response.products
+    products, matches = await _load_details_and_matches(payload, cod_pro_list)
+    response = _assemble_view(
+        products,
+        [p.get("qualite") for p in products],
+        matches,
+        [m["ref_crn"] for m in matches],
+        [m["ref_ext"] for m in matches],
+    )
 
-    matches_response = await get_codpro_match_list(payload, db)
-    correspondences = [
-        ProductCorrespondence(cod_pro=m.cod_pro, ref_crn=m.ref_crn, ref_ext=m.ref_ext)
-        for m in matches_response.matches
-    ]
+    await _store_view(redis_key, response)
+    return response
 
-    column_refs = _analyze_column_references(correspondences)
 
-    column_type_stats = {}
-    for col in column_refs:
-        column_type_stats[col.type] = column_type_stats.get(col.type, 0) + 1
+def _meta_record(response: MatrixViewResponse) -> dict:
+    return {
+        "type": "meta",
+        "total_products": response.total_products,
+        "total_columns": response.total_columns,
+        "total_correspondences": response.total_correspondences,
+        "column_type_stats": response.column_type_stats,
+        "quality_stats": response.quality_stats,
+    }
 
-    quality_stats = {}
-    for p in products:
-        q = p.qualite or "Inconnue"
-        quality_stats[q] = quality_stats.get(q, 0) + 1
 
-    response = MatrixViewResponse(
-        products=products,
-        column_refs=column_refs,
-        correspondences=correspondences,
-        total_products=len(products),
-        total_columns=len(column_refs),
-        total_correspondences=len(correspondences),
-        column_type_stats=column_type_stats,
-        quality_stats=quality_stats
-    )
-
-    try:
-        await redis_client.set(redis_key, json.dumps(response.model_dump()), ex=3600)
-        logger.debug(f"✅ Cache enregistré matrix:view pour {redis_key}")
-    except Exception:
-        logger.exception("[Redis] set matrix:view")
-
-    return response
+async def iter_matrix_view(payload: ProductIdentifierRequest, db: AsyncSession) -> AsyncIterator[dict]:
+    """
+    Variante streaming (NDJSON) de la vue matricielle : une ligne par colonne,
+    par produit et par correspondance, puis un enregistrement "meta" (totaux +
+    statistiques) en fin de flux.
 
+    Vue en cache (index du worker ou Redis) : rejouée telle quelle. Sinon, détails
+    et correspondances sont chargés en parallèle et chaque bloc est émis dès qu'il
+    arrive ; la vue assemblée est ensuite mise en cache comme get_matrix_view_data.
+    """
+    view_key = matrix_view_key(payload)
+    index = _cached_view_index(view_key)
+    response = index.response if index is not None else await _read_cached_view(view_key)
+    if response is not None:
+        for col in response.column_refs:
+            yield {"type": "column", **col.model_dump()}
+        for product in response.products:
+            yield {"type": "product", **product.model_dump()}
+        for corr in response.correspondences:
+            yield {"type": "correspondence", **corr.model_dump()}
+        yield _meta_record(response)
+        return
+
+    products: List[dict] = []
+    matches: List[dict] = []
+    cod_pro_list = await resolve_codpro_list(payload, db)
+    if cod_pro_list:
+        loads = {
+            asyncio.ensure_future(_load_block(load_product_details, "détails", cod_pro_list)): "products",
+            asyncio.ensure_future(_load_block(load_codpro_matches, "correspondances", cod_pro_list)): "matches",
+        }
+        pending = set(loads)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    rows = task.result() or []
+                    if loads[task] == "products":
+                        products = rows
+                        for product in rows:
+                            yield {"type": "product", **ProductDetail.model_validate(product).model_dump()}
+                    else:
+                        matches = rows
+                        columns, _ = classify_columns(
+                            [m["ref_crn"] for m in rows], [m["ref_ext"] for m in rows]
+                        )
+                        for col in columns:
+                            yield {"type": "column", **col}
+                        for m in rows:
+                            yield {"type": "correspondence", **ProductCorrespondence.model_validate(m).model_dump()}
+        finally:
+            for task in pending:
+                task.cancel()
+    else:
+        logger.warning("❌ Aucun produit trouvé")
 
-def _analyze_column_references(correspondences: List[ProductCorrespondence]) -> List[MatrixColumnRef]:
-    ref_crn_set: Set[str] = set()
-    ref_ext_set: Set[str] = set()
+    response = _assemble_view(
+        products,
+        [p.get("qualite") for p in products],
+        matches,
+        [m["ref_crn"] for m in matches],
+        [m["ref_ext"] for m in matches],
+    )
+    if cod_pro_list:
+        await _store_view(view_key, response)
+    yield _meta_record(response)
 
-    for c in correspondences:
-        if c.ref_crn: ref_crn_set.add(c.ref_crn)
-        if c.ref_ext: ref_ext_set.add(c.ref_ext)
 
-    all_refs = ref_crn_set.union(ref_ext_set)
-    column_refs = []
+def to_compact_matrix_view(response: MatrixViewResponse) -> MatrixViewCompactResponse:
+    """
+    Encode une vue matricielle au format compact : les références ne sont émises
+    qu'une fois (refs) et chaque correspondance devient une paire d'indices de colonnes.
+    """
+    refs = [col.ref for col in response.column_refs]
+    col_index = {ref: i for i, ref in enumerate(refs)}
+    type_index = {t: i for i, t in enumerate(COLUMN_TYPE_CODES)}
+
+    by_codpro: Dict[int, List[ProductCorrespondence]] = {}
+    for c in response.correspondences:
+        by_codpro.setdefault(c.cod_pro, []).append(c)
+
+    row_cod_pros = list(by_codpro)
+    row_ptr = [0]
+    crn_col = []
+    ext_col = []
+    for cod_pro in row_cod_pros:
+        for c in by_codpro[cod_pro]:
+            crn_col.append(col_index.get(c.ref_crn, -1) if c.ref_crn else -1)
+            ext_col.append(col_index.get(c.ref_ext, -1) if c.ref_ext else -1)
+        row_ptr.append(len(crn_col))
+
+    return MatrixViewCompactResponse(
+        products=response.products,
+        refs=refs,
+        ref_types=[type_index[col.type] for col in response.column_refs],
+        type_codes=COLUMN_TYPE_CODES,
+        type_colors=COLUMN_TYPE_COLORS,
+        row_cod_pros=row_cod_pros,
+        row_ptr=row_ptr,
+        crn_col=crn_col,
+        ext_col=ext_col,
+        total_products=response.total_products,
+        total_columns=response.total_columns,
+        total_correspondences=response.total_correspondences,
+        column_type_stats=response.column_type_stats,
+        quality_stats=response.quality_stats,
+    )
 
-    for ref in sorted(all_refs):
-        is_in_crn = ref in ref_crn_set
-        is_in_ext = ref in ref_ext_set
 
-        if is_in_crn and is_in_ext:
-            ref_type = 'both'
-            color_code = '#c8e6c9'
-        elif is_in_crn:
-            ref_type = 'crn_only'
-            color_code = '#bbdefb'
-        else:
-            ref_type = 'ext_only'
-            color_code = '#ffcc80'
+async def get_matrix_view_window(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    row_offset: int = 0,
+    row_limit: int = 100,
+    col_offset: int = 0,
+    col_limit: int = 50
+) -> MatrixViewWindowResponse:
+    """
+    Fenêtre de la vue matricielle (scroll virtuel) : la vue complète de la famille est
+    calculée et indexée une fois (cache Redis + index du worker), chaque fenêtre n'en
+    découpe qu'une tranche.
+    """
+    index = await _get_view_index(payload, db)
+    return index.window(row_offset, row_limit, col_offset, col_limit)
 
-        column_refs.append(MatrixColumnRef(ref=ref, type=ref_type, color_code=color_code))
 
-    logger.debug(f"🎨 Colonnes analysées: {len(column_refs)}")
-    return column_refs
+async def get_matrix_view_compact(payload: ProductIdentifierRequest, db: AsyncSession) -> MatrixViewCompactResponse:
+    """Vue matricielle au format compact (même calcul et même cache que get_matrix_view_data)."""
+    return to_compact_matrix_view(await get_matrix_view_data(payload, db))
 
 
 async def get_matrix_view_filtered(
@@ -292,49 +463,8 @@ async def get_matrix_view_filtered(
 ) -> MatrixViewResponse:
     """
     Version filtrée de la vue matricielle.
-    Pas de cache ici : filtrage dynamique.
+    Filtre en mémoire la vue de base déjà indexée par ce worker (sinon la charge une fois) :
+    les correspondances et colonnes sont dérivées de la vue de base, sans requête de matching.
     """
-    base_response = await get_matrix_view_data(payload, db)
-    filtered_products = base_response.products
-
-    if qualite_filter:
-        filtered_products = [p for p in filtered_products if p.qualite == qualite_filter]
-    if famille_filter is not None:
-        filtered_products = [p for p in filtered_products if p.famille == famille_filter]
-    if statut_filter is not None:
-        filtered_products = [p for p in filtered_products if p.statut == statut_filter]
-    if search_term:
-        s = search_term.lower()
-        filtered_products = [
-            p for p in filtered_products if s in (p.refint or '').lower() or s in (p.nom_pro or '').lower()
-        ]
-
-    filtered_codpros = {p.cod_pro for p in filtered_products}
-    filtered_payload = ProductIdentifierRequest(cod_pro_list=list(filtered_codpros))
-    matches_response = await get_codpro_match_list(filtered_payload, db)
-    filtered_correspondences = [
-        ProductCorrespondence(cod_pro=m.cod_pro, ref_crn=m.ref_crn, ref_ext=m.ref_ext)
-        for m in matches_response.matches
-    ]
-
-    filtered_column_refs = _analyze_column_references(filtered_correspondences)
-
-    column_type_stats = {}
-    for c in filtered_column_refs:
-        column_type_stats[c.type] = column_type_stats.get(c.type, 0) + 1
-
-    quality_stats = {}
-    for p in filtered_products:
-        q = p.qualite or 'Inconnue'
-        quality_stats[q] = quality_stats.get(q, 0) + 1
-
-    return MatrixViewResponse(
-        products=filtered_products,
-        column_refs=filtered_column_refs,
-        correspondences=filtered_correspondences,
-        total_products=len(filtered_products),
-        total_columns=len(filtered_column_refs),
-        total_correspondences=len(filtered_correspondences),
-        column_type_stats=column_type_stats,
-        quality_stats=quality_stats
-    )
+    index = await _get_view_index(payload, db)
+    return index.filter(qualite_filter, famille_filter, statut_filter, search_term)
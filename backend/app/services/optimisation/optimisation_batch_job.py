@@ -4,36 +4,61 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from datetime import datetime
+from datetime import datetime, timedelta
+from app.common.exceptions import CacheError, JobAlreadyRunningError
 from app.common.logger import logger
-from app.services.optimisation.optimisation_service import evaluate_group_optimization
+from app.services.optimisation.optimisation_service import compute_group_optimization
+from app.services.optimisation.optimisation_store import (
+    OPTIMISATION_DETAIL_TABLE,
+    OPTIMISATION_MONITORING_TABLE,
+    ensure_monitoring_sort_columns,
+    ensure_optimisation_detail_table,
+    save_materialized_group,
+)
+from app.services.sales.sales_cube import refresh_sales_cube
+from app.db.queries import OPTIMISATION_BATCH_GROUPS, OPTIMISATION_BATCH_GROUPS_STALE, stream_query
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
+from app.settings import get_settings
 
 
-async def run_full_optimisation_batch(db: AsyncSession):
+async def run_full_optimisation_batch(db: AsyncSession, refresh_stale: bool = False):
     """
-    ⚙️ Lance le calcul d'optimisation sur tous les groupes non encore présents
-    dans la table cbm_product_explorer.Optimisation_Monitoring
+    ⚙️ Lance le calcul d'optimisation sur tous les groupes OEM/PM qui n'ont pas
+    encore de détail matérialisé (Optimisation_Detail), servi directement par l'API.
+
+    Seuls les groupes ayant au moins 2 refs OEM ou PM alimentent aussi
+    cbm_product_explorer.Optimisation_Monitoring.
+    Avec refresh_stale=True, les groupes dont le détail est plus ancien que
+    OPTIMISATION_STORE_MAX_AGE_HOURS sont aussi recalculés. Totaux et détail d'un
+    groupe ne sont remplacés qu'après un recalcul réussi et non vide : un échec
+    (erreur SQL, timeout) annule la transaction du groupe, ses résultats restent en place.
     """
 
-    logger.info("🚀 Démarrage du batch global d'optimisation")
+    logger.info(f"🚀 Démarrage du batch global d'optimisation (refresh_stale={refresh_stale})")
 
     try:
-        query = """
-            SELECT grouping_crn, MIN(cod_pro) as cod_pro
-            FROM (
-                SELECT DISTINCT g.grouping_crn, g.cod_pro, g.qualite
-                FROM CBM_DATA.Pricing.Grouping_crn_table g
-                LEFT JOIN [CBM_DATA].[cbm_product_explorer].[Optimisation_Monitoring] m
-                    ON m.grouping_crn = g.grouping_crn
-                WHERE m.grouping_crn IS NULL
-            ) tab
-            GROUP BY grouping_crn
-            HAVING COUNT(CASE WHEN qualite = 'OEM' THEN cod_pro END) > 1
-                OR COUNT(CASE WHEN qualite IN ('PMV', 'PMQ') THEN cod_pro END) > 1
-        """
-        result = await db.execute(text(query))
-        groups = result.fetchall()
+        # Les ventes de l'optimisation sont lues dans le cube mensuel
+        try:
+            await refresh_sales_cube(db)
+        except (JobAlreadyRunningError, CacheError) as e:
+            # Rafraîchi ailleurs ou verrou indisponible : le batch lit le cube tel qu'il est
+            logger.warning(f"⏭️ Cube ventes non rafraîchi par le batch: {e}")
+        await ensure_optimisation_detail_table(db)
+        await ensure_monitoring_sort_columns(db)
+
+        query = OPTIMISATION_BATCH_GROUPS_STALE if refresh_stale else OPTIMISATION_BATCH_GROUPS
+        params = {}
+        if refresh_stale:
+            params["cutoff"] = datetime.now() - timedelta(hours=get_settings().OPTIMISATION_STORE_MAX_AGE_HOURS)
+
+        # Liste lue par paquets en couples d'entiers (pas de Row conservées) ; elle est
+        # consommée entièrement avant la boucle, qui réutilise la même connexion.
+        # Timeout driver du batch (0 = illimité) : pas de borne sur l'ouverture du curseur
+        groups = []
+        async for rows in stream_query(db, query, params, timeout=get_settings().DATABASE_WRITE_QUERY_TIMEOUT or None):
+            groups.extend(
+                (int(grouping_crn), int(cod_pro), bool(eligible)) for grouping_crn, cod_pro, eligible in rows
+            )
     except Exception as e:
         logger.error(f"❌ Erreur récupération des groupes: {e}")
         return
@@ -42,7 +67,7 @@ async def run_full_optimisation_batch(db: AsyncSession):
 
     inserted_count, skipped = 0, 0
 
-    for grouping_crn, cod_pro in groups:
+    for grouping_crn, cod_pro, eligible in groups:
         try:
             logger.info(f"🔄 Traitement grouping_crn={grouping_crn}, cod_pro={cod_pro}")
 
@@ -52,13 +77,29 @@ async def run_full_optimisation_batch(db: AsyncSession):
                 single_cod_pro=False
             )
 
-            response = await evaluate_group_optimization(payload, db)
-            if not response.items:
-                logger.warning(f"⚠️ Aucun résultat pour grouping_crn={grouping_crn}")
+            # Erreurs propagées : traitées par le except du groupe (rollback, skip)
+            items = await compute_group_optimization(payload, db)
+
+            if not items:
+                logger.warning(f"⚠️ Aucun résultat pour grouping_crn={grouping_crn}, store inchangé")
                 skipped += 1
                 continue
 
-            for item in response.items:
+            # Remplacement complet du groupe, dans la transaction des nouvelles lignes :
+            # totaux et détail d'une qualité disparue ne doivent pas survivre au recalcul
+            for table in (OPTIMISATION_MONITORING_TABLE, OPTIMISATION_DETAIL_TABLE):
+                await db.execute(
+                    text(f"DELETE FROM {table} WHERE grouping_crn = :grouping_crn"),
+                    {"grouping_crn": int(grouping_crn)}
+                )
+
+            generated_at = datetime.now()
+            for item in items:
+                # Groupes sans doublon OEM/PM : détail seul, hors monitoring
+                if not eligible:
+                    await save_materialized_group(item, generated_at, db)
+                    continue
+
                 cod_pro_principal = item.refs_to_keep[0].cod_pro if item.refs_to_keep else None
 
                 hist = item.historique_12m.totaux_12m
@@ -98,7 +139,7 @@ async def run_full_optimisation_batch(db: AsyncSession):
                     "gain_total_pmp_18m": synth.gain_total_pmp_18m,
                     "amelioration_pct": synth.amelioration_pct,
 
-                    "generated_at": datetime.now(),
+                    "generated_at": generated_at,
                 }
 
                 insert_query = text("""
@@ -130,6 +171,7 @@ async def run_full_optimisation_batch(db: AsyncSession):
                     )
                 """)
                 await db.execute(insert_query, values)
+                await save_materialized_group(item, generated_at, db)
                 inserted_count += 1
 
             await db.commit()
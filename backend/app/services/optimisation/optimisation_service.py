@@ -1,18 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.services.identifiers.identifier_service import get_codpro_list_from_identifier
-from app.schemas.optimisation.optimisation_schema import GroupOptimizationListResponse
+from app.schemas.optimisation.optimisation_schema import GroupOptimization, GroupOptimizationListResponse
+from app.services.optimisation.optimisation_store import load_materialized_groups
+from app.services.sales.sales_cube import (
+    iter_monthly_sales_by_group,
+    get_sales_totals_by_product,
+)
+from app.common.date_service import PeriodWindow
 from app.common.payload_utils import is_payload_empty
+from app.common.exceptions import QueryTimeoutError
 from app.common.logger import logger
+from app.common.single_flight import single_flight
+from app.cache.cache_keys import single_flight_key
+from app.db.queries import OPTIMISATION_GROUP_PRODUCTS, codpro_list_param, stream_query
+from app.settings import get_settings
 # from app.cache.cache_keys import optimisation_key
 # from app.common.redis_client import redis_client
 import json
 import numpy as np
-from datetime import datetime
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from time import perf_counter
+from typing import AsyncIterator, List, Optional, Tuple
 
 # Projection engine
 try:
@@ -84,258 +95,309 @@ def _coverage_factor_month(C_global, qte_m, qte_avg12):
 
 # ========================= Service =========================
 
-async def evaluate_group_optimization(payload: ProductIdentifierRequest, db: AsyncSession) -> GroupOptimizationListResponse:
-    logger.info("Démarrage evaluate_group_optimization")
+async def get_group_optimization(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    live: bool = False
+) -> GroupOptimizationListResponse:
+    """
+    Point d'entrée API : sert les résultats matérialisés par le batch
+    (table Optimisation_Detail) quand ils couvrent tout le groupe et sont frais,
+    sinon recalcule en direct via evaluate_group_optimization.
+    Les requêtes identiques concurrentes partagent un seul calcul (single-flight).
+    """
+    key = single_flight_key("optimisation:group", {**payload.model_dump(exclude_none=True), "live": live})
+    return await single_flight(
+        key, lambda: _build_group_optimization(payload, db, live), GroupOptimizationListResponse
+    )
+
+
+async def _build_group_optimization(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    live: bool
+) -> GroupOptimizationListResponse:
+    materialized, cod_pro_list = await _load_from_store(payload, db, live)
+    if materialized is not None:
+        return GroupOptimizationListResponse(items=materialized)
+    return await evaluate_group_optimization(payload, db, cod_pro_list)
+
+
+async def iter_group_optimization(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    live: bool = False
+) -> AsyncIterator[GroupOptimization]:
+    """
+    Variante streaming de get_group_optimization : les groupes sont émis
+    un par un, au fur et à mesure de leur calcul.
+    """
+    materialized, cod_pro_list = await _load_from_store(payload, db, live)
+    if materialized is not None:
+        for item in materialized:
+            yield item
+        return
+
+    async for item in _iter_live_group_optimization(payload, db, cod_pro_list):
+        yield item
+
+
+async def _load_from_store(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    live: bool
+) -> Tuple[Optional[List[GroupOptimization]], Optional[List[int]]]:
+    """
+    Retourne (items matérialisés, None) si la liste résolue couvre des groupes complets
+    et que le store est à jour, sinon (None, cod_pro_list) pour le calcul live :
+    la liste déjà résolue lui est transmise (None si non résolue), le payload
+    de l'appelant n'est pas modifié.
+    """
     if is_payload_empty(payload):
-        return GroupOptimizationListResponse(items=[])
+        return [], None
 
-    resolve_start = perf_counter()
+    # Le détail matérialisé couvre des groupes complets, toutes qualités confondues :
+    # load_materialized_groups vérifie que la liste résolue couvre chaque groupe en entier
+    if live or payload.qualite:
+        return None, None
+
+    lookup_start = perf_counter()
     cod_pro_list = payload.cod_pro_list or await get_codpro_list_from_identifier(payload, db)
     if hasattr(cod_pro_list, "cod_pro_list"):
         cod_pro_list = cod_pro_list.cod_pro_list
     if not cod_pro_list:
+        return [], None
+
+    items = await load_materialized_groups(
+        cod_pro_list, db, get_settings().OPTIMISATION_STORE_MAX_AGE_HOURS
+    )
+    if items is not None:
+        logger.info(f"⚡ Optimisation servie depuis le store: {len(items)} items en {perf_counter() - lookup_start:.3f}s")
+        return items, None
+
+    logger.info("🔁 Store d'optimisation absent ou périmé → calcul live")
+    return None, cod_pro_list
+
+
+async def compute_group_optimization(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    cod_pro_list: Optional[List[int]] = None
+) -> List[GroupOptimization]:
+    """
+    Calcul live complet, erreurs propagées : utilisé par le batch, qui ne doit pas
+    confondre un échec (SQL, timeout) avec un groupe sans données.
+    """
+    return [item async for item in _iter_live_group_optimization(payload, db, cod_pro_list)]
+
+
+async def evaluate_group_optimization(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    cod_pro_list: Optional[List[int]] = None
+) -> GroupOptimizationListResponse:
+    """
+    Calcul live pour l'API. Un timeout SQL est propagé (504 via le handler global)
+    au lieu d'être rendu comme un résultat vide ; l'annulation l'est aussi
+    (CancelledError n'hérite pas d'Exception).
+    """
+    logger.info("Démarrage evaluate_group_optimization")
+    try:
+        return GroupOptimizationListResponse(items=await compute_group_optimization(payload, db, cod_pro_list))
+
+    except QueryTimeoutError as e:
+        logger.warning(f"⏱️ evaluate_group_optimization: {e}")
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Erreur SQL evaluate_group_optimization: {e}")
         return GroupOptimizationListResponse(items=[])
+    except Exception as e:
+        logger.error(f"Erreur inattendue evaluate_group_optimization: {e}")
+        return GroupOptimizationListResponse(items=[])
+
+
+async def _iter_live_group_optimization(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    cod_pro_list: Optional[List[int]] = None
+) -> AsyncIterator[GroupOptimization]:
+    """
+    Calcul live : une requête principale + historique, puis un item émis par groupe/qualité.
+    cod_pro_list évite une seconde résolution quand l'appelant l'a déjà faite.
+    Les erreurs sont propagées à l'appelant.
+    """
+    if is_payload_empty(payload):
+        return
+
+    resolve_start = perf_counter()
+    cod_pro_list = cod_pro_list or payload.cod_pro_list or await get_codpro_list_from_identifier(payload, db)
+    if hasattr(cod_pro_list, "cod_pro_list"):
+        cod_pro_list = cod_pro_list.cod_pro_list
+    if not cod_pro_list:
+        return
     logger.info(f"cod_pro_list résolue: {len(cod_pro_list)} éléments en {perf_counter() - resolve_start:.2f}s")
 
-    try:
-        # ========= SQL principale (profil simple) =========
-        cte_lines = [f"SELECT CAST(:p0 AS INT) AS cod_pro"]
-        cte_lines += [f"UNION ALL SELECT CAST(:p{i} AS INT)" for i in range(1, len(cod_pro_list))]
-        codpro_cte = "\n".join(cte_lines)
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        query = f"""
-            WITH CodProList AS ({codpro_cte}),
-            Achat AS (
-                SELECT a.cod_pro, MIN(a.px_net_eur) AS px_achat
-                FROM CBM_DATA.Pricing.Px_achat_net a WITH (NOLOCK)
-                JOIN CodProList c ON a.cod_pro = c.cod_pro
-                GROUP BY a.cod_pro
-            ),
-            Sales AS (
-                SELECT v.cod_pro, SUM(v.tot_vte_eur) AS ca_total, SUM(v.qte) AS quantite_total
-                FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
-                JOIN CodProList c ON v.cod_pro = c.cod_pro
-                WHERE v.dat_mvt >= '2024-01-01'
-                  AND v.dat_mvt < DATEADD(DAY, 1-DAY(CONVERT(DATE, GETDATE())), CONVERT(DATE, GETDATE()))
-                GROUP BY v.cod_pro
-            )
-            SELECT dp.grouping_crn, dp.qualite, dp.cod_pro, dp.refint,
-                   ISNULL(a.px_achat,0) AS px_achat,
-                   ISNULL(s.ca_total,0) AS ca_total,
-                   ISNULL(s.quantite_total,0) AS qte_total
-            FROM (SELECT DISTINCT cod_pro, refint, grouping_crn, qualite 
-                  FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)) dp
-            JOIN CodProList c ON dp.cod_pro = c.cod_pro
-            LEFT JOIN Achat a ON dp.cod_pro = a.cod_pro
-            LEFT JOIN Sales s ON dp.cod_pro = s.cod_pro
-            WHERE dp.qualite IN ('OEM','PMQ','PMV')
-            OPTION (RECOMPILE)
-        """
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-
-        # =====================================================
-        # 🧩 Fusion PMQ/PMV → PM cohérente
-        # =====================================================
-        groups = {}
-        for g, qual, cod, refint, px, ca, qte in rows:
+    # Ventes depuis le début du cube jusqu'au mois courant exclu
+    sales = await get_sales_totals_by_product(cod_pro_list, db, window=_trend_window())
+
+    # ========= SQL principale (profil simple), lue par paquets =========
+    # =====================================================
+    # 🧩 Fusion PMQ/PMV → PM cohérente
+    # =====================================================
+    groups = {}
+    params = {"cod_pro_list": codpro_list_param(cod_pro_list)}
+    async for rows in stream_query(db, OPTIMISATION_GROUP_PRODUCTS, params):
+        for g, qual, cod, refint, px in rows:
             if not g:
                 continue
             qual_group = "PM" if qual in ("PMQ", "PMV") else qual
             key = (g, qual_group)
+            product_sales = sales.get(int(cod), {})
             groups.setdefault(key, {})
             groups[key][cod] = {
                 "cod_pro": int(cod),
                 "refint": refint,
                 "px_achat": float(px or 0),
-                "ca": float(ca or 0),
-                "qte": float(qte or 0),
+                "ca": product_sales.get("ca", 0.0),
+                "qte": product_sales.get("qte", 0.0),
                 "qualite_originale": qual
             }
 
-        history = await _get_sales_history_for_trend(cod_pro_list, db)
+    history = await _get_sales_history_for_trend(cod_pro_list, db)
+
+    for (g, qual_group), prod_dict in groups.items():
+        products = list(prod_dict.values())
+        if len(products) < 1:
+            continue
+
+        # 🧠 ici : on garde la version fusionnée (PM) comme clé JSON
+        qualite_originale = qual_group
+        qualites_combinees = list({p["qualite_originale"] for p in products})
+
+        # ========= Métriques du groupe =========
+        px_vente_pondere, px_achat_pondere, pmp_pondere, px_min, pmp_min, qtot, ca_tot = _compute_group_weights(products)
+
+        # Sélection de la meilleure référence
+        kept = sorted(products, key=lambda x: x["px_achat"])[:1]
+        kept_ids = {k["cod_pro"] for k in kept}
+        refs_to_delete = [p for p in products if p["cod_pro"] not in kept_ids]
+        refs_low_sales = [p for p in refs_to_delete if p["ca"] > 0]
+        refs_no_sales = [p for p in refs_to_delete if p["ca"] == 0]
+
+        for r in refs_low_sales:
+            r["gain_potentiel_par_ref"] = round((px_vente_pondere - px_min) * r["qte"], 2)
+        for r in refs_no_sales:
+            r["gain_potentiel_par_ref"] = 0.0
+
+        # ========= Facteur de couverture =========
+        kept_qte_12m = sum(
+            entry.qte
+            for (grp, ql), entries in history.items()
+            if (grp, ql) == (g, qual_group)
+            for entry in entries
+            if entry.cod_pro in kept_ids
+        )
+        group_qte_12m = sum(
+            entry.qte
+            for (grp, ql), entries in history.items()
+            if (grp, ql) == (g, qual_group)
+            for entry in entries
+        ) or 0.0
+        part_kept = (kept_qte_12m / group_qte_12m) if group_qte_12m > 0 else 0.0
+        C_global = _coverage_factor_global(part_kept)
+
+        # ========= Historique + Projection =========
+        historique_12m = _format_historique_12m(
+            history, g, qual_group,
+            px_vente_pondere, px_achat_pondere, px_min,
+            pmp_pondere, pmp_min, C_global
+        )
+
+        projection_6m = _project_next_6_months_with_scoring(
+            history, g, qual_group,
+            px_vente_pondere, px_achat_pondere, px_min,
+            pmp_pondere, pmp_min, C_global
+        )
+
+        # ========= Synthèse 18M =========
+        htot = historique_12m["totaux_12m"]
+        ptot = projection_6m.get("totaux", {})
+
+        gain_total_achat_18 = htot.get("gain_manque_achat", 0.0) + ptot.get("gain_potentiel_achat", 0.0)
+        gain_total_pmp_18 = htot.get("gain_manque_pmp", 0.0) + ptot.get("gain_potentiel_pmp", 0.0)
+
+        marge_achat_act_18 = htot.get("marge_achat_actuelle", 0.0) + ptot.get("marge_achat_actuelle", 0.0)
+        marge_achat_opt_18 = htot.get("marge_achat_optimisee", 0.0) + ptot.get("marge_achat_optimisee", 0.0)
+
+        amelioration_pct = (gain_total_achat_18 / marge_achat_act_18 * 100) if marge_achat_act_18 > 0 else 0.0
+
+        synthese_totale = {
+            "gain_manque_achat_12m": round(htot.get("gain_manque_achat", 0.0), 2),
+            "gain_manque_pmp_12m": round(htot.get("gain_manque_pmp", 0.0), 2),
+            "gain_potentiel_achat_6m": round(ptot.get("gain_potentiel_achat", 0.0), 2),
+            "gain_potentiel_pmp_6m": round(ptot.get("gain_potentiel_pmp", 0.0), 2),
+            "gain_total_achat_18m": round(gain_total_achat_18, 2),
+            "gain_total_pmp_18m": round(gain_total_pmp_18, 2),
+
+            # ✅ Ces deux lignes étaient manquantes
+            "marge_pmp_actuelle_18m": round(
+                htot.get("marge_pmp_actuelle", 0.0) + ptot.get("marge_pmp_actuelle", 0.0), 2
+            ),
+            "marge_pmp_optimisee_18m": round(
+                htot.get("marge_pmp_optimisee", 0.0) + ptot.get("marge_pmp_optimisee", 0.0), 2
+            ),
 
-        items = []
-        for (g, qual_group), prod_dict in groups.items():
-            products = list(prod_dict.values())
-            if len(products) < 1:
-                continue
+            "marge_achat_actuelle_18m": round(marge_achat_act_18, 2),
+            "marge_achat_optimisee_18m": round(marge_achat_opt_18, 2),
+            "amelioration_pct": round(amelioration_pct, 2)
+        }
 
-            # 🧠 ici : on garde la version fusionnée (PM) comme clé JSON
-            qualite_originale = qual_group
-            qualites_combinees = list({p["qualite_originale"] for p in products})
-
-            # ========= Métriques du groupe =========
-            px_vente_pondere, px_achat_pondere, pmp_pondere, px_min, pmp_min, qtot, ca_tot = _compute_group_weights(products)
-
-            # Sélection de la meilleure référence
-            kept = sorted(products, key=lambda x: x["px_achat"])[:1]
-            kept_ids = {k["cod_pro"] for k in kept}
-            refs_to_delete = [p for p in products if p["cod_pro"] not in kept_ids]
-            refs_low_sales = [p for p in refs_to_delete if p["ca"] > 0]
-            refs_no_sales = [p for p in refs_to_delete if p["ca"] == 0]
-
-            for r in refs_low_sales:
-                r["gain_potentiel_par_ref"] = round((px_vente_pondere - px_min) * r["qte"], 2)
-            for r in refs_no_sales:
-                r["gain_potentiel_par_ref"] = 0.0
-
-            # ========= Facteur de couverture =========
-            kept_qte_12m = sum(
-                entry["qte"]
-                for (grp, ql), entries in history.items()
-                if (grp, ql) == (g, qual_group)
-                for entry in entries
-                if entry["cod_pro"] in kept_ids
-            )
-            group_qte_12m = sum(
-                entry["qte"]
-                for (grp, ql), entries in history.items()
-                if (grp, ql) == (g, qual_group)
-                for entry in entries
-            ) or 0.0
-            part_kept = (kept_qte_12m / group_qte_12m) if group_qte_12m > 0 else 0.0
-            C_global = _coverage_factor_global(part_kept)
-
-            # ========= Historique + Projection =========
-            historique_12m = _format_historique_12m(
-                history, g, qual_group,
-                px_vente_pondere, px_achat_pondere, px_min,
-                pmp_pondere, pmp_min, C_global
-            )
-
-            projection_6m = _project_next_6_months_with_scoring(
-                history, g, qual_group,
-                px_vente_pondere, px_achat_pondere, px_min,
-                pmp_pondere, pmp_min, C_global
-            )
-
-            # ========= Synthèse 18M =========
-            htot = historique_12m["totaux_12m"]
-            ptot = projection_6m.get("totaux", {})
-
-            gain_total_achat_18 = htot.get("gain_manque_achat", 0.0) + ptot.get("gain_potentiel_achat", 0.0)
-            gain_total_pmp_18 = htot.get("gain_manque_pmp", 0.0) + ptot.get("gain_potentiel_pmp", 0.0)
-
-            marge_achat_act_18 = htot.get("marge_achat_actuelle", 0.0) + ptot.get("marge_achat_actuelle", 0.0)
-            marge_achat_opt_18 = htot.get("marge_achat_optimisee", 0.0) + ptot.get("marge_achat_optimisee", 0.0)
-
-            amelioration_pct = (gain_total_achat_18 / marge_achat_act_18 * 100) if marge_achat_act_18 > 0 else 0.0
-
-            synthese_totale = {
-                "gain_manque_achat_12m": round(htot.get("gain_manque_achat", 0.0), 2),
-                "gain_manque_pmp_12m": round(htot.get("gain_manque_pmp", 0.0), 2),
-                "gain_potentiel_achat_6m": round(ptot.get("gain_potentiel_achat", 0.0), 2),
-                "gain_potentiel_pmp_6m": round(ptot.get("gain_potentiel_pmp", 0.0), 2),
-                "gain_total_achat_18m": round(gain_total_achat_18, 2),
-                "gain_total_pmp_18m": round(gain_total_pmp_18, 2),
-
-                # ✅ Ces deux lignes étaient manquantes
-                "marge_pmp_actuelle_18m": round(
-                    htot.get("marge_pmp_actuelle", 0.0) + ptot.get("marge_pmp_actuelle", 0.0), 2
-                ),
-                "marge_pmp_optimisee_18m": round(
-                    htot.get("marge_pmp_optimisee", 0.0) + ptot.get("marge_pmp_optimisee", 0.0), 2
-                ),
-
-                "marge_achat_actuelle_18m": round(marge_achat_act_18, 2),
-                "marge_achat_optimisee_18m": round(marge_achat_opt_18, 2),
-                "amelioration_pct": round(amelioration_pct, 2)
-            }
 
+        # ========= Ancienne métrique gain_potentiel (immédiat) =========
+        marge_actuelle = sum([p["ca"] - p["px_achat"] * p["qte"] for p in products])
+        marge_simulee = px_vente_pondere * qtot - px_min * qtot
+        gain_potentiel = marge_simulee - marge_actuelle
+
+        # ========= Construction finale item =========
+        yield GroupOptimization(**{
+            "grouping_crn": int(g),
+            "qualite": qualite_originale,              # ✅ cohérente (OEM, PM, etc.)
+            "qualites_combinees": qualites_combinees,  # ✅ PMQ/PMV listées
+            "refs_total": len(products),
+            "px_achat_min": px_min,
+            "px_vente_pondere": round(px_vente_pondere, 2),
+            "taux_croissance": projection_6m["taux_croissance"],
+            "gain_potentiel": round(gain_potentiel, 2),
+            "historique_12m": historique_12m,
+            "projection_6m": projection_6m,
+            "synthese_totale": synthese_totale,
+            "refs_to_keep": kept,
+            "refs_to_delete_low_sales": refs_low_sales,
+            "refs_to_delete_no_sales": refs_no_sales
+        })
 
-            # ========= Ancienne métrique gain_potentiel (immédiat) =========
-            marge_actuelle = sum([p["ca"] - p["px_achat"] * p["qte"] for p in products])
-            marge_simulee = px_vente_pondere * qtot - px_min * qtot
-            gain_potentiel = marge_simulee - marge_actuelle
-
-            # ========= Construction finale item =========
-            items.append({
-                "grouping_crn": int(g),
-                "qualite": qualite_originale,              # ✅ cohérente (OEM, PM, etc.)
-                "qualites_combinees": qualites_combinees,  # ✅ PMQ/PMV listées
-                "refs_total": len(products),
-                "px_achat_min": px_min,
-                "px_vente_pondere": round(px_vente_pondere, 2),
-                "taux_croissance": projection_6m["taux_croissance"],
-                "gain_potentiel": round(gain_potentiel, 2),
-                "historique_12m": historique_12m,
-                "projection_6m": projection_6m,
-                "synthese_totale": synthese_totale,
-                "refs_to_keep": kept,
-                "refs_to_delete_low_sales": refs_low_sales,
-                "refs_to_delete_no_sales": refs_no_sales
-            })
-
-        return GroupOptimizationListResponse(items=items)
 
-    except SQLAlchemyError as e:
-        logger.error(f"Erreur SQL evaluate_group_optimization: {e}")
-        return GroupOptimizationListResponse(items=[])
-    except Exception as e:
-        logger.error(f"Erreur inattendue evaluate_group_optimization: {e}")
-        return GroupOptimizationListResponse(items=[])
+def _trend_window() -> PeriodWindow:
+    """
+    Fenêtre [début du cube, mois courant) des ventes utilisées par l'optimisation.
+    """
+    return PeriodWindow.since(date.fromisoformat(get_settings().SALES_CUBE_START_DATE))
 
 
 async def _get_sales_history_for_trend(cod_pro_list, db: AsyncSession):
     """
-    Récupère l’historique des ventes mensuelles depuis janvier 2024
-    avec les marges réelles (PA & PMP).
+    Récupère l’historique des ventes mensuelles (cube) depuis le début du cube
+    avec les marges réelles (PA & PMP), mois courant exclu.
+
+    {(grouping_crn, qualité PM fusionnée): [MonthlyGroupSales]} : les tuples du cube
+    sont rangés tels quels au fil du curseur, sans copie en dicts.
     """
     try:
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        query = f"""
-            SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-            SELECT 
-                dp.grouping_crn, 
-                dp.qualite,
-                dp.cod_pro,
-                CONVERT(VARCHAR(7), v.dat_mvt, 120) AS periode,
-                SUM(v.qte) AS qte,
-                SUM(v.tot_vte_eur) AS ca,
-                SUM(v.tot_pa_eur) AS total_pa,
-                SUM(v.tot_marge_pa_eur) AS marge_pa,
-                SUM(v.tot_pmp_eur) AS total_pmp,
-                SUM(v.tot_marge_pmp_eur) AS marge_pmp,
-                MIN(a.px_net_eur) AS px_achat
-            FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
-            INNER JOIN (
-                SELECT DISTINCT cod_pro, grouping_crn, qualite 
-                FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
-            ) dp ON v.cod_pro = dp.cod_pro
-            LEFT JOIN CBM_DATA.Pricing.Px_achat_net a WITH (NOLOCK) 
-                ON v.cod_pro = a.cod_pro
-            WHERE v.cod_pro IN ({placeholders})
-              AND v.dat_mvt >= '2024-01-01'
-              AND v.dat_mvt < DATEADD(DAY, 1-DAY(CONVERT(DATE, GETDATE())), CONVERT(DATE, GETDATE()))
-              AND dp.qualite IN ('OEM','PMQ','PMV')
-            GROUP BY dp.grouping_crn, dp.qualite, dp.cod_pro, 
-                     CONVERT(VARCHAR(7), v.dat_mvt, 120)
-            ORDER BY dp.grouping_crn, dp.qualite, periode
-        """
-
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-
         history = {}
-        for row in rows:
-            qualite_norm = "PM" if row.qualite in ("PMQ","PMV") else row.qualite
-            key = (row.grouping_crn, qualite_norm)
-            history.setdefault(key, [])
-            history[key].append({
-                'cod_pro': row.cod_pro,
-                'periode': row.periode,
-                'qte': float(row.qte or 0),
-                'ca': float(row.ca or 0),
-                'total_pa': float(row.total_pa or 0),
-                'marge_pa': float(row.marge_pa or 0),
-                'total_pmp': float(row.total_pmp or 0),
-                'marge_pmp': float(row.marge_pmp or 0),
-                'px_achat': float(row.px_achat or 0)
-            })
+        async for rows in iter_monthly_sales_by_group(cod_pro_list, db, window=_trend_window()):
+            for row in rows:
+                qualite_norm = "PM" if row.qualite in ("PMQ","PMV") else row.qualite
+                history.setdefault((row.grouping_crn, qualite_norm), []).append(row)
 
         return history
 
@@ -368,12 +430,12 @@ def _format_historique_12m(history, grouping_crn, qualite,
     # agrégation mensuelle groupe
     mois_data = {}
     for e in data:
-        p = e['periode']
+        p = e.periode
         d = mois_data.setdefault(p, {'qte':0,'ca':0,'m_pa':0,'m_pmp':0})
-        d['qte'] += e['qte']
-        d['ca'] += e['ca']
-        d['m_pa'] += e['marge_pa']
-        d['m_pmp'] += e['marge_pmp']
+        d['qte'] += e.qte
+        d['ca'] += e.ca
+        d['m_pa'] += e.marge_pa
+        d['m_pmp'] += e.marge_pmp
 
     # moyenne 12m pour C_m
     qtes = [d['qte'] for _,d in sorted(mois_data.items())][-12:]
@@ -473,7 +535,7 @@ def _project_next_6_months_with_scoring(history, grouping_crn, qualite,
     # série mensuelle qte
     monthly = {}
     for e in data:
-        monthly[e['periode']] = monthly.get(e['periode'],0.0) + e['qte']
+        monthly[e.periode] = monthly.get(e.periode,0.0) + e.qte
     series = sorted(monthly.items())  # [(YYYY-MM, qte)]
 
     if all(q<=0 for _,q in series):
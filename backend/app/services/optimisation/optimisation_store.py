@@ -0,0 +1,288 @@
+# ============================================
+# 📁 backend/app/services/optimisation/optimisation_store.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta
+from typing import List, Optional
+from app.schemas.optimisation.optimisation_schema import (
+    GroupOptimization,
+    GroupOptimizationSummary,
+    GroupOptimizationPageResponse,
+)
+from app.common.pagination import encode_cursor, decode_cursor
+from app.common.sortable_columns import OPTIMISATION_COLUMNS
+from app.common.sql_utils import sanitize_sort_column, sanitize_sort_direction
+from app.common.logger import logger
+from app.db.queries import (
+    OPTIMISATION_DETAIL_TABLE,
+    OPTIMISATION_MONITORING_TABLE,
+    OPTIMISATION_MATERIALIZED_GROUPS,
+    codpro_list_param,
+    execute_text,
+    run_query,
+)
+import json
+
+
+# Tables écrites par le batch, définies avec les requêtes nommées qui les lisent (app.db.queries) :
+# - OPTIMISATION_MONITORING_TABLE : totaux par groupe/qualité
+# - OPTIMISATION_DETAIL_TABLE : un item GroupOptimization complet par groupe/qualité
+
+# Colonnes de tri nullables de Optimisation_Monitoring : chacune a une colonne calculée
+# persistée sort_<colonne> = ISNULL(<colonne>, 0), indexée avec (grouping_crn, qualite),
+# pour que tri et curseur keyset soient des seeks (ISNULL() dans le WHERE ne l'est pas)
+SORT_KEY_COLUMNS = tuple(c for c in OPTIMISATION_COLUMNS.values() if c != "grouping_crn")
+
+# Passe à True une fois les colonnes sort_* constatées (créées par le batch)
+_sort_columns_ready = False
+
+
+async def ensure_optimisation_detail_table(db: AsyncSession):
+    """
+    Crée la table de détail si elle n'existe pas encore.
+    Appelée au démarrage du batch.
+    """
+    await db.execute(text(f"""
+        IF OBJECT_ID('{OPTIMISATION_DETAIL_TABLE}', 'U') IS NULL
+        BEGIN
+            CREATE TABLE {OPTIMISATION_DETAIL_TABLE} (
+                grouping_crn INT NOT NULL,
+                qualite VARCHAR(10) NOT NULL,
+                payload NVARCHAR(MAX) NOT NULL,
+                generated_at DATETIME2 NOT NULL,
+                CONSTRAINT PK_Optimisation_Detail PRIMARY KEY (grouping_crn, qualite)
+            )
+        END
+    """))
+    await db.commit()
+
+
+async def ensure_monitoring_sort_columns(db: AsyncSession):
+    """
+    Ajoute à Optimisation_Monitoring les colonnes calculées de tri et leurs index
+    (SORT_KEY_COLUMNS) s'ils n'existent pas encore. Appelée au démarrage du batch.
+    """
+    for column in SORT_KEY_COLUMNS:
+        await db.execute(text(f"""
+            IF COL_LENGTH('{OPTIMISATION_MONITORING_TABLE}', 'sort_{column}') IS NULL
+                ALTER TABLE {OPTIMISATION_MONITORING_TABLE}
+                    ADD sort_{column} AS ISNULL({column}, 0) PERSISTED;
+        """))
+        await db.execute(text(f"""
+            IF NOT EXISTS (
+                SELECT 1 FROM sys.indexes
+                WHERE object_id = OBJECT_ID('{OPTIMISATION_MONITORING_TABLE}')
+                  AND name = 'IX_Optimisation_Monitoring_sort_{column}'
+            )
+                CREATE INDEX IX_Optimisation_Monitoring_sort_{column}
+                    ON {OPTIMISATION_MONITORING_TABLE} (sort_{column}, grouping_crn, qualite);
+        """))
+    await db.commit()
+
+
+async def _has_sort_columns(db: AsyncSession) -> bool:
+    """Colonnes sort_* présentes (le batch ne les a peut-être pas encore créées)."""
+    global _sort_columns_ready
+    if not _sort_columns_ready:
+        result = await execute_text(
+            db, "optimisation.sort_columns",
+            f"SELECT COL_LENGTH('{OPTIMISATION_MONITORING_TABLE}', 'sort_{SORT_KEY_COLUMNS[-1]}')"
+        )
+        _sort_columns_ready = result.scalar() is not None
+    return _sort_columns_ready
+
+
+async def save_materialized_group(item: GroupOptimization, generated_at: datetime, db: AsyncSession):
+    """
+    Upsert du détail complet (historique 12m, projection 6m, listes de refs) d'un groupe.
+    Le commit reste à la charge de l'appelant (batch).
+    """
+    await db.execute(
+        text(f"""
+            MERGE {OPTIMISATION_DETAIL_TABLE} WITH (HOLDLOCK) AS t
+            USING (SELECT :grouping_crn AS grouping_crn, :qualite AS qualite) AS s
+                ON t.grouping_crn = s.grouping_crn AND t.qualite = s.qualite
+            WHEN MATCHED THEN
+                UPDATE SET payload = :payload, generated_at = :generated_at
+            WHEN NOT MATCHED THEN
+                INSERT (grouping_crn, qualite, payload, generated_at)
+                VALUES (:grouping_crn, :qualite, :payload, :generated_at);
+        """),
+        {
+            "grouping_crn": int(item.grouping_crn),
+            "qualite": item.qualite,
+            "payload": item.model_dump_json(),
+            "generated_at": generated_at,
+        }
+    )
+
+
+async def load_materialized_groups(
+    cod_pro_list: List[int],
+    db: AsyncSession,
+    max_age_hours: int
+) -> Optional[List[GroupOptimization]]:
+    """
+    Lit les résultats pré-calculés pour tous les groupes couvrant cod_pro_list.
+
+    Retourne None si cod_pro_list ne couvre pas en entier les membres OEM/PM d'un
+    des groupes (le détail matérialisé porte sur le groupe complet), si un des groupes
+    n'a pas de détail matérialisé ou si celui-ci est plus ancien que max_age_hours :
+    l'appelant retombe alors sur le calcul live.
+    """
+    if not cod_pro_list:
+        return None
+
+    try:
+        result = await run_query(
+            db, OPTIMISATION_MATERIALIZED_GROUPS, {"cod_pro_list": codpro_list_param(cod_pro_list)}
+        )
+        rows = result.fetchall()
+    except SQLAlchemyError as e:
+        logger.error(f"❌ Erreur SQL lecture détail matérialisé: {e}")
+        return None
+
+    if not rows:
+        return None
+
+    cutoff = datetime.now() - timedelta(hours=max_age_hours)
+    items = []
+    for grouping_crn, nb_membres, nb_demandes, qualite, payload, generated_at in rows:
+        if nb_demandes < nb_membres:
+            logger.debug(f"✂️ Groupe {grouping_crn} demandé partiellement ({nb_demandes}/{nb_membres})")
+            return None
+        if payload is None or generated_at is None:
+            logger.debug(f"⚪ Pas de détail matérialisé pour grouping_crn={grouping_crn}")
+            return None
+        if generated_at < cutoff:
+            logger.debug(f"⏳ Détail matérialisé périmé pour grouping_crn={grouping_crn} ({generated_at})")
+            return None
+        items.append(GroupOptimization(**json.loads(payload)))
+
+    return items
+
+
+async def list_materialized_groups(
+    db: AsyncSession,
+    sort_by: Optional[str] = None,
+    sort_dir: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    qualite: Optional[str] = None,
+    min_gain: Optional[float] = None,
+    summary_only: bool = True
+) -> GroupOptimizationPageResponse:
+    """
+    Liste paginée (keyset) des groupes optimisés depuis Optimisation_Monitoring.
+
+    Le tri porte sur (colonne demandée, grouping_crn, qualite) : le curseur encode
+    les valeurs de la dernière ligne servie, chaque page coûte donc un seek d'index
+    quelle que soit sa profondeur. Avec summary_only=False, le détail matérialisé
+    (historique/projection) est joint pour les lignes de la page uniquement.
+
+    Lève ValueError si le curseur est invalide ou ne correspond pas au tri demandé.
+    """
+    sort_by = sanitize_sort_column(sort_by, OPTIMISATION_COLUMNS, default="gain_total_achat_18m")
+    sort_dir = sanitize_sort_direction(sort_dir or "desc")
+    column = OPTIMISATION_COLUMNS[sort_by]
+    if column not in SORT_KEY_COLUMNS:
+        sort_expr = f"m.{column}"
+    elif await _has_sort_columns(db):
+        sort_expr = f"m.sort_{column}"
+    else:
+        logger.warning("⚠️ Colonnes sort_* absentes de Optimisation_Monitoring (batch non relancé) : tri par scan")
+        sort_expr = f"ISNULL(m.{column}, 0)"
+    op = "<" if sort_dir == "desc" else ">"
+
+    where = []
+    params = {"fetch": limit + 1}
+    if qualite:
+        where.append("m.qualite = :qualite")
+        params["qualite"] = qualite
+    if min_gain is not None:
+        where.append("m.gain_total_achat_18m >= :min_gain")
+        params["min_gain"] = min_gain
+
+    if cursor:
+        position = decode_cursor(cursor, keys=("s", "d", "v", "g", "q"))
+        if position["s"] != sort_by or position["d"] != sort_dir:
+            raise ValueError("Curseur incompatible avec le tri demandé")
+        try:
+            params.update({
+                "c_v": float(position["v"]), "c_g": int(position["g"]), "c_q": str(position["q"]),
+            })
+        except (TypeError, ValueError):
+            raise ValueError(f"Curseur invalide: {cursor}")
+        # Borne sur la colonne de tête de l'index (seek), puis départage
+        where.append(f"""(
+            {sort_expr} {op}= :c_v
+            AND (
+                {sort_expr} {op} :c_v
+                OR m.grouping_crn {op} :c_g
+                OR (m.grouping_crn = :c_g AND m.qualite {op} :c_q)
+            )
+        )""")
+
+    where_clause = " AND ".join(where) if where else "1=1"
+    detail_select = "" if summary_only else ", d.payload"
+    detail_join = "" if summary_only else f"""
+        LEFT JOIN {OPTIMISATION_DETAIL_TABLE} d WITH (NOLOCK)
+            ON d.grouping_crn = m.grouping_crn AND d.qualite = m.qualite"""
+
+    query = f"""
+        SELECT TOP (:fetch)
+            m.grouping_crn, m.qualite, m.cod_pro, m.nb_refs,
+            m.ca_12m, m.gain_manque_achat_12m, m.gain_potentiel_achat_6m,
+            m.gain_total_achat_18m, m.gain_total_pmp_18m, m.amelioration_pct,
+            m.generated_at, {sort_expr} AS sort_value{detail_select}
+        FROM {OPTIMISATION_MONITORING_TABLE} m WITH (NOLOCK){detail_join}
+        WHERE {where_clause}
+        ORDER BY {sort_expr} {sort_dir.upper()}, m.grouping_crn {sort_dir.upper()}, m.qualite {sort_dir.upper()}
+    """
+    result = await execute_text(db, "optimisation.list_groups", query, params)
+    rows = result.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    details = []
+    for r in rows:
+        items.append(GroupOptimizationSummary(
+            grouping_crn=int(r.grouping_crn),
+            qualite=r.qualite,
+            cod_pro=r.cod_pro,
+            refs_total=int(r.nb_refs or 0),
+            ca_12m=float(r.ca_12m or 0),
+            gain_manque_achat_12m=float(r.gain_manque_achat_12m or 0),
+            gain_potentiel_achat_6m=float(r.gain_potentiel_achat_6m or 0),
+            gain_total_achat_18m=float(r.gain_total_achat_18m or 0),
+            gain_total_pmp_18m=float(r.gain_total_pmp_18m or 0),
+            amelioration_pct=float(r.amelioration_pct or 0),
+            generated_at=r.generated_at.isoformat() if r.generated_at else None,
+        ))
+        if not summary_only and r.payload:
+            details.append(GroupOptimization(**json.loads(r.payload)))
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor({
+            "s": sort_by, "d": sort_dir,
+            "v": last.sort_value, "g": int(last.grouping_crn), "q": last.qualite,
+        })
+
+    logger.debug(f"📄 Page optimisation: {len(items)} groupes (sort={sort_by} {sort_dir}, has_more={has_more})")
+
+    return GroupOptimizationPageResponse(
+        items=items,
+        details=details,
+        next_cursor=next_cursor,
+        has_more=has_more,
+        limit=limit,
+        sort_by=sort_by,
+        sort_dir=sort_dir,
+    )
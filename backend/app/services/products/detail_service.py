@@ -1,5 +1,4 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.utils.identifier_utils import resolve_codpro_list
@@ -7,6 +6,7 @@ from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.schemas.products.detail_schema import ProductDetailResponse
 from app.common.payload_utils import is_payload_empty
 from app.common.logger import logger
+from app.db.queries import PRODUCT_DETAILS, codpro_list_param, run_query
 
 from app.cache.cache_keys import product_details_key
 from app.common.redis_client import redis_client
@@ -39,40 +39,7 @@ async def get_product_details(payload: ProductIdentifierRequest, db: AsyncSessio
 
     # ✅ Requête SQL sécurisée
     try:
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        query = f"""
-            SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-            SELECT 
-                p.cod_pro,
-                p.refint,
-                p.refext AS ref_ext,
-                p.famille,
-                p.s_famille,
-                p.qualite,
-                p.statut,
-                f.cod_fou_principal,
-                fou.nom_fou, 
-                p.nom_pro
-            FROM CBM_DATA.dm.Dim_Produit p WITH (NOLOCK)
-            LEFT JOIN (
-                SELECT DISTINCT cod_pro, cod_fou_principal
-                FROM CBM_DATA.dm.Fact_Produit_Depot_Fournisseur WITH (NOLOCK)
-            ) f ON p.cod_pro = f.cod_pro
-            LEFT JOIN (
-                SELECT cod_fou, nom_fou
-                FROM CBM_DATA.dm.Dim_Fournisseur WITH (NOLOCK)
-            ) fou ON f.cod_fou_principal = fou.cod_fou
-            WHERE p.cod_pro IN ({placeholders})
-            ORDER BY p.cod_pro
-        """
-
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-        columns = result.keys()
-
-        products = [dict(zip(columns, row)) for row in rows]
+        products = await load_product_details(cod_pro_list, db)
 
         logger.debug(f"✅ Détails produits récupérés: {len(products)} éléments")
 
@@ -91,3 +58,13 @@ async def get_product_details(payload: ProductIdentifierRequest, db: AsyncSessio
     except Exception as e:
         logger.error(f"❌ Erreur inattendue get_product_details pour cod_pro_list={cod_pro_list}: {e}")
         return ProductDetailResponse(products=[])
+
+
+async def load_product_details(cod_pro_list: list[int], db: AsyncSession) -> list[dict]:
+    """
+    Lecture SQL brute des détails produits (sans cache), pour les appelants qui
+    gèrent eux-mêmes la résolution et le cache (ex. vue matricielle).
+    """
+    result = await run_query(db, PRODUCT_DETAILS, {"cod_pro_list": codpro_list_param(cod_pro_list)})
+    columns = result.keys()
+    return [dict(zip(columns, row)) for row in result.fetchall()]
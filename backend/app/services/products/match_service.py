@@ -1,14 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.common.logger import logger
+from app.db.queries import PRODUCT_MATCHES, codpro_list_param, run_query
 from app.common.redis_client import redis_client
 from app.cache.cache_keys import match_codpro_key
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.schemas.products.match_schema import ProductMatchListResponse
 from app.services.identifiers.identifier_service import get_codpro_list_from_identifier
+from app.services.identifiers.identifier_index import get_identifier_index
 from app.common.payload_utils import is_payload_empty
+from app.common.strings import sql_key
 import json
 
 
@@ -20,6 +22,12 @@ async def get_codpro_match_list(payload: ProductIdentifierRequest, db: AsyncSess
     if is_payload_empty(payload):
         return ProductMatchListResponse(matches=[])
 
+    # ✅ 0. Snapshot référentiel mémoire-mappé : ni SQL ni cache Redis
+    index = get_identifier_index()
+    if index is not None:
+        cod_pro_list = payload.cod_pro_list or index.resolve(payload)
+        return ProductMatchListResponse(matches=index.matches_for(cod_pro_list))
+
     redis_key = match_codpro_key(payload)
 
     # ✅ 1. Cache Redis
@@ -40,38 +48,8 @@ async def get_codpro_match_list(payload: ProductIdentifierRequest, db: AsyncSess
         return ProductMatchListResponse(matches=[])
 
     try:
-        # ✅ 3. Paramètres SQL sécurisés
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        result = await db.execute(
-            text(f"""
-                SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-                SELECT DISTINCT
-                    pdp.cod_pro, 
-                    pdp.ref_crn, 
-                    Dim_Produit.refext AS ref_ext
-                FROM [CBM_DATA].[Pricing].[Grouping_crn_table] pdp WITH (NOLOCK)
-                LEFT JOIN CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
-                    ON pdp.cod_pro = Dim_Produit.cod_pro
-                WHERE pdp.cod_pro IN ({placeholders})
-            """),
-            params
-        )
-
-        rows = result.fetchall()
-        seen = set()
-        matches = []
-
-        for row in rows:
-            key = (int(row[0]), row[1], row[2])
-            if key not in seen:
-                matches.append({
-                    "cod_pro": int(row[0]),
-                    "ref_crn": row[1],
-                    "ref_ext": row[2]
-                })
-                seen.add(key)
+        # ✅ 3. Requête nommée (liste cod_pro en un seul paramètre)
+        matches = await load_codpro_matches(cod_pro_list, db)
 
         logger.debug(f"✅ Matches récupérés: {len(matches)} éléments uniques")
 
@@ -90,3 +68,24 @@ async def get_codpro_match_list(payload: ProductIdentifierRequest, db: AsyncSess
     except Exception as e:
         logger.error(f"❌ Erreur inattendue get_codpro_match_list pour cod_pro_list={cod_pro_list}: {e}")
         return ProductMatchListResponse(matches=[])
+
+
+async def load_codpro_matches(cod_pro_list: list[int], db: AsyncSession) -> list[dict]:
+    """
+    Triplets distincts cod_pro / ref_crn / ref_ext sans cache : snapshot mémoire
+    si chargé, sinon requête PRODUCT_MATCHES.
+    """
+    index = get_identifier_index()
+    if index is not None:
+        return index.matches_for(cod_pro_list)
+
+    result = await run_query(db, PRODUCT_MATCHES, {"cod_pro_list": codpro_list_param(cod_pro_list)})
+    seen = set()
+    matches = []
+    for row in result.fetchall():
+        # Même déduplication que IdentifierIndex.matches_for (collation SQL Server)
+        key = (int(row[0]), sql_key(row[1]), sql_key(row[2]))
+        if key not in seen:
+            matches.append({"cod_pro": key[0], "ref_crn": row[1], "ref_ext": row[2]})
+            seen.add(key)
+    return matches
@@ -1,5 +1,4 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.common.redis_client import redis_client
 from app.cache.cache_keys import resolve_codpro_key
@@ -8,6 +7,7 @@ from app.services.identifiers.identifier_service import get_codpro_list_from_ide
 from app.schemas.products.matrix_schema import ProductMatrixResponse
 from app.common.constants import REDIS_TTL_SHORT
 from app.common.logger import logger
+from app.db.queries import PRODUCT_MATRIX, codpro_list_param, run_query
 from app.common.payload_utils import is_payload_empty
 import json
 
@@ -46,25 +46,8 @@ async def get_product_matrix_from_identifier(
         return empty_matrix
 
     try:
-        # ✅ 3. Paramètres SQL sécurisés
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        result = await db.execute(
-            text(f"""
-                SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-                SELECT DISTINCT 
-                    pdp.grouping_crn AS groupe_crn, 
-                    pdp.cod_pro, 
-                    pdp.ref_crn, 
-                    Dim_Produit.refext AS ref_ext
-                FROM CBM_DATA.Pricing.Dimensions_Produit pdp WITH (NOLOCK)
-                LEFT JOIN CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
-                    ON pdp.cod_pro = Dim_Produit.cod_pro
-                WHERE pdp.cod_pro IN ({placeholders})
-            """),
-            params
-        )
+        # ✅ 3. Requête nommée (liste cod_pro en un seul paramètre)
+        result = await run_query(db, PRODUCT_MATRIX, {"cod_pro_list": codpro_list_param(cod_pro_list)})
         rows = result.fetchall()
 
         # ✅ 4. Nettoyage et sets pour éviter les doublons
@@ -1,11 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.utils.identifier_utils import resolve_codpro_list
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.schemas.purchase.purchase_schema import ProductPurchasePriceResponse
 from app.common.payload_utils import is_payload_empty
 from app.common.logger import logger
+from app.db.queries import PURCHASE_PRICES, codpro_list_param, run_query
 from app.common.redis_client import redis_client
 from app.cache.cache_keys import purchase_price_key
 import json
@@ -35,26 +35,8 @@ async def get_purchase_price(payload: ProductIdentifierRequest, db: AsyncSession
         logger.exception("[Redis] fallback get_purchase_price")
 
     try:
-        # ✅ 2. Paramètres sécurisés
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        query = f"""
-            SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-            SELECT cod_pro, px_net_eur as px_achat_eur
-            FROM CBM_DATA.Pricing.Px_achat_net WITH (NOLOCK)
-            WHERE cod_pro IN ({placeholders})
-        """
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-
-        items = [
-            {
-                "cod_pro": int(r[0]),
-                "px_achat_eur": float(r[1]) if r[1] is not None else None
-            }
-            for r in rows
-        ]
+        # ✅ 2. Requête nommée (liste cod_pro en un seul paramètre)
+        items = await load_purchase_prices(cod_pro_list, db)
         response = ProductPurchasePriceResponse(items=items)
 
         # ✅ 3. Écriture cache
@@ -72,3 +54,15 @@ async def get_purchase_price(payload: ProductIdentifierRequest, db: AsyncSession
     except Exception as e:
         logger.error(f"❌ Erreur inattendue get_purchase_price pour cod_pro_list={cod_pro_list}: {e}")
         return ProductPurchasePriceResponse(items=[])
+
+
+async def load_purchase_prices(cod_pro_list: list[int], db: AsyncSession) -> list[dict]:
+    """Prix d'achat net par cod_pro (sans cache)."""
+    result = await run_query(db, PURCHASE_PRICES, {"cod_pro_list": codpro_list_param(cod_pro_list)})
+    return [
+        {
+            "cod_pro": int(r[0]),
+            "px_achat_eur": float(r[1]) if r[1] is not None else None
+        }
+        for r in result.fetchall()
+    ]
@@ -0,0 +1,365 @@
+# ============================================
+# 📁 backend/app/services/sales/sales_cube.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from app.common.date_service import PeriodWindow, first_of_month, month_key, month_label
+from app.common.logger import logger
+from app.db.queries import (
+    SALES_CUBE_TABLE,
+    SALES_CUBE_STATE,
+    SALES_MONTHLY_BY_PRODUCT,
+    SALES_MONTHLY_BY_PRODUCT_LIVE,
+    SALES_TOTALS_BY_PRODUCT,
+    SALES_TOTALS_BY_PRODUCT_LIVE,
+    SALES_MONTHLY_BY_GROUP,
+    SALES_MONTHLY_BY_GROUP_LIVE,
+    codpro_list_param,
+    run_query,
+    stream_query,
+)
+from app.common.periodic_job import job_lock, periodic_job_loop
+from app.db.watermark import ensure_watermark_table, get_watermark, set_watermark
+from app.settings import get_settings
+import time
+
+
+# Ventes agrégées par (cod_pro, mois) : seul point d'accès des services aux ventes mensuelles.
+# periode est une clé entière YYYYMM (ex. 202403), cf. date_service.month_key.
+# Les lectures passent par les requêtes nommées de app.db.queries : mois clos depuis le
+# cube, mois postérieurs au watermark (mois ouvert) agrégés en live depuis les mouvements.
+
+SALES_CUBE_JOB = "sales_monthly"
+
+# État du cube relu au plus toutes les CUBE_STATE_TTL secondes par worker
+CUBE_STATE_TTL = 60
+_cube_state: Optional[Tuple[float, Optional[date], Optional[date]]] = None
+
+
+def _cube_start() -> date:
+    return date.fromisoformat(get_settings().SALES_CUBE_START_DATE)
+
+
+async def _get_cube_state(db: AsyncSession) -> Tuple[Optional[date], Optional[date]]:
+    """
+    (1er jour du mois du watermark, 1er jour couvert par le cube), ou (None, None)
+    si le cube n'a jamais été rafraîchi ou n'est pas lisible : tout est alors lu en live.
+    """
+    global _cube_state
+    if _cube_state is not None and _cube_state[0] > time.monotonic():
+        return _cube_state[1], _cube_state[2]
+
+    live_from = cube_start = None
+    try:
+        row = (await run_query(db, SALES_CUBE_STATE, {"job_name": SALES_CUBE_JOB})).fetchone()
+        if row and row[0] is not None and row[1] is not None:
+            live_from = first_of_month(row[0].date() if isinstance(row[0], datetime) else row[0])
+            cube_start = row[1]
+    except Exception as e:
+        logger.warning(f"⚠️ État du cube ventes illisible, lecture live: {e}")
+    _cube_state = (time.monotonic() + CUBE_STATE_TTL, live_from, cube_start)
+    return live_from, cube_start
+
+
+async def sales_window_params(window: Optional[PeriodWindow], db: AsyncSession) -> Tuple[bool, dict]:
+    """
+    Bornes de fenêtre des lectures ventes et choix de la variante (True = cube + live),
+    pour toute requête bâtie sur les sources ventes de app.db.queries (exports compris).
+
+    Le cube sert les mois antérieurs à celui du watermark ; ce mois et les suivants
+    (mois ouvert, ou cube en retard) sont agrégés en live. Cube absent, jamais rafraîchi
+    ou ne couvrant pas le début de la fenêtre : toute la fenêtre est lue en live.
+    """
+    window = window or PeriodWindow.since(_cube_start(), include_current=True)
+    live_from, cube_start = await _get_cube_state(db)
+    use_cube = live_from is not None and window.start >= cube_start
+    live_start = max(window.start, live_from) if use_cube else window.start
+    return use_cube, {
+        "start_key": window.start_key,
+        "end_key": window.end_key,
+        "live_key": month_key(live_start),
+        "live_start": live_start,
+        "live_end": window.end,
+    }
+
+
+async def _read_params(
+    cod_pro_list: List[int],
+    window: Optional[PeriodWindow],
+    db: AsyncSession
+) -> Tuple[bool, dict]:
+    """Paramètres des lectures par liste de cod_pro (cf. sales_window_params)."""
+    use_cube, params = await sales_window_params(window, db)
+    return use_cube, {"cod_pro_list": codpro_list_param(cod_pro_list), **params}
+
+
+# =====================================================
+# 🧱 Maintenance du cube
+# =====================================================
+
+# Table de construction de la reconstruction complète, même structure que le cube :
+# remplie hors ligne puis basculée dans le cube par ALTER TABLE ... SWITCH
+SALES_CUBE_STAGING_TABLE = SALES_CUBE_TABLE + "_Staging"
+
+
+def _cube_table_ddl(table: str, pk_name: str) -> str:
+    return f"""
+        IF OBJECT_ID('{table}', 'U') IS NULL
+        BEGIN
+            CREATE TABLE {table} (
+                cod_pro INT NOT NULL,
+                periode INT NOT NULL,
+                qte FLOAT NULL,
+                ca FLOAT NULL,
+                total_pa FLOAT NULL,
+                marge_pa FLOAT NULL,
+                total_pmp FLOAT NULL,
+                marge_pmp FLOAT NULL,
+                marge_pr FLOAT NULL,
+                refreshed_at DATETIME2 NOT NULL,
+                CONSTRAINT {pk_name} PRIMARY KEY (cod_pro, periode)
+            )
+        END
+    """
+
+
+async def ensure_sales_cube_table(db: AsyncSession):
+    """
+    Crée le cube et sa table de construction s'ils n'existent pas encore.
+    """
+    await db.execute(text(_cube_table_ddl(SALES_CUBE_TABLE, "PK_Sales_Monthly")))
+    await db.execute(text(_cube_table_ddl(SALES_CUBE_STAGING_TABLE, "PK_Sales_Monthly_Staging")))
+    await db.commit()
+
+
+_CUBE_INSERT_COLUMNS = """
+    INSERT INTO {table} (
+        cod_pro, periode, qte, ca, total_pa, marge_pa, total_pmp, marge_pmp, marge_pr, refreshed_at
+    )
+"""
+
+_CUBE_MEASURES = """
+    SUM(v.qte), SUM(v.tot_vte_eur), SUM(v.tot_pa_eur), SUM(v.tot_marge_pa_eur),
+    SUM(v.tot_pmp_eur), SUM(v.tot_marge_pmp_eur), SUM(v.tot_marge_pr_eur), :refreshed_at
+"""
+
+
+async def refresh_sales_cube(db: AsyncSession, full: bool = False) -> dict:
+    """
+    Point d'entrée unique du rafraîchissement (tâche périodique, batch d'optimisation,
+    endpoint) : sous le verrou de job partagé, un seul rafraîchissement à la fois
+    tous workers confondus. Lève JobAlreadyRunningError si un autre est en cours.
+    """
+    async with job_lock(SALES_CUBE_JOB):
+        return await _refresh_sales_cube(db, full)
+
+
+async def _refresh_sales_cube(db: AsyncSession, full: bool) -> dict:
+    """
+    Rafraîchit le cube mensuel.
+
+    En incrémental, seules les cellules (cod_pro, mois) ayant reçu un mouvement
+    depuis le watermark (bornes incluses : lignes arrivées en retard pour le jour du
+    watermark) sont recalculées (DELETE + INSERT de la cellule entière, dans une
+    transaction : les lectures du cube se font en READCOMMITTED et ne voient que
+    l'état validé).
+    full=True reconstruit le cube depuis SALES_CUBE_START_DATE (à utiliser après une
+    correction ou un mouvement antidaté) : construction dans SALES_CUBE_STAGING_TABLE
+    puis bascule (TRUNCATE + SWITCH, opérations de métadonnées) dans la transaction
+    du watermark ; le cube n'est jamais lu vide ou partiellement rempli.
+    """
+    await ensure_sales_cube_table(db)
+    await ensure_watermark_table(db)
+
+    global _cube_state
+    start_date = _cube_start()
+    refreshed_at = datetime.now()
+    watermark = None if full else await get_watermark(SALES_CUBE_JOB, db)
+
+    result = await db.execute(text("""
+        SELECT MAX(dat_mvt) FROM CBM_DATA.Pricing.Px_vte_mouvement WITH (NOLOCK)
+    """))
+    new_mark = result.scalar()
+
+    try:
+        if watermark is None or watermark[0] is None:
+            logger.info(f"🧮 Cube ventes : reconstruction complète depuis {start_date}")
+            await db.execute(text(f"TRUNCATE TABLE {SALES_CUBE_STAGING_TABLE}"))
+            await db.execute(
+                text(_CUBE_INSERT_COLUMNS.format(table=SALES_CUBE_STAGING_TABLE) + f"""
+                    SELECT v.cod_pro, YEAR(v.dat_mvt) * 100 + MONTH(v.dat_mvt),
+                        {_CUBE_MEASURES}
+                    FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
+                    WHERE v.dat_mvt >= :start_date
+                    GROUP BY v.cod_pro, YEAR(v.dat_mvt) * 100 + MONTH(v.dat_mvt)
+                """),
+                {"start_date": start_date, "refreshed_at": refreshed_at}
+            )
+            # Bascule : les lectures en cours (verrou de schéma) terminent sur l'ancien cube
+            await db.execute(text(f"""
+                TRUNCATE TABLE {SALES_CUBE_TABLE};
+                ALTER TABLE {SALES_CUBE_STAGING_TABLE} SWITCH TO {SALES_CUBE_TABLE};
+            """))
+            mode = "full"
+        else:
+            await db.execute(text("IF OBJECT_ID('tempdb..#cellules') IS NOT NULL DROP TABLE #cellules"))
+            await db.execute(
+                text("""
+                    SELECT DISTINCT cod_pro,
+                           YEAR(dat_mvt) * 100 + MONTH(dat_mvt) AS periode,
+                           DATEFROMPARTS(YEAR(dat_mvt), MONTH(dat_mvt), 1) AS debut
+                    INTO #cellules
+                    FROM CBM_DATA.Pricing.Px_vte_mouvement WITH (NOLOCK)
+                    WHERE dat_mvt >= :last_mvt AND dat_mvt >= :start_date
+                """),
+                {"last_mvt": watermark[0], "start_date": start_date}
+            )
+            await db.execute(text(f"""
+                DELETE c FROM {SALES_CUBE_TABLE} c
+                JOIN #cellules n ON n.cod_pro = c.cod_pro AND n.periode = c.periode
+            """))
+            await db.execute(
+                text(_CUBE_INSERT_COLUMNS.format(table=SALES_CUBE_TABLE) + f"""
+                    SELECT n.cod_pro, n.periode,
+                        {_CUBE_MEASURES}
+                    FROM #cellules n
+                    JOIN CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
+                        ON v.cod_pro = n.cod_pro
+                       AND v.dat_mvt >= n.debut
+                       AND v.dat_mvt < DATEADD(MONTH, 1, n.debut)
+                    GROUP BY n.cod_pro, n.periode
+                """),
+                {"refreshed_at": refreshed_at}
+            )
+            mode = "incremental"
+
+        await set_watermark(SALES_CUBE_JOB, new_mark, start_date, refreshed_at, db)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    _cube_state = None
+
+    logger.info(f"✅ Cube ventes rafraîchi ({mode}), watermark={new_mark}")
+    return {
+        "mode": mode,
+        "start_date": start_date.isoformat(),
+        "last_mvt": new_mark.isoformat() if new_mark else None,
+        "refreshed_at": refreshed_at.isoformat(),
+    }
+
+
+# =====================================================
+# 📖 Lecture
+# =====================================================
+
+class MonthlyProductSales(NamedTuple):
+    cod_pro: int
+    refint: Optional[str]
+    periode: str
+    qte: float
+    ca: float
+    total_pa: float
+    marge_pa: float
+    total_pmp: float
+    marge_pmp: float
+    marge_pr: float
+
+
+class MonthlyGroupSales(NamedTuple):
+    grouping_crn: int
+    qualite: str
+    cod_pro: int
+    periode: str
+    qte: float
+    ca: float
+    total_pa: float
+    marge_pa: float
+    total_pmp: float
+    marge_pmp: float
+    px_achat: float
+
+
+async def iter_monthly_sales_by_product(
+    cod_pro_list: List[int],
+    db: AsyncSession,
+    window: Optional[PeriodWindow] = None
+) -> AsyncIterator[List[MonthlyProductSales]]:
+    """
+    Une ligne par (cod_pro, mois) avec refint, triée par cod_pro puis période,
+    lue en curseur serveur et produite par paquets (cf. stream_query).
+    """
+    if not cod_pro_list:
+        return
+    use_cube, params = await _read_params(cod_pro_list, window, db)
+    query = SALES_MONTHLY_BY_PRODUCT if use_cube else SALES_MONTHLY_BY_PRODUCT_LIVE
+    async for rows in stream_query(db, query, params):
+        yield [
+            MonthlyProductSales(
+                int(cod_pro), refint, month_label(periode),
+                float(qte or 0), float(ca or 0), float(total_pa or 0), float(marge_pa or 0),
+                float(total_pmp or 0), float(marge_pmp or 0), float(marge_pr or 0),
+            )
+            for cod_pro, refint, periode, qte, ca, total_pa, marge_pa, total_pmp, marge_pmp, marge_pr in rows
+        ]
+
+
+async def get_sales_totals_by_product(
+    cod_pro_list: List[int],
+    db: AsyncSession,
+    window: Optional[PeriodWindow] = None
+) -> Dict[int, dict]:
+    """
+    Totaux par cod_pro sur la fenêtre : {cod_pro: {refint, qte, ca, marge_pr}}.
+    Les produits sans vente sur la période sont absents.
+    """
+    if not cod_pro_list:
+        return {}
+    use_cube, params = await _read_params(cod_pro_list, window, db)
+    result = await run_query(db, SALES_TOTALS_BY_PRODUCT if use_cube else SALES_TOTALS_BY_PRODUCT_LIVE, params)
+
+    return {
+        int(r.cod_pro): {
+            "refint": r.refint,
+            "qte": float(r.qte or 0),
+            "ca": float(r.ca or 0),
+            "marge_pr": float(r.marge_pr or 0),
+        }
+        for r in result.fetchall()
+    }
+
+
+async def iter_monthly_sales_by_group(
+    cod_pro_list: List[int],
+    db: AsyncSession,
+    window: Optional[PeriodWindow] = None
+) -> AsyncIterator[List[MonthlyGroupSales]]:
+    """
+    Ventes mensuelles par produit rattachées à leur (grouping_crn, qualite)
+    OEM/PMQ/PMV, avec le prix d'achat net minimum du produit ; produites par
+    paquets depuis un curseur serveur.
+    """
+    if not cod_pro_list:
+        return
+    use_cube, params = await _read_params(cod_pro_list, window, db)
+    query = SALES_MONTHLY_BY_GROUP if use_cube else SALES_MONTHLY_BY_GROUP_LIVE
+    async for rows in stream_query(db, query, params):
+        yield [
+            MonthlyGroupSales(
+                grouping_crn, qualite, cod_pro, month_label(periode),
+                float(qte or 0), float(ca or 0), float(total_pa or 0), float(marge_pa or 0),
+                float(total_pmp or 0), float(marge_pmp or 0), float(px_achat or 0),
+            )
+            for grouping_crn, qualite, cod_pro, periode, qte, ca, total_pa, marge_pa, total_pmp, marge_pmp, px_achat in rows
+        ]
+
+
+async def sales_cube_refresh_loop():
+    """
+    Tâche de fond (lifespan) : rafraîchissement incrémental du cube toutes les
+    SALES_CUBE_REFRESH_SECONDS, sur un seul worker (bail Redis).
+    """
+    await periodic_job_loop("sales_cube", get_settings().SALES_CUBE_REFRESH_SECONDS, refresh_sales_cube)
@@ -1,18 +1,23 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.utils.identifier_utils import resolve_codpro_list
 from app.common.payload_utils import is_payload_empty
-from app.common.date_service import get_last_n_months
+from app.common.date_service import PeriodWindow
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
 from app.schemas.sales.sales_schema import (
     ProductSalesAggregateResponse,
     ProductSalesHistoryResponse
 )
+from app.services.sales.sales_cube import (
+    MonthlyProductSales,
+    iter_monthly_sales_by_product,
+    get_sales_totals_by_product,
+)
 from app.common.logger import logger
 from app.cache.cache_keys import sales_agg_key, sales_history_key
 from app.common.redis_client import redis_client
+from typing import AsyncIterator, List
 import json
 
 
@@ -27,7 +32,10 @@ async def get_sales_aggregate(
     if not cod_pro_list:
         return ProductSalesAggregateResponse(items=[])
 
-    redis_key = sales_agg_key(payload)
+    # 12 derniers mois, mois courant inclus
+    window = PeriodWindow.last_n_months(12)
+
+    redis_key = sales_agg_key(payload, window.cache_token)
     try:
         cached = await redis_client.get(redis_key)
         if cached:
@@ -37,42 +45,7 @@ async def get_sales_aggregate(
         logger.exception("[Redis] fallback sales:agg")
 
     try:
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": cod for i, cod in enumerate(cod_pro_list)}
-
-        query = f"""
-            SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-            SELECT
-                v.cod_pro,
-                d.refint,
-                SUM(v.tot_vte_eur) AS ca_total,
-                SUM(v.tot_marge_pr_eur) AS marge_total,
-                SUM(v.qte) AS quantite_total,
-                CASE WHEN SUM(v.tot_vte_eur) = 0 THEN 0 ELSE
-                    100 * SUM(v.tot_marge_pr_eur) / NULLIF(SUM(v.tot_vte_eur), 0)
-                END AS marge_percent_total
-            FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
-            LEFT JOIN CBM_DATA.dm.Dim_Produit d WITH (NOLOCK) 
-            ON v.cod_pro = d.cod_pro
-            WHERE v.dat_mvt >= DATEADD(YEAR, -1, GETDATE())
-            AND v.cod_pro IN ({placeholders})
-            GROUP BY v.cod_pro, d.refint
-            ORDER BY ca_total DESC
-        """
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-
-        items = [
-            {
-                "cod_pro": int(r[0]),
-                "refint": r[1],
-                "ca_total": float(r[2] or 0),
-                "marge_total": float(r[3] or 0),
-                "quantite_total": float(r[4] or 0),
-                "marge_percent_total": float(r[5] or 0),
-            }
-            for r in rows
-        ]
+        items = await load_sales_aggregate(cod_pro_list, db, window)
 
         logger.debug(f"✅ Agrégat ventes récupéré: {len(items)} éléments")
 
@@ -104,10 +77,10 @@ async def get_sales_history(
     if not cod_pro_list:
         return ProductSalesHistoryResponse(items=[])
 
-    months = get_last_n_months(last_n_months)
-    min_period = months[0] + "-01"
+    window = PeriodWindow.last_n_months(last_n_months)
+    min_period = window.start.isoformat()
 
-    redis_key = sales_history_key(payload, min_period)
+    redis_key = sales_history_key(payload, window.cache_token)
     try:
         cached = await redis_client.get(redis_key)
         if cached:
@@ -117,47 +90,7 @@ async def get_sales_history(
         logger.exception("[Redis] fallback sales:history")
 
     try:
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": cod for i, cod in enumerate(cod_pro_list)}
-        params["min_period"] = min_period
-
-        query = f"""
-            SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-            WITH ventes AS (
-                SELECT
-                    v.cod_pro,
-                    d.refint,
-                    CONVERT(VARCHAR(7), v.dat_mvt, 120) AS periode,
-                    SUM(v.tot_vte_eur) AS ca,
-                    SUM(v.tot_marge_pr_eur) AS marge,
-                    SUM(v.qte) AS quantite,
-                    CASE WHEN SUM(v.tot_vte_eur) = 0 THEN 0 ELSE
-                        100 * SUM(v.tot_marge_pr_eur) / NULLIF(SUM(v.tot_vte_eur), 0)
-                    END AS marge_percent
-                FROM CBM_DATA.Pricing.Px_vte_mouvement v WITH (NOLOCK)
-                LEFT JOIN CBM_DATA.dm.Dim_Produit d WITH (NOLOCK) 
-                ON v.cod_pro = d.cod_pro
-                WHERE v.cod_pro IN ({placeholders}) AND v.dat_mvt >= :min_period
-                GROUP BY v.cod_pro, d.refint, CONVERT(VARCHAR(7), v.dat_mvt, 120)
-            )
-            SELECT * FROM ventes
-            ORDER BY cod_pro, periode
-        """
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-
-        items = [
-            {
-                "cod_pro": int(r[0]),
-                "refint": r[1],
-                "periode": r[2],
-                "ca": float(r[3] or 0),
-                "marge": float(r[4] or 0),
-                "quantite": float(r[5] or 0),
-                "marge_percent": float(r[6] or 0),
-            }
-            for r in rows
-        ]
+        items = await load_sales_history(cod_pro_list, db, window)
 
         logger.debug(f"✅ Historique ventes récupéré: {len(items)} éléments pour période >= {min_period}")
 
@@ -175,3 +108,67 @@ async def get_sales_history(
     except Exception as e:
         logger.error(f"❌ Erreur inattendue get_sales_history pour cod_pro_list={cod_pro_list}: {e}")
         return ProductSalesHistoryResponse(items=[])
+
+
+async def load_sales_aggregate(cod_pro_list: list[int], db: AsyncSession, window: PeriodWindow) -> list[dict]:
+    """Agrégat ventes par cod_pro sur la fenêtre (cube mensuel, sans cache), trié par CA décroissant."""
+    totals = await get_sales_totals_by_product(cod_pro_list, db, window=window)
+    return sorted(
+        (
+            {
+                "cod_pro": cod_pro,
+                "refint": t["refint"],
+                "ca_total": t["ca"],
+                "marge_total": t["marge_pr"],
+                "quantite_total": t["qte"],
+                "marge_percent_total": (100 * t["marge_pr"] / t["ca"]) if t["ca"] else 0.0,
+            }
+            for cod_pro, t in totals.items()
+        ),
+        key=lambda item: item["ca_total"],
+        reverse=True
+    )
+
+
+def _history_items(rows: List[MonthlyProductSales]) -> List[dict]:
+    return [
+        {
+            "cod_pro": r.cod_pro,
+            "refint": r.refint,
+            "periode": r.periode,
+            "ca": r.ca,
+            "marge": r.marge_pr,
+            "quantite": r.qte,
+            "marge_percent": (100 * r.marge_pr / r.ca) if r.ca else 0.0,
+        }
+        for r in rows
+    ]
+
+
+async def load_sales_history(cod_pro_list: list[int], db: AsyncSession, window: PeriodWindow) -> list[dict]:
+    """
+    Historique mensuel par cod_pro sur la fenêtre (cube mensuel, sans cache) : les
+    items sont construits paquet par paquet depuis le curseur, sans liste intermédiaire.
+    """
+    items = []
+    async for rows in iter_monthly_sales_by_product(cod_pro_list, db, window=window):
+        items.extend(_history_items(rows))
+    return items
+
+
+async def iter_sales_history(
+    payload: ProductIdentifierRequest,
+    db: AsyncSession,
+    last_n_months: int = 12
+) -> AsyncIterator[dict]:
+    """
+    Historique mensuel en flux (NDJSON) : chaque ligne du curseur part vers le client
+    sans que l'historique complet soit chargé ni mis en cache.
+    """
+    if is_payload_empty(payload):
+        return
+    cod_pro_list = await resolve_codpro_list(payload, db)
+    window = PeriodWindow.last_n_months(last_n_months)
+    async for rows in iter_monthly_sales_by_product(cod_pro_list, db, window=window):
+        for item in _history_items(rows):
+            yield item
@@ -1,5 +1,4 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.utils.identifier_utils import resolve_codpro_list
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
@@ -10,6 +9,7 @@ from app.schemas.stock.stock_schema import (
 from app.common.date_service import get_last_n_months
 from app.common.payload_utils import is_payload_empty
 from app.common.logger import logger
+from app.db.queries import STOCK_ACTUEL, codpro_list_param, run_query
 from app.cache.cache_keys import stock_actuel_key, stock_history_key
 from app.common.redis_client import redis_client
 import json
@@ -33,32 +33,7 @@ async def get_stock_actuel(payload: ProductIdentifierRequest, db: AsyncSession)
         logger.exception("[Redis] fallback stock:actuel")
 
     try:
-        placeholders = ", ".join([f":p{i}" for i in range(len(cod_pro_list))])
-        params = {f"p{i}": int(cod) for i, cod in enumerate(cod_pro_list)}
-
-        query = f"""
-            SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-            SELECT cod_pro, depot, stock, pmp_eur
-            FROM CBM_DATA.stock.Fact_Stock_Actuel WITH (NOLOCK)
-            INNER JOIN (
-                SELECT [WarehouseNumber] 
-                FROM CBM_DATA.import.companyStatus WITH (NOLOCK) 
-                WHERE [AnalysisFlag] = 1
-            ) AS cs ON cs.WarehouseNumber = depot
-            WHERE cod_pro IN ({placeholders})
-        """
-        result = await db.execute(text(query), params)
-        rows = result.fetchall()
-
-        items = [
-            {
-                "cod_pro": int(r[0]),
-                "depot": int(r[1]),
-                "stock": float(r[2] or 0),
-                "pmp": float(r[3]) if r[3] is not None else None,
-            }
-            for r in rows
-        ]
+        items = await load_stock_actuel(cod_pro_list, db)
 
         logger.debug(f"✅ Stock actuel récupéré: {len(items)} éléments")
 
@@ -78,6 +53,20 @@ async def get_stock_actuel(payload: ProductIdentifierRequest, db: AsyncSession)
         return ProductStockResponse(items=[])
 
 
+async def load_stock_actuel(cod_pro_list: list[int], db: AsyncSession) -> list[dict]:
+    """Stock actuel par cod_pro et dépôt analysé (sans cache)."""
+    result = await run_query(db, STOCK_ACTUEL, {"cod_pro_list": codpro_list_param(cod_pro_list)})
+    return [
+        {
+            "cod_pro": int(r[0]),
+            "depot": int(r[1]),
+            "stock": float(r[2] or 0),
+            "pmp": float(r[3]) if r[3] is not None else None,
+        }
+        for r in result.fetchall()
+    ]
+
+
 # async def get_stock_history(
 #     payload: ProductIdentifierRequest,
 #     db: AsyncSession,
@@ -0,0 +1,63 @@
+# ============================================
+# 📁 backend/app/services/suggestion/prefix_cache.py
+# ============================================
+
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+import time
+
+
+class PrefixResultCache:
+    """
+    Cache mémoire des résultats d'autocomplétion par préfixe, borné en durée (ttl)
+    et en nombre d'entrées (LRU).
+
+    Chaque entrée garde jusqu'à fetch_size lignes et un indicateur « complet »
+    (moins de fetch_size lignes : toutes les correspondances du préfixe sont là).
+    Une saisie « ABC1 » est alors servie en filtrant le résultat complet de « ABC »
+    sans nouvelle requête.
+    """
+
+    def __init__(self, matches: Callable[[Any, str], bool], ttl: float, max_entries: int):
+        self._matches = matches
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[Any], bool]]" = OrderedDict()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        # Collation SQL Server insensible à la casse
+        return query.upper()
+
+    def _lookup(self, key: str) -> Optional[Tuple[List[Any], bool]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, rows, complete = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return rows, complete
+
+    def get(self, query: str, limit: int) -> Optional[List[Any]]:
+        """Résultat pour query depuis l'entrée exacte, ou un préfixe plus court complet."""
+        key = self._key(query)
+        exact = self._lookup(key)
+        if exact is not None:
+            return exact[0][:limit]
+        for k in range(len(key) - 1, 0, -1):
+            found = self._lookup(key[:k])
+            if found is not None and found[1]:
+                return [row for row in found[0] if self._matches(row, query)][:limit]
+        return None
+
+    def put(self, query: str, rows: List[Any], complete: bool):
+        key = self._key(query)
+        self._entries[key] = (time.monotonic() + self._ttl, rows, complete)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,134 @@
+# ============================================
+# 📁 backend/app/services/suggestion/prefix_index.py
+# ============================================
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.common.logger import logger
+from app.db.queries import (
+    SUGGEST_INDEX_REFINT_CODPRO,
+    SUGGEST_INDEX_REF_CRN,
+    SUGGEST_INDEX_REF_EXT,
+    run_query,
+)
+from app.db.session import async_write_session
+from app.settings import get_settings
+import asyncio
+import re
+
+
+settings = get_settings()
+
+_SEPARATORS = re.compile(r"[\s\-_./]+")
+
+
+def normalize_ref(value: str) -> str:
+    """Clé de recherche : majuscules, sans espaces ni séparateurs (« ab-12 3 » → « AB123 »)."""
+    return _SEPARATORS.sub("", value).upper()
+
+
+def _casefold_ref(value: str) -> str:
+    """Clé sans normalisation des séparateurs : casse ignorée, comme la collation SQL Server."""
+    return value.upper()
+
+
+class PrefixIndex:
+    """
+    Recherche par préfixe sur un tableau trié de clés (bisect) :
+    O(log n) pour se positionner, puis lecture séquentielle des correspondances.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]], normalize: bool = True):
+        self._key = normalize_ref if normalize else _casefold_ref
+        pairs = sorted(((self._key(value), item) for value, item in entries if value), key=lambda p: p[0])
+        self.keys: List[str] = [k for k, _ in pairs]
+        self.items: List[Any] = [item for _, item in pairs]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, prefix: str, limit: int = 10) -> List[Any]:
+        """Premiers éléments (ordre des clés) dont la clé commence par prefix, sans doublon."""
+        prefix = self._key(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                break
+            item = self.items[i]
+            if item in seen:
+                continue
+            seen.add(item)
+            results.append(item)
+            if len(results) >= limit:
+                break
+        return results
+
+
+class SuggestionIndexes:
+    """Index d'autocomplétion chargés ensemble (refint, cod_pro, ref_crn, ref_ext)."""
+
+    def __init__(self, refint_codpro: List[Tuple[Optional[str], int]], ref_crn: List[str], ref_ext: List[str]):
+        normalize = settings.SUGGEST_NORMALIZE_REFS
+        self.refint = PrefixIndex(((r, (r, c)) for r, c in refint_codpro), normalize)
+        # cod_pro : préfixe numérique, jamais normalisé
+        self.cod_pro = PrefixIndex(((str(c), (r, c)) for r, c in refint_codpro), normalize=False)
+        self.ref_crn = PrefixIndex(((r, r) for r in ref_crn), normalize)
+        self.ref_ext = PrefixIndex(((r, r) for r in ref_ext), normalize)
+
+    def refint_or_codpro(self, query: str, limit: int = 10) -> List[Tuple[Optional[str], int]]:
+        """
+        Couples (refint, cod_pro) dont le refint ou le cod_pro commence par query,
+        triés par refint comme la requête SQL (chaque index fournit ses limit premiers).
+        """
+        pairs = set(self.refint.search(query, limit)) | set(self.cod_pro.search(query, limit))
+        return sorted(pairs, key=lambda p: (p[0] or "", p[1]))[:limit]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "refint": len(self.refint),
+            "cod_pro": len(self.cod_pro),
+            "ref_crn": len(self.ref_crn),
+            "ref_ext": len(self.ref_ext),
+        }
+
+
+_indexes: Optional[SuggestionIndexes] = None
+
+
+def get_suggestion_indexes() -> Optional[SuggestionIndexes]:
+    """Index du worker (None tant que le premier chargement n'a pas abouti)."""
+    return _indexes
+
+
+async def refresh_suggestion_indexes(db: AsyncSession) -> Dict[str, int]:
+    """Recharge les valeurs distinctes depuis SQL Server et remplace les index du worker."""
+    global _indexes
+    timeout = settings.IDENTIFIER_INDEX_LOAD_TIMEOUT
+    refint_codpro = [
+        (r[0], int(r[1]))
+        for r in (await run_query(db, SUGGEST_INDEX_REFINT_CODPRO, timeout=timeout)).fetchall()
+    ]
+    ref_crn = [r[0] for r in (await run_query(db, SUGGEST_INDEX_REF_CRN, timeout=timeout)).fetchall()]
+    ref_ext = [r[0] for r in (await run_query(db, SUGGEST_INDEX_REF_EXT, timeout=timeout)).fetchall()]
+
+    # Tri des clés hors boucle événementielle
+    _indexes = await asyncio.to_thread(SuggestionIndexes, refint_codpro, ref_crn, ref_ext)
+    logger.info(f"🔤 Index autocomplétion chargés: {_indexes.stats()}")
+    return _indexes.stats()
+
+
+async def suggestion_index_refresh_loop():
+    """Tâche de fond (lifespan) : chargement au démarrage puis toutes les SUGGEST_INDEX_REFRESH_SECONDS."""
+    while True:
+        try:
+            async with async_write_session() as db:
+                await refresh_suggestion_indexes(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Rafraîchissement index autocomplétion: {e}")
+        await asyncio.sleep(settings.SUGGEST_INDEX_REFRESH_SECONDS)
@@ -1,12 +1,65 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from app.common.redis_client import redis_client
 from app.common.constants import REDIS_TTL_SHORT
 from app.common.logger import logger
+from app.db.queries import (
+    SUGGEST_REFCRN_BY_CODPRO,
+    SUGGEST_REFINT_OR_CODPRO,
+    SUGGEST_REF_CRN,
+    SUGGEST_REF_EXT,
+    run_query,
+)
+from app.services.suggestion.prefix_index import get_suggestion_indexes
+from app.services.suggestion.prefix_cache import PrefixResultCache
+from app.settings import get_settings
 
 import json
 
 
+settings = get_settings()
+
+# Nombre de suggestions renvoyées au client
+SUGGEST_LIMIT = 10
+
+# Caractères spéciaux de LIKE : le filtrage Python d'un préfixe en cache ne les interprète pas
+_LIKE_WILDCARDS = set("%_[")
+
+
+def _starts_with(value: str | None, query: str) -> bool:
+    return (value or "").upper().startswith(query.upper())
+
+
+def _new_cache(matches) -> PrefixResultCache:
+    return PrefixResultCache(matches, settings.SUGGEST_CACHE_TTL_SECONDS, settings.SUGGEST_CACHE_MAX_ENTRIES)
+
+
+_refint_codpro_cache = _new_cache(
+    lambda item, q: _starts_with(item["refint"], q) or str(item["cod_pro"]).startswith(q)
+)
+_ref_crn_cache = _new_cache(_starts_with)
+_ref_ext_cache = _new_cache(_starts_with)
+
+
+async def _autocomplete_sql(cache: PrefixResultCache, statement, query: str, db: AsyncSession, to_item) -> list:
+    """
+    Autocomplétion SQL avec cache par préfixe : une requête lit SUGGEST_FETCH_SIZE lignes,
+    les saisies qui prolongent un préfixe au résultat complet sont filtrées en mémoire.
+    """
+    if _LIKE_WILDCARDS & set(query):
+        result = await run_query(db, statement, {"q": f"{query}%", "fetch": SUGGEST_LIMIT})
+        return [to_item(row) for row in result.fetchall()]
+
+    cached = cache.get(query, SUGGEST_LIMIT)
+    if cached is not None:
+        return cached
+
+    fetch = settings.SUGGEST_FETCH_SIZE
+    result = await run_query(db, statement, {"q": f"{query}%", "fetch": fetch})
+    rows = [to_item(row) for row in result.fetchall()]
+    cache.put(query, rows, complete=len(rows) < fetch)
+    return rows[:SUGGEST_LIMIT]
+
+
 async def get_refcrn_by_codpro(cod_pro: int, db: AsyncSession) -> list[str]:
     """
     Retourne la liste des ref_crn associées à un cod_pro donné (multi-référencement possible).
@@ -19,14 +72,7 @@ async def get_refcrn_by_codpro(cod_pro: int, db: AsyncSession) -> list[str]:
     except Exception:
         logger.exception("[Redis] refcrn_by_codpro fallback")
 
-    query = text("""
-        SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-        SELECT DISTINCT ref_crn
-        FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
-        WHERE cod_pro = :cod_pro AND ref_crn IS NOT NULL
-        ORDER BY ref_crn
-    """)
-    result = await db.execute(query, {"cod_pro": cod_pro})
+    result = await run_query(db, SUGGEST_REFCRN_BY_CODPRO, {"cod_pro": cod_pro})
     data = [row[0] for row in result.fetchall()]
 
     try:
@@ -40,43 +86,37 @@ async def get_refcrn_by_codpro(cod_pro: int, db: AsyncSession) -> list[str]:
 async def autocomplete_refint_or_codpro(query: str, db: AsyncSession) -> list[dict]:
     """
     Retourne les 10 premiers couples (refint, cod_pro) correspondant à un préfixe.
+    Index mémoire si chargé, sinon requête SQL avec cache par préfixe.
     """
-    sql = """
-        SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-        SELECT DISTINCT TOP 10 refint, cod_pro
-        FROM [CBM_DATA].[Pricing].[Grouping_crn_table] WITH (NOLOCK)
-        WHERE refint LIKE :q OR CAST(cod_pro AS VARCHAR) LIKE :q
-        ORDER BY refint
-    """
-    result = await db.execute(text(sql), {"q": f"{query}%"})
-    return [{"refint": row[0], "cod_pro": row[1]} for row in result.fetchall()]
+    indexes = get_suggestion_indexes()
+    if indexes is not None:
+        return [{"refint": r, "cod_pro": c} for r, c in indexes.refint_or_codpro(query)]
+
+    return await _autocomplete_sql(
+        _refint_codpro_cache, SUGGEST_REFINT_OR_CODPRO, query, db,
+        lambda row: {"refint": row[0], "cod_pro": row[1]}
+    )
 
 
 async def autocomplete_ref_crn(query: str, db: AsyncSession) -> list[str]:
     """
     Retourne les 10 premières références constructeur (ref_crn) correspondant à un préfixe.
+    Index mémoire si chargé, sinon requête SQL avec cache par préfixe.
     """
-    sql = """
-        SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-        SELECT DISTINCT TOP 10 ref_crn
-        FROM CBM_DATA.Pricing.Bridge_cod_pro_ref_crn WITH (NOLOCK)
-        WHERE ref_crn LIKE :q
-        ORDER BY ref_crn
-    """
-    result = await db.execute(text(sql), {"q": f"{query}%"})
-    return [row[0] for row in result.fetchall()]
+    indexes = get_suggestion_indexes()
+    if indexes is not None:
+        return indexes.ref_crn.search(query)
+
+    return await _autocomplete_sql(_ref_crn_cache, SUGGEST_REF_CRN, query, db, lambda row: row[0])
 
 
 async def autocomplete_ref_ext(query: str, db: AsyncSession) -> list[str]:
     """
     Retourne les 10 premières références externes (ref_ext) correspondant à un préfixe.
+    Index mémoire si chargé, sinon requête SQL avec cache par préfixe.
     """
-    sql = """
-        SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
-        SELECT DISTINCT TOP 10 refext as ref_ext
-        FROM CBM_DATA.dm.Dim_Produit WITH (NOLOCK)
-        WHERE refext LIKE :q
-        ORDER BY ref_ext
-    """
-    result = await db.execute(text(sql), {"q": f"{query}%"})
-    return [row[0] for row in result.fetchall()]
+    indexes = get_suggestion_indexes()
+    if indexes is not None:
+        return indexes.ref_ext.search(query)
+
+    return await _autocomplete_sql(_ref_ext_cache, SUGGEST_REF_EXT, query, db, lambda row: row[0])
@@ -23,6 +23,11 @@ class Settings(BaseSettings):
     DATABASE_POOL_SIZE: int = Field(default=50, ge=1, le=100, description="Taille du pool de connexions")
     DATABASE_MAX_OVERFLOW: int = Field(default=5, ge=0, le=50, description="Débordement max du pool")
     DATABASE_TIMEOUT: int = Field(default=5, ge=1, le=30, description="Timeout connexion DB (secondes)")
+    DATABASE_POOL_RECYCLE: int = Field(default=1800, ge=60, description="Durée de vie max d'une connexion du pool (secondes)")
+    DATABASE_HEALTHCHECK_INTERVAL: int = Field(default=60, ge=5, description="Intervalle du contrôle de santé du pool (secondes)")
+    DATABASE_WRITE_POOL_SIZE: int = Field(default=5, ge=1, le=50, description="Taille du pool d'écriture (batchs)")
+    DATABASE_WRITE_MAX_OVERFLOW: int = Field(default=2, ge=0, le=20, description="Débordement max du pool d'écriture")
+    DATABASE_WRITE_QUERY_TIMEOUT: int = Field(default=0, ge=0, description="Timeout driver des requêtes batch (secondes, 0 = illimité)")
     
     # === Redis ===
     REDIS_HOST: str = Field(default="localhost", description="Host Redis")
@@ -35,6 +40,10 @@ class Settings(BaseSettings):
     REDIS_TTL_SHORT: int = Field(default=30, ge=1, description="TTL court (secondes)")
     REDIS_TTL_MEDIUM: int = Field(default=600, ge=1, description="TTL moyen (secondes)")
     REDIS_TTL_LONG: int = Field(default=86400, ge=1, description="TTL long (secondes)")
+
+    # === Coalescence des requêtes (single-flight) ===
+    SINGLE_FLIGHT_LEASE_TTL: int = Field(default=60, ge=1, description="Durée max du bail Redis d'un calcul partagé entre workers (secondes)")
+    SINGLE_FLIGHT_RESULT_TTL: int = Field(default=15, ge=1, description="Rétention du résultat publié aux workers en attente (secondes)")
     
     # === API Configuration ===
     API_V1_PREFIX: str = Field(default="/api/v1", description="Préfixe API")
@@ -62,6 +71,35 @@ class Settings(BaseSettings):
     MAX_PAGE_SIZE: int = Field(default=400, ge=1, le=1000, description="Taille de page maximum")
     REQUEST_TIMEOUT: int = Field(default=30, ge=1, le=300, description="Timeout requête (secondes)")
     
+    # === Optimisation ===
+    OPTIMISATION_STORE_MAX_AGE_HOURS: int = Field(default=48, ge=1, description="Âge max des résultats d'optimisation matérialisés (heures)")
+
+    # === Index identifiants (mémoire) ===
+    IDENTIFIER_INDEX_REFRESH_SECONDS: int = Field(default=900, ge=60, description="Période de rafraîchissement de l'index identifiants (secondes)")
+    REFERENCE_SNAPSHOT_DIR: str = Field(default="./data/snapshots", description="Répertoire des snapshots référentiel mémoire-mappés (partagé par les workers)")
+    IDENTIFIER_INDEX_LOAD_TIMEOUT: int = Field(default=300, ge=1, description="Timeout du chargement complet de Grouping_crn_table (secondes)")
+    IDENTIFIER_BULK_CHUNK_SIZE: int = Field(default=2000, ge=1, description="Identifiants résolus par lot (requêtes ensemblistes, flux NDJSON)")
+    DASHBOARD_BULK_MAX_SESSIONS: int = Field(default=2, ge=1, le=6, description="Blocs des fiches en masse chargés en parallèle (connexions prises par requête)")
+
+    # === Autocomplétion (index préfixes en mémoire) ===
+    SUGGEST_INDEX_REFRESH_SECONDS: int = Field(default=900, ge=60, description="Période de rechargement des index d'autocomplétion (secondes)")
+    SUGGEST_CACHE_TTL_SECONDS: int = Field(default=60, ge=1, description="Durée de vie des résultats d'autocomplétion en cache mémoire (secondes)")
+    SUGGEST_CACHE_MAX_ENTRIES: int = Field(default=2000, ge=1, description="Nombre max de préfixes gardés en cache mémoire")
+    SUGGEST_FETCH_SIZE: int = Field(default=200, ge=10, description="Lignes lues par préfixe pour servir les saisies suivantes sans SQL")
+    SUGGEST_NORMALIZE_REFS: bool = Field(default=True, description="Ignorer casse, espaces et tirets dans les préfixes de références")
+
+    # === Cube ventes mensuel ===
+    SALES_CUBE_START_DATE: str = Field(default="2024-01-01", description="Premier jour couvert par le cube ventes mensuel (YYYY-MM-DD)")
+    SALES_CUBE_REFRESH_SECONDS: int = Field(default=3600, ge=60, description="Période du rafraîchissement incrémental du cube ventes (secondes)")
+
+    # === Synthèse des groupes (Group_Summary) ===
+    GROUP_SUMMARY_REFRESH_SECONDS: int = Field(default=3600, ge=60, description="Période du rafraîchissement incrémental de Group_Summary (secondes)")
+    GROUP_SUMMARY_MAX_AGE_SECONDS: int = Field(default=4 * 3600, ge=60, description="Au-delà, la liste des groupes est recalculée sur les tables de faits (secondes)")
+
+    # === Exports (CSV / Arrow / Parquet) ===
+    EXPORT_PARTITION_SIZE: int = Field(default=5000, ge=100, description="Lignes lues et encodées par paquet dans les exports")
+    EXPORT_QUERY_TIMEOUT: int = Field(default=120, ge=1, description="Timeout d'ouverture du curseur d'export (secondes)")
+    
     # === Rate Limiting ===
     RATE_LIMIT_PER_MINUTE: int = Field(default=100, ge=1, description="Requêtes par minute par IP")
     RATE_LIMIT_BURST: int = Field(default=200, ge=1, description="Burst maximum")
@@ -1,7 +1,10 @@
 # app/utils/identifier_utils.py
 
 from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
-from app.services.identifiers.identifier_service import get_codpro_list_from_identifier
+from app.services.identifiers.identifier_service import (
+    get_codpro_list_from_identifier,
+    resolve_identifiers_bulk,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 async def resolve_codpro_list(payload: ProductIdentifierRequest, db: AsyncSession) -> list[int]:
@@ -12,3 +15,22 @@ async def resolve_codpro_list(payload: ProductIdentifierRequest, db: AsyncSessio
     full_payload = ProductIdentifierRequest(**payload_dict)
     response = await get_codpro_list_from_identifier(full_payload, db)
     return response.cod_pro_list
+
+
+async def resolve_codpro_lists_bulk(payloads: list, db: AsyncSession) -> list[list[int]]:
+    """
+    Résout une liste de payloads en une passe : cod_pro_list fournie telle quelle,
+    sinon resolve_identifiers_bulk (index identifiants en mémoire, ou SQL ensembliste
+    avec le cache Redis de la résolution unitaire).
+    """
+    pending = [
+        (i, ProductIdentifierRequest(**payload.model_dump(exclude_none=False)))
+        for i, payload in enumerate(payloads)
+        if not payload.cod_pro_list
+    ]
+    resolved = [list(payload.cod_pro_list or []) for payload in payloads]
+    if pending:
+        lists = await resolve_identifiers_bulk([p for _, p in pending], db)
+        for (i, _), cod_pro_list in zip(pending, lists):
+            resolved[i] = cod_pro_list
+    return resolved
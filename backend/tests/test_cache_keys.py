@@ -0,0 +1,18 @@
+# ============================================
+# 📁 backend/tests/test_cache_keys.py
+# ============================================
+
+from app.cache.cache_keys import single_flight_key
+
+
+def test_single_flight_key_ignores_list_order_and_duplicates():
+    key = single_flight_key("matrix:view", {"cod_pro_list": [2, 1, 2], "grouping_crn": 1})
+    assert key == single_flight_key("matrix:view", {"grouping_crn": 1, "cod_pro_list": [1, 2]})
+    assert key.startswith("matrix:view:")
+
+
+def test_single_flight_key_distinguishes_payloads():
+    base = {"cod_pro_list": [1, 2], "live": False}
+    assert single_flight_key("optimisation:group", base) != single_flight_key("optimisation:group", {**base, "live": True})
+    assert single_flight_key("optimisation:group", base) != single_flight_key("optimisation:group", {**base, "cod_pro_list": [1, 3]})
+    assert single_flight_key("optimisation:group", base) != single_flight_key("dashboard:fiche", base)
@@ -0,0 +1,54 @@
+# ============================================
+# 📁 backend/tests/test_date_service.py
+# ============================================
+
+from datetime import date
+from app.common.date_service import PeriodWindow, add_months, month_key_from_label
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2023, 11, 1), 14) == date(2025, 1, 1)
+
+
+def test_window_bounds_are_first_of_month():
+    window = PeriodWindow(date(2024, 3, 15), date(2024, 6, 30))
+    assert window.start == date(2024, 3, 1)
+    assert window.end == date(2024, 6, 1)
+    assert window.keys() == [202403, 202404, 202405]
+
+
+def test_last_n_months_includes_current_month():
+    window = PeriodWindow.last_n_months(3, today=date(2024, 1, 15))
+    assert (window.start, window.end) == (date(2023, 11, 1), date(2024, 2, 1))
+    assert window.keys() == [202311, 202312, 202401]
+    assert window.labels() == ["2023-11", "2023-12", "2024-01"]
+
+
+def test_last_n_months_complete_months_only():
+    window = PeriodWindow.last_n_months(3, include_current=False, today=date(2024, 1, 15))
+    assert window.keys() == [202310, 202311, 202312]
+    assert window.end_key == 202401
+
+
+def test_since_stops_before_current_month():
+    window = PeriodWindow.since(date(2023, 11, 20), today=date(2024, 2, 10))
+    assert window.keys() == [202311, 202312, 202401]
+    assert PeriodWindow.since(date(2023, 11, 20), include_current=True, today=date(2024, 2, 10)).end_key == 202403
+
+
+def test_cache_token_and_sql_params():
+    window = PeriodWindow(date(2023, 11, 1), date(2024, 2, 1))
+    assert window.cache_token == "202311-202402"
+    assert window.sql_params("ventes") == {
+        "ventes_start": date(2023, 11, 1),
+        "ventes_end": date(2024, 2, 1),
+        "ventes_start_key": 202311,
+        "ventes_end_key": 202402,
+    }
+
+
+def test_empty_window_has_no_keys():
+    window = PeriodWindow(date(2024, 3, 1), date(2024, 3, 31))
+    assert window.keys() == []
+    assert month_key_from_label("2024-03-01") == 202403
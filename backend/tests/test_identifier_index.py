@@ -0,0 +1,42 @@
+# ============================================
+# 📁 backend/tests/test_identifier_index.py
+# ============================================
+
+import pytest
+from app.schemas.identifiers.identifier_schema import ProductIdentifierRequest
+from app.services.identifiers.identifier_index import IdentifierIndex
+
+
+@pytest.fixture
+def index(reference_snapshot):
+    return IdentifierIndex(reference_snapshot)
+
+
+def _resolve(index: IdentifierIndex, **fields):
+    return index.resolve(ProductIdentifierRequest(**fields))
+
+
+def test_resolve_by_reference(index):
+    assert _resolve(index, refint="ri-1") == [1]
+    assert _resolve(index, ref_ext="ext-4  ") == [4]
+    assert _resolve(index, refint="INCONNU", ref_ext="EXT-2") == [2]
+    assert _resolve(index, refint="INCONNU") == []
+    assert _resolve(index, cod_pro=3) == [3]
+
+
+def test_resolve_by_ref_crn(index):
+    assert _resolve(index, ref_crn="crn-a") == [1, 2]
+    assert _resolve(index, ref_crn="CRN-A", qualite="oem") == [1]
+    assert _resolve(index, ref_crn="CRN-B", grouping_crn=1) == [1, 2, 3]
+
+
+def test_resolve_group_members(index):
+    assert _resolve(index, cod_pro=2, grouping_crn=1) == [1, 2, 3]
+    assert _resolve(index, cod_pro=2, grouping_crn=1, qualite="PMV") == [3]
+    # Produit sans groupe : aucun membre
+    assert _resolve(index, cod_pro=4, grouping_crn=1) == []
+
+
+def test_matches_for_dedups_collation_variants(index):
+    assert index.matches_for([1]) == [{"cod_pro": 1, "ref_crn": "CRN-A", "ref_ext": "D1"}]
+    assert index.matches_for([3]) == [{"cod_pro": 3, "ref_crn": "crn-b", "ref_ext": None}]
@@ -0,0 +1,22 @@
+# ============================================
+# 📁 backend/tests/test_matrix_columns.py
+# ============================================
+
+from app.services.matrix.matrix_columns import COLUMN_TYPE_COLORS, classify_columns, count_values
+
+
+def test_classify_columns():
+    columns, stats = classify_columns(["B", "A", None, "A"], ["C", "B", ""])
+    assert [(c["ref"], c["type"]) for c in columns] == [("A", "crn_only"), ("B", "both"), ("C", "ext_only")]
+    assert [c["color_code"] for c in columns] == [
+        COLUMN_TYPE_COLORS["crn_only"], COLUMN_TYPE_COLORS["both"], COLUMN_TYPE_COLORS["ext_only"]
+    ]
+    assert stats == {"crn_only": 1, "ext_only": 1, "both": 1}
+
+
+def test_classify_columns_empty():
+    assert classify_columns([], [None]) == ([], {})
+
+
+def test_count_values():
+    assert count_values(["OEM", None, "PMQ", "OEM"]) == {"Inconnue": 1, "OEM": 2, "PMQ": 1}
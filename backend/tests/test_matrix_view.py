@@ -0,0 +1,60 @@
+# ============================================
+# 📁 backend/tests/test_matrix_view.py
+# ============================================
+
+from app.schemas.matrix.matrix_view_schema import MatrixViewResponse
+from app.services.matrix.matrix_view_service import to_compact_matrix_view
+
+
+def _product(cod_pro: int, qualite: str) -> dict:
+    return {
+        "cod_pro": cod_pro, "refint": f"RI{cod_pro}", "ref_ext": None, "famille": None,
+        "s_famille": None, "qualite": qualite, "statut": 0, "cod_fou_principal": None,
+        "nom_fou": None, "nom_pro": None,
+    }
+
+
+def _column(ref: str, ref_type: str) -> dict:
+    return {"ref": ref, "type": ref_type, "color_code": "#000000"}
+
+
+def test_to_compact_matrix_view():
+    correspondences = [
+        {"cod_pro": 1, "ref_crn": "A", "ref_ext": "B"},
+        {"cod_pro": 2, "ref_crn": "C", "ref_ext": None},
+        {"cod_pro": 1, "ref_crn": None, "ref_ext": "B"},
+    ]
+    response = MatrixViewResponse(
+        products=[_product(1, "OEM"), _product(2, "PMQ")],
+        column_refs=[_column("A", "crn_only"), _column("B", "ext_only"), _column("C", "crn_only")],
+        correspondences=correspondences,
+        total_products=2,
+        total_columns=3,
+        total_correspondences=len(correspondences),
+        column_type_stats={"crn_only": 2, "ext_only": 1},
+        quality_stats={"OEM": 1, "PMQ": 1},
+    )
+
+    compact = to_compact_matrix_view(response)
+    assert compact.refs == ["A", "B", "C"]
+    assert [compact.type_codes[t] for t in compact.ref_types] == ["crn_only", "ext_only", "crn_only"]
+    # Correspondances regroupées par cod_pro (ordre de première apparition)
+    assert compact.row_cod_pros == [1, 2]
+    assert compact.row_ptr == [0, 2, 3]
+    assert compact.crn_col == [0, -1, 2]
+    assert compact.ext_col == [1, 1, -1]
+    assert compact.total_correspondences == 3
+    assert compact.products == response.products
+
+
+def test_to_compact_matrix_view_unknown_ref():
+    response = MatrixViewResponse(
+        products=[_product(1, "OEM")],
+        column_refs=[_column("A", "both")],
+        correspondences=[{"cod_pro": 1, "ref_crn": "A", "ref_ext": "Z"}],
+        total_products=1,
+        total_columns=1,
+        total_correspondences=1,
+    )
+    compact = to_compact_matrix_view(response)
+    assert (compact.crn_col, compact.ext_col) == ([0], [-1])
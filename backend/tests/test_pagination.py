@@ -0,0 +1,40 @@
+# ============================================
+# 📁 backend/tests/test_pagination.py
+# ============================================
+
+import base64
+import pytest
+from app.common.pagination import calculate_offset, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    values = {"nb": 12, "g": 3456, "ref": "AB/12+"}
+    cursor = encode_cursor(values)
+    assert decode_cursor(cursor, keys=("nb", "g")) == values
+    # Jeton utilisable tel quel dans une query string
+    assert "+" not in cursor and "/" not in cursor
+
+
+def test_cursor_is_deterministic():
+    assert encode_cursor({"a": 1, "b": 2}) == encode_cursor({"b": 2, "a": 1})
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", base64.urlsafe_b64encode(b"[1, 2]").decode("ascii")])
+def test_invalid_cursor_raises(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursor_missing_or_null_key_raises():
+    cursor = encode_cursor({"nb": 12, "g": None})
+    assert decode_cursor(cursor) == {"nb": 12, "g": None}
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, keys=("nb", "g"))
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, keys=("nb", "q"))
+
+
+def test_calculate_offset():
+    assert calculate_offset(1, 50) == 0
+    assert calculate_offset(3, 50) == 100
+    assert calculate_offset(0, 50) == 0
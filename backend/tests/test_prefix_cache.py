@@ -0,0 +1,53 @@
+# ============================================
+# 📁 backend/tests/test_prefix_cache.py
+# ============================================
+
+from types import SimpleNamespace
+import pytest
+import app.services.suggestion.prefix_cache as prefix_cache
+from app.services.suggestion.prefix_cache import PrefixResultCache
+
+
+def _starts_with(row: str, query: str) -> bool:
+    return row.upper().startswith(query.upper())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prefix_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_cache_exact_and_complete_prefix(clock):
+    cache = PrefixResultCache(_starts_with, ttl=60, max_entries=10)
+    cache.put("ab", ["AB1", "AB12", "AB2"], complete=True)
+    assert cache.get("AB", 2) == ["AB1", "AB12"]
+    assert cache.get("ab1", 10) == ["AB1", "AB12"]
+    assert cache.get("x", 10) is None
+
+
+def test_cache_incomplete_prefix_is_not_filtered(clock):
+    cache = PrefixResultCache(_starts_with, ttl=60, max_entries=10)
+    cache.put("ab", ["AB1", "AB2"], complete=False)
+    assert cache.get("ab", 10) == ["AB1", "AB2"]
+    assert cache.get("ab1", 10) is None
+
+
+def test_cache_expiry(clock):
+    cache = PrefixResultCache(_starts_with, ttl=60, max_entries=10)
+    cache.put("ab", ["AB1"], complete=True)
+    clock[0] += 61
+    assert cache.get("ab", 10) is None
+    assert cache.get("ab1", 10) is None
+
+
+def test_cache_lru_eviction(clock):
+    cache = PrefixResultCache(_starts_with, ttl=60, max_entries=2)
+    cache.put("a", ["A1"], complete=False)
+    cache.put("b", ["B1"], complete=False)
+    assert cache.get("a", 10) == ["A1"]
+    cache.put("c", ["C1"], complete=False)
+    assert cache.get("b", 10) is None
+    assert cache.get("a", 10) == ["A1"]
+    assert cache.get("c", 10) == ["C1"]
@@ -0,0 +1,32 @@
+# ============================================
+# 📁 backend/tests/test_prefix_index.py
+# ============================================
+
+from app.services.suggestion.prefix_index import PrefixIndex, normalize_ref
+
+
+def test_normalize_ref():
+    assert normalize_ref(" ab-12 3/x.y_z ") == "AB123XYZ"
+
+
+def test_prefix_search_normalized():
+    index = PrefixIndex([("AB-12 3", 1), ("ab124", 2), ("XY1", 3), (None, 4), ("", 5)])
+    assert len(index) == 3
+    assert index.search("ab12") == [1, 2]
+    assert index.search("ab-12-4") == [2]
+    assert index.search("ab12", limit=1) == [1]
+    assert index.search("zz") == []
+    assert index.search(" - ") == []
+
+
+def test_prefix_search_deduplicates_items():
+    index = PrefixIndex([("AB1", "x"), ("AB2", "x"), ("AB3", "y")])
+    assert index.search("AB") == ["x", "y"]
+
+
+def test_prefix_search_case_only():
+    index = PrefixIndex([("AB 1", 1), ("ab-2", 2)], normalize=False)
+    assert index.search("ab") == [1, 2]
+    assert index.search("AB1") == []
+    assert index.search("AB-") == [2]
+
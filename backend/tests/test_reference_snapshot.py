@@ -0,0 +1,26 @@
+# ============================================
+# 📁 backend/tests/test_reference_snapshot.py
+# ============================================
+
+from app.services.identifiers.reference_snapshot import NULL_INT, current_version
+
+
+def test_snapshot_is_current_version(reference_snapshot):
+    assert current_version() == reference_snapshot.version
+
+
+def test_snapshot_columns(reference_snapshot):
+    assert len(reference_snapshot) == 5
+    assert int(reference_snapshot.columns["grouping_crn"][3]) == NULL_INT
+    assert reference_snapshot.text("ref_ext", [2, 3]) == [None, "EXT-4"]
+    assert reference_snapshot.rows_for("cod_pro", 1).tolist() == [0, 4]
+
+
+def test_text_lookup_ignores_case_and_trailing_spaces(reference_snapshot):
+    assert reference_snapshot.rows_for("refint", "RI-2").tolist() == [1]
+    assert reference_snapshot.rows_for("ref_crn", "Crn-A").tolist() == [0, 1, 4]
+    assert reference_snapshot.rows_for("ref_crn", "CRN-A" + "X" * 50).tolist() == []
+
+
+def test_matches_text(reference_snapshot):
+    assert reference_snapshot.matches_text("qualite", [0, 1, 2], "Pmv ").tolist() == [False, False, True]
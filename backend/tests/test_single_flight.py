@@ -0,0 +1,131 @@
+# ============================================
+# 📁 backend/tests/test_single_flight.py
+# ============================================
+
+from pydantic import BaseModel
+import asyncio
+import pytest
+import app.common.single_flight as single_flight_module
+from app.common.single_flight import single_flight
+
+
+class _Result(BaseModel):
+    value: int
+
+
+class FakeRedis:
+    """Sous-ensemble de redis.asyncio utilisé par single_flight (SET NX, GET, EXISTS, EVAL du script de libération)."""
+
+    def __init__(self):
+        self.store = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def exists(self, key):
+        return int(key in self.store)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+
+
+class BrokenRedis:
+    async def set(self, *args, **kwargs):
+        raise ConnectionError("redis down")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(single_flight_module, "redis_client", redis)
+    return redis
+
+
+def _counting(value: int, delay: float = 0.01):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return _Result(value=value)
+
+    return compute, calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_compute_once(fake_redis):
+    compute, calls = _counting(42)
+    results = await asyncio.gather(*(single_flight("sf:once", compute, _Result) for _ in range(5)))
+    assert [r.value for r in results] == [42] * 5
+    assert len(calls) == 1
+    # Résultat publié pour les autres workers, bail libéré
+    assert _Result.model_validate_json(fake_redis.store["singleflight:result:sf:once"]).value == 42
+    assert "singleflight:lease:sf:once" not in fake_redis.store
+
+
+@pytest.mark.asyncio
+async def test_error_is_propagated_to_waiters(fake_redis):
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(single_flight("sf:error", failing, _Result) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert "singleflight:lease:sf:error" not in fake_redis.store
+
+
+@pytest.mark.asyncio
+async def test_redis_unavailable_falls_back_to_local_compute(monkeypatch):
+    monkeypatch.setattr(single_flight_module, "redis_client", BrokenRedis())
+    compute, calls = _counting(7)
+    assert (await single_flight("sf:broken", compute, _Result)).value == 7
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_result_published_by_other_worker_is_reused(fake_redis):
+    fake_redis.store["singleflight:lease:sf:remote"] = "other-worker"
+    fake_redis.store["singleflight:result:sf:remote"] = _Result(value=3).model_dump_json()
+    compute, calls = _counting(99)
+    assert (await single_flight("sf:remote", compute, _Result)).value == 3
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_released_lease_without_result_computes_locally(fake_redis):
+    lease = "singleflight:lease:sf:orphan"
+    fake_redis.store[lease] = "other-worker"
+    asyncio.get_running_loop().call_later(0.05, fake_redis.store.pop, lease)
+    compute, calls = _counting(5)
+    assert (await single_flight("sf:orphan", compute, _Result)).value == 5
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_waiter(fake_redis):
+    blocked = asyncio.Event()
+
+    async def never_ends():
+        await blocked.wait()
+        return _Result(value=0)
+
+    compute, calls = _counting(11)
+    leader = asyncio.create_task(single_flight("sf:cancel", never_ends, _Result))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(single_flight("sf:cancel", compute, _Result))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert (await waiter).value == 11
+    assert len(calls) == 1
+    with pytest.raises(asyncio.CancelledError):
+        await leader